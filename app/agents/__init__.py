@@ -1 +1,36 @@
-from .ma_agents import generate_row_data, generate_column_data
\ No newline at end of file
+from .ma_agents import (
+    column_input_fingerprint,
+    failed_cell,
+    is_failed,
+    partial_cell,
+    is_partial,
+    classify_employee,
+    classify_employees,
+    choose_sections,
+    select_sections,
+    determine_column_data,
+    determine_multi_column_data,
+    determine_new_column_data,
+    build_award_coverage,
+    get_coverage,
+    warm_coverage_cache,
+    build_coverage_context,
+    classify_employee_paged,
+    generate_row_data,
+    speculation_stats,
+    generate_bulk_row_data,
+    generate_column_data,
+)
+from .section_cache import section_cache
+from .coverage_cache import coverage_cache
+from .cascade import cascade
+from .qa import (
+    ChatAnswer,
+    stream_chat_answer,
+    chat_stats,
+)
+from .estimator import (
+    estimator,
+    classification_prompt_tokens,
+    column_prompt_tokens,
+)
@@ -0,0 +1,355 @@
+import json
+import re
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from crud.crud_agtable import citation_key, citation_list
+import llm
+
+# "34.2 (ref: 34.2)" lines of a rendered clause context, see crud_gdb
+CLAUSE_REF = re.compile(r"^(\S+) \(ref: ([^)\n]+)\)$", re.MULTILINE)
+AWARD_HEADER = re.compile(r"^--- Award: .* \(ID: ([^)\n]+)\) ---$", re.MULTILINE)
+
+Validator = Callable[[Dict[str, Any]], Optional[str]]
+# handed the text so far of an answer that's still streaming in
+PartialHandler = Callable[[str], Awaitable[None]]
+
+def clause_refs(text: str) -> Set[str]:
+    # every clause id and key the model was shown
+    refs = set()
+    for clause_id, key in CLAUSE_REF.findall(text):
+        refs.add(clause_id.lower())
+        refs.add(key.strip().lower())
+    return refs
+
+def award_sections(award_info: str) -> Dict[str, str]:
+    # award id -> its part of a classification coverage context
+    headers = list(AWARD_HEADER.finditer(award_info))
+    return {
+        header.group(1): award_info[header.end():headers[i + 1].start() if i + 1 < len(headers) else len(award_info)]
+        for i, header in enumerate(headers)
+    }
+
+def citations_valid(citations: Any, refs: Set[str]) -> bool:
+    # a citation may name a subclause ("34.2(a)") or the parent ("34") of one that was shown
+    if not refs:
+        return True
+    for citation in citation_list(citations):
+        citation = citation_key(citation)
+        if citation in refs:
+            continue
+        if not any(
+            citation.startswith((ref + ".", ref + "(")) or ref.startswith((citation + ".", citation + "("))
+            for ref in refs
+        ):
+            return False
+    return True
+
+def well_formed_level(level: Any) -> bool:
+    return isinstance(level, str) and 0 < len(level.strip()) <= 80 and "\n" not in level.strip() and any(c.isalnum() for c in level)
+
+def classification_validator(award_info: str) -> Validator:
+    awards = award_sections(award_info)
+
+    def validate(args: Dict[str, Any]) -> Optional[str]:
+        if args.get("try_again"):
+            # paging on to more awards is checked by the next page's answer
+            return None
+        award_id = args.get("award_id")
+        if awards and award_id not in awards:
+            return "unknown_award"
+        if not well_formed_level(args.get("level")):
+            return "bad_level"
+        refs = clause_refs(awards.get(award_id, award_info))
+        if not citations_valid(args.get("award_clauses"), refs) or not citations_valid(args.get("level_clauses"), refs):
+            return "unknown_citation"
+        return None
+    return validate
+
+def provisions_validator(clauses: str) -> Validator:
+    refs = clause_refs(clauses)
+
+    def validate(args: Dict[str, Any]) -> Optional[str]:
+        if not str(args.get("provision") or "").strip():
+            return "empty_provision"
+        if "provision_clauses" not in args:
+            return "missing_citations"
+        if not citations_valid(args["provision_clauses"], refs):
+            return "unknown_citation"
+        return None
+    return validate
+
+class PartialAnswers:
+    def __init__(self, field: str, on_partial: PartialHandler):
+        """
+        Streams `field` of a cascaded call's answer to `on_partial` as it's generated, at most every
+        PARTIAL_ANSWER_INTERVAL_SECONDS. Each attempt (tier, or failover within the last tier)
+        gets a fresh parser from attempt(), so its answer starts over, and retract() clears the
+        text of an answer the cascade rejected so it isn't shown while the next tier works.
+        """
+        self.field = field
+        self.on_partial = on_partial
+        self.shown = False
+
+    def attempt(self) -> llm.ArgumentsHandler:
+        parser = llm.PartialJSONField(self.field)
+        last = 0.0
+
+        async def on_arguments(arguments: str) -> None:
+            nonlocal last
+            if parser.feed(arguments) and time.monotonic() - last >= settings.PARTIAL_ANSWER_INTERVAL_SECONDS:
+                last = time.monotonic()
+                self.shown = True
+                await self.on_partial(parser.value)
+        return on_arguments
+
+    async def retract(self) -> None:
+        if self.shown:
+            self.shown = False
+            await self.on_partial("")
+
+class CascadeExecutor:
+    def __init__(self, tiers: Dict[str, List[str]], min_confidence: float, recent: int = 500):
+        """
+        Runs a stage's tool call on its cheapest model first and only escalates to the next
+        (`tiers`, "provider:model" per stage) when the call fails, the answer doesn't validate or
+        its self reported confidence is under `min_confidence`. Stages without tiers run on gpt-4o.
+        """
+        self.tiers = tiers
+        self.min_confidence = min_confidence
+        self.recent = recent
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def stage_tiers(self, stage: str) -> List[Tuple[str, str]]:
+        tiers = [tier.split(":", 1) if ":" in tier else ("openai", tier) for tier in self.tiers.get(stage, [])]
+        return [tuple(tier) for tier in tiers] or [("openai", "gpt-4o")]
+
+    def stage_stats(self, stage: str) -> Dict[str, Any]:
+        if stage not in self.stats:
+            self.stats[stage] = {
+                "requests": 0,
+                "escalated": 0,
+                "reasons": {},
+                "tiers": {
+                    model: {"calls": 0, "served": 0, "latencies": deque(maxlen=self.recent)}
+                    for _, model in self.stage_tiers(stage)
+                },
+            }
+        return self.stats[stage]
+
+    @staticmethod
+    async def complete(
+        stage: str,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        tools: List[Dict[str, Any]],
+        tool_choice: Any,
+        last: bool,
+        stream_arguments: Optional[Callable[[], llm.ArgumentsHandler]] = None
+    ) -> Any:
+        # the final tier is routed (and fails over) across the stage's acceptable models, the
+        # cheaper tiers get one attempt since a failure just escalates
+        if last:
+            return await llm.router.tool_completion(stage, messages, tools, tool_choice, preferred=(provider, model), stream_arguments=stream_arguments)
+        with llm.telemetry.stage(stage):
+            if stream_arguments:
+                return await llm.tool_completion_stream_attempt(provider, model, messages, tools, tool_choice, stream_arguments())
+            return await llm.tool_completion_attempt(provider, model, messages, tools, tool_choice)
+
+    def check(self, response: Any, validate: Validator) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        # (arguments of the first tool call, reason to escalate)
+        tool_calls = response.choices[0].message.tool_calls
+        if not tool_calls:
+            return None, "no_tool_call"
+        try:
+            args = json.loads(tool_calls[0].function.arguments)
+        except json.JSONDecodeError:
+            return None, "invalid_json"
+        return args, self.accept(args, validate)
+
+    def accept(self, args: Dict[str, Any], validate: Validator) -> Optional[str]:
+        # reason to escalate an answer's arguments, None to keep them
+        reason = validate(args)
+        if reason:
+            return reason
+        confidence = args.get("confidence")
+        if isinstance(confidence, (int, float)) and confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    async def call(
+        self,
+        stage: str,
+        messages: List[Dict[str, str]],
+        tools: List[Dict[str, Any]],
+        tool_choice: Any,
+        validate: Validator,
+        stream_field: Optional[str] = None,
+        on_partial: Optional[PartialHandler] = None
+    ) -> Tuple[Optional[Dict[str, Any]], List[Any]]:
+        # the accepted tool call arguments (None if the last tier made no call) and every response,
+        # for usage accounting. the last tier's errors propagate like a direct call's would. with
+        # on_partial, `stream_field` of each tier's answer is passed on as it's generated and
+        # cleared (an empty partial) when that answer is rejected
+        partials = PartialAnswers(stream_field, on_partial) if stream_field and on_partial else None
+        stream_arguments = partials.attempt if partials else None
+        stats = self.stage_stats(stage)
+        stats["requests"] += 1
+        tiers = self.stage_tiers(stage)
+        responses = []
+        for i, (provider, model) in enumerate(tiers):
+            last = i == len(tiers) - 1
+            tier_stats = stats["tiers"].setdefault(model, {"calls": 0, "served": 0, "latencies": deque(maxlen=self.recent)})
+            if not last and not llm.health.available(provider, model):
+                # throttled or failing, not worth the round trip
+                if i == 0:
+                    stats["escalated"] += 1
+                stats["reasons"]["unavailable"] = stats["reasons"].get("unavailable", 0) + 1
+                continue
+            tier_stats["calls"] += 1
+            start = time.perf_counter()
+            try:
+                response = await self.complete(stage, provider, model, messages, tools, tool_choice, last, stream_arguments)
+            except Exception as e:
+                if last:
+                    raise
+                print(f"{stage} on {model} failed, escalating: {e}")
+                args, reason = None, "error"
+            else:
+                responses.append(response)
+                args, reason = self.check(response, validate)
+            finally:
+                tier_stats["latencies"].append(time.perf_counter() - start)
+            if last and reason == "invalid_json":
+                # what the direct call did with unparseable arguments
+                json.loads(response.choices[0].message.tool_calls[0].function.arguments)
+            if reason is None or last:
+                tier_stats["served"] += 1
+                return (args if reason != "no_tool_call" else None), responses
+            if i == 0:
+                stats["escalated"] += 1
+            stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+            if partials:
+                await partials.retract()
+
+    async def call_batch(
+        self,
+        stage: str,
+        items: Dict[str, Any],
+        build_messages: Callable[[Dict[str, Any]], List[Dict[str, str]]],
+        tools: List[Dict[str, Any]],
+        tool_choice: Any,
+        extract: Callable[[Dict[str, Any]], Dict[str, Dict[str, Any]]],
+        validate: Validator
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[Any]]:
+        # a batched call (several employees or columns answered in one tool call). each tier is
+        # sent only the items still pending (`build_messages`), `extract` splits its arguments into
+        # item id -> item arguments and each item is validated on its own: the ones that pass are
+        # kept, the rest (missing, invalid, low confidence) go on to the next tier. returns the
+        # accepted arguments by item id, anything the last tier didn't answer acceptably is left
+        # out for the caller's fallback, and every response
+        stats = self.stage_stats(stage)
+        stats["requests"] += 1
+        tiers = self.stage_tiers(stage)
+        pending = dict(items)
+        accepted: Dict[str, Dict[str, Any]] = {}
+        responses = []
+        for i, (provider, model) in enumerate(tiers):
+            if not pending:
+                break
+            last = i == len(tiers) - 1
+            tier_stats = stats["tiers"].setdefault(model, {"calls": 0, "served": 0, "latencies": deque(maxlen=self.recent)})
+            if not last and not llm.health.available(provider, model):
+                if i == 0:
+                    stats["escalated"] += 1
+                stats["reasons"]["unavailable"] = stats["reasons"].get("unavailable", 0) + 1
+                continue
+            tier_stats["calls"] += 1
+            start = time.perf_counter()
+            try:
+                response = await self.complete(stage, provider, model, build_messages(pending), tools, tool_choice, last)
+            except Exception as e:
+                if last:
+                    raise
+                print(f"{stage} on {model} failed, escalating: {e}")
+                reasons = {"error": 1}
+            else:
+                responses.append(response)
+                reasons = self.accept_items(response, pending, accepted, validate, extract)
+                if reasons.get("accepted"):
+                    tier_stats["served"] += 1
+            finally:
+                tier_stats["latencies"].append(time.perf_counter() - start)
+            for reason, count in reasons.items():
+                if reason != "accepted":
+                    stats["reasons"][reason] = stats["reasons"].get(reason, 0) + count
+            if pending and i == 0:
+                stats["escalated"] += 1
+        return accepted, responses
+
+    def accept_items(
+        self,
+        response: Any,
+        pending: Dict[str, Any],
+        accepted: Dict[str, Dict[str, Any]],
+        validate: Validator,
+        extract: Callable[[Dict[str, Any]], Dict[str, Dict[str, Any]]]
+    ) -> Dict[str, int]:
+        # moves the items of a batched response that validate from pending to accepted, counts
+        # why the others weren't
+        tool_calls = response.choices[0].message.tool_calls
+        if not tool_calls:
+            return {"no_tool_call": 1}
+        answers: Dict[str, Dict[str, Any]] = {}
+        reasons: Dict[str, int] = {}
+        for tool_call in tool_calls:
+            try:
+                answers.update(extract(json.loads(tool_call.function.arguments)))
+            except json.JSONDecodeError:
+                reasons["invalid_json"] = reasons.get("invalid_json", 0) + 1
+        for item_id in list(pending):
+            reason = self.accept(answers[item_id], validate) if item_id in answers else "missing"
+            if reason is None:
+                accepted[item_id] = answers[item_id]
+                del pending[item_id]
+            reason = reason or "accepted"
+            reasons[reason] = reasons.get(reason, 0) + 1
+        return reasons
+
+    def reach_rates(self, stage: str) -> List[Tuple[str, Optional[float]]]:
+        # (model, share of requests that got to it) per tier, None past the first until the stage has run
+        stats = self.stats.get(stage)
+        rates = []
+        for i, (_, model) in enumerate(self.stage_tiers(stage)):
+            if i == 0:
+                rates.append((model, 1.0))
+            elif stats and stats["requests"] and model in stats["tiers"]:
+                rates.append((model, stats["tiers"][model]["calls"] / stats["requests"]))
+            else:
+                rates.append((model, None))
+        return rates
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {}
+        for stage, stats in self.stats.items():
+            tiers = {}
+            for model, tier_stats in stats["tiers"].items():
+                latencies = sorted(tier_stats["latencies"])
+                tiers[model] = {
+                    "calls": tier_stats["calls"],
+                    "served": tier_stats["served"],
+                    "avg_latency": sum(latencies) / len(latencies) if latencies else None,
+                    "p95_latency": latencies[int(len(latencies) * 0.95)] if latencies else None,
+                }
+            snapshot[stage] = {
+                "requests": stats["requests"],
+                "escalation_rate": stats["escalated"] / stats["requests"] if stats["requests"] else None,
+                "reasons": stats["reasons"],
+                "tiers": tiers,
+            }
+        return snapshot
+
+cascade = CascadeExecutor(settings.MODEL_CASCADE, settings.CASCADE_MIN_CONFIDENCE)
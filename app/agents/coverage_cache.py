@@ -0,0 +1,93 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.config import settings
+import llm
+
+@dataclass
+class CoverageBundle:
+    # award id -> (rendered coverage clauses, references), in candidate order
+    coverage: Dict[str, Tuple[str, Dict[str, Any]]]
+    token_counts: Dict[str, int]
+
+    @property
+    def text(self) -> str:
+        return "".join(text for text, _ in self.coverage.values())
+
+    @property
+    def tokens(self) -> int:
+        return sum(self.token_counts.values())
+
+class CoverageCache:
+    def __init__(self, max_size: int):
+        """
+        Rendered coverage clauses of every candidate award per (industry, subindustry, award data
+        version). Every employee in a subindustry classifies against the same text, so it's
+        fetched from the graph once and served from memory after that.
+        """
+        self.max_size = max_size
+        self.cache: OrderedDict[Tuple[str, str, str], CoverageBundle] = OrderedDict()
+        self.in_flight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(industry: str, subindustry: Optional[str]) -> Tuple[str, str, str]:
+        return (industry or "", subindustry or "", settings.MA_DATA_VERSION)
+
+    def get(self, industry: str, subindustry: Optional[str]) -> Optional[CoverageBundle]:
+        key = self.key(industry, subindustry)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return self.cache[key]
+        return None
+
+    def peek(self, industry: str, subindustry: Optional[str]) -> Optional[CoverageBundle]:
+        # without counting a hit or refreshing its lru position, for estimates
+        return self.cache.get(self.key(industry, subindustry))
+
+    def put(self, industry: str, subindustry: Optional[str], bundle: CoverageBundle) -> None:
+        key = self.key(industry, subindustry)
+        self.cache[key] = bundle
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    async def get_or_build(
+        self,
+        industry: str,
+        subindustry: Optional[str],
+        build: Callable[[], Awaitable[Dict[str, Tuple[str, Dict[str, Any]]]]]
+    ) -> CoverageBundle:
+        cached = self.get(industry, subindustry)
+        if cached is not None:
+            return cached
+        key = self.key(industry, subindustry)
+        if key in self.in_flight:
+            self.stats["hits"] += 1
+            return await asyncio.shield(self.in_flight[key])
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            coverage = await build()
+            bundle = CoverageBundle(
+                coverage=coverage,
+                token_counts={award_id: llm.count_tokens(text) for award_id, (text, _) in coverage.items()}
+            )
+            self.put(industry, subindustry, bundle)
+            future.set_result(bundle)
+            return bundle
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+
+coverage_cache = CoverageCache(settings.COVERAGE_CACHE_SIZE)
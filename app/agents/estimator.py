@@ -0,0 +1,267 @@
+import asyncio
+import json
+import math
+import re
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+
+from neo4j import AsyncDriver
+
+from core.config import settings
+from crud.crud_gdb import ma_gdb
+from db import ma_db
+import llm, prompts
+from agents.ma_agents import rank_awards, award_page_size
+from agents.section_cache import section_cache
+from agents.coverage_cache import coverage_cache
+from agents.cascade import cascade
+from agents.tools import classify_tools, classify_batch_tools, section_choice_tools, provisions_tools, multi_provisions_tools
+
+# stages that go through the model cascade (settings.MODEL_CASCADE), the rest run on whichever
+# of their models the router would pick right now
+CASCADED_STAGES = {"classify", "classify_batch", "provisions", "provisions_multi"}
+# share of cascaded calls assumed to escalate past each tier until the cascade has seen the stage
+DEFAULT_ESCALATION_RATE = 0.3
+# until telemetry has seen a stage
+DEFAULT_LATENCY = {"classify": 6.0, "classify_batch": 20.0, "sections": 2.0, "provisions": 8.0, "provisions_multi": 15.0}
+DEFAULT_COMPLETION_TOKENS = {"classify": 300, "classify_batch": 1500, "sections": 60, "provisions": 250, "provisions_multi": 900}
+# roughly an award + classification cell as it goes in a column prompt
+CLASSIFIED_JSON_TOKENS = 150
+
+def stage_models(stage: str) -> List[Tuple[str, float]]:
+    # (model, expected calls per request) of a stage
+    if stage not in CASCADED_STAGES:
+        return [(llm.router.choose(stage)[1], 1.0)]
+    rates = cascade.reach_rates(stage)
+    return [
+        (model, rate if rate is not None else DEFAULT_ESCALATION_RATE ** i)
+        for i, (model, rate) in enumerate(rates)
+    ]
+
+def stage_prompt_tokens(stage: str) -> Optional[float]:
+    # every tier of a cascaded stage is sent the same prompt, the first sees every request
+    return llm.telemetry.prompt_tokens(stage_models(stage)[0][0], stage)
+
+def template_tokens(template: str, tools: List[Dict[str, Any]]) -> int:
+    # the fixed part of a prompt, its placeholders dropped, plus the tool schema sent with it
+    return llm.count_tokens(re.sub(r"\{[a-z_]+\}", "", template)) + llm.count_tokens(json.dumps(tools))
+
+def classification_prompt_tokens(industry: Optional[str], subindustry: Optional[str]) -> float:
+    # from the cached coverage bundle (one prefilter page of it), a flat guess until it's built
+    bundle = coverage_cache.peek(industry, subindustry)
+    if bundle is None or not bundle.coverage:
+        return settings.ADMISSION_CLASSIFY_TOKENS
+    awards = len(bundle.coverage)
+    page = min(settings.AWARD_PREFILTER_TOP_K, awards) if settings.AWARD_PREFILTER_TOP_K else awards
+    return bundle.tokens / awards * page
+
+def column_prompt_tokens() -> float:
+    observed = stage_prompt_tokens("provisions")
+    return observed if observed is not None else settings.ADMISSION_COLUMN_TOKENS
+
+def stage_latency(stage: str) -> float:
+    # a cascaded call waits on every tier it reaches
+    return sum(
+        reach * (llm.telemetry.latency(model, stage) or DEFAULT_LATENCY[stage])
+        for model, reach in stage_models(stage)
+    )
+
+class Estimate:
+    def __init__(self, concurrency: int):
+        """
+        Expected llm calls, tokens, dollars and wall time of a generation job. Stages run one
+        after another (phases), the calls within a phase share `concurrency` scheduler slots.
+        """
+        self.concurrency = max(concurrency, 1)
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.phases: List[Dict[str, int]] = []
+        self.section_cache = {"hits": 0, "misses": 0}
+
+    def add(self, stage: str, calls: int, prompt_tokens: float, phase: int = 0) -> None:
+        if calls <= 0:
+            return
+        models = stage_models(stage)
+        totals = self.stages.setdefault(stage, {"models": [model for model, _ in models], "calls": 0, "prompt_tokens": 0.0, "completion_tokens": 0.0, "dollars": 0.0})
+        for model, reach in models:
+            # escalated calls resend the whole prompt to the next tier
+            completion = llm.telemetry.completion_tokens(model, stage)
+            completion = DEFAULT_COMPLETION_TOKENS[stage] if completion is None else completion
+            totals["calls"] += calls * reach
+            totals["prompt_tokens"] += prompt_tokens * reach
+            totals["completion_tokens"] += completion * calls * reach
+            totals["dollars"] += llm.telemetry.cost(model, prompt_tokens * reach, completion * calls * reach)
+        while len(self.phases) <= phase:
+            self.phases.append({})
+        self.phases[phase][stage] = self.phases[phase].get(stage, 0) + calls
+
+    def seconds(self) -> float:
+        seconds = 0.0
+        for phase in self.phases:
+            calls = sum(phase.values())
+            latency = max(stage_latency(stage) for stage in phase)
+            seconds += math.ceil(calls / self.concurrency) * latency
+        return seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": round(sum(stage["calls"] for stage in self.stages.values())),
+            "prompt_tokens": round(sum(stage["prompt_tokens"] for stage in self.stages.values())),
+            "completion_tokens": round(sum(stage["completion_tokens"] for stage in self.stages.values())),
+            "dollars": round(sum(stage["dollars"] for stage in self.stages.values()), 4),
+            "seconds": round(self.seconds(), 1),
+            "section_cache": self.section_cache,
+            "stages": self.stages,
+        }
+
+class GenerationEstimator:
+    def __init__(self, max_size: int = 4096):
+        """
+        Pre-flight estimates for column fills and imports. Section outlines and clause contexts
+        are read from the graph once per award (and section set) and only their token counts kept.
+        """
+        self.max_size = max_size
+        self.token_counts: OrderedDict[Tuple[str, ...], int] = OrderedDict()
+
+    # fixed prompt sizes per stage, counted on first use rather than at import
+    @cached_property
+    def provisions_base(self) -> int:
+        return template_tokens(prompts.ma_sys_col_message + prompts.ma_sys_user_message, provisions_tools)
+
+    @cached_property
+    def multi_base(self) -> int:
+        return template_tokens(prompts.ma_sys_col_message + prompts.ma_multi_col_user_message, multi_provisions_tools)
+
+    @cached_property
+    def sections_base(self) -> int:
+        return template_tokens(prompts.section_choice_user_message, section_choice_tools)
+
+    @cached_property
+    def classify_base(self) -> int:
+        return template_tokens(prompts.classify_sys_message + prompts.classify_user_message, classify_tools)
+
+    @cached_property
+    def classify_batch_base(self) -> int:
+        return template_tokens(prompts.classify_sys_message + prompts.classify_batch_user_message, classify_batch_tools)
+
+    async def cached_tokens(self, key: Tuple[str, ...], fetch) -> int:
+        if key in self.token_counts:
+            self.token_counts.move_to_end(key)
+            return self.token_counts[key]
+        tokens = llm.count_tokens(await fetch())
+        self.token_counts[key] = tokens
+        while len(self.token_counts) > self.max_size:
+            self.token_counts.popitem(last=False)
+        return tokens
+
+    async def outline_tokens(self, gdb_driver: AsyncDriver, award_id: str) -> int:
+        async def fetch() -> str:
+            async with gdb_driver.session() as gdb:
+                return await ma_gdb.get_formatted_award_section_hierarchy(gdb, award_id)
+        return await self.cached_tokens((award_id, settings.MA_DATA_VERSION, "outline"), fetch)
+
+    async def clause_tokens(self, gdb_driver: AsyncDriver, award_id: str, sections: List[str]) -> int:
+        async def fetch() -> str:
+            async with gdb_driver.session() as gdb:
+                clauses, _ = await ma_gdb.get_clauses(gdb, award_id, sections)
+                return clauses
+        return await self.cached_tokens((award_id, settings.MA_DATA_VERSION, "clauses", *sorted(sections)), fetch)
+
+    def average_clause_tokens(self) -> float:
+        # for columns whose sections haven't been chosen yet, what clause contexts have looked like
+        observed = stage_prompt_tokens("provisions")
+        if observed is not None:
+            return max(observed - self.provisions_base - CLASSIFIED_JSON_TOKENS, 0)
+        counts = [tokens for key, tokens in self.token_counts.items() if key[2] == "clauses"]
+        return sum(counts) / len(counts) if counts else settings.ADMISSION_COLUMN_TOKENS - self.provisions_base
+
+    async def column_context(
+        self, gdb_driver: AsyncDriver, award_id: str, column_name: str, additional_info: str, estimate: Estimate
+    ) -> float:
+        # clause tokens a column's prompts will carry for this award, adds the section choice call
+        # (phase 0) the award needs if nothing is cached
+        if settings.CLAUSE_STRATEGY == "vector" and section_cache.get_pin(award_id, column_name) is None:
+            return self.average_clause_tokens()
+        sections = section_cache.peek(award_id, column_name, additional_info)
+        if sections is not None:
+            estimate.section_cache["hits"] += 1
+            return await self.clause_tokens(gdb_driver, award_id, sections)
+        estimate.section_cache["misses"] += 1
+        if settings.SECTION_STRATEGY == "llm":
+            outline = await self.outline_tokens(gdb_driver, award_id)
+            estimate.add("sections", 1, self.sections_base + CLASSIFIED_JSON_TOKENS + outline)
+        return self.average_clause_tokens()
+
+    async def add_columns(
+        self,
+        gdb_driver: AsyncDriver,
+        award_rows: Dict[str, int],
+        columns: List[Tuple[str, str]],
+        estimate: Estimate,
+        phase: int,
+        multi: bool = False
+    ) -> None:
+        # award id -> rows classified under it, columns as (name, additional info)
+        async def award_columns(award_id: str) -> List[float]:
+            return await asyncio.gather(*[
+                self.column_context(gdb_driver, award_id, name, info, estimate) for name, info in columns
+            ])
+        contexts = dict(zip(award_rows, await asyncio.gather(*[award_columns(award_id) for award_id in award_rows])))
+        for award_id, rows in award_rows.items():
+            if multi and len(columns) > 1 and sum(contexts[award_id]) <= settings.MULTI_COLUMN_MAX_TOKENS:
+                estimate.add("provisions_multi", rows, rows * (self.multi_base + CLASSIFIED_JSON_TOKENS + sum(contexts[award_id])), phase)
+                continue
+            for clause_tokens in contexts[award_id]:
+                estimate.add("provisions", rows, rows * (self.provisions_base + CLASSIFIED_JSON_TOKENS + clause_tokens), phase)
+
+    async def estimate_column(
+        self, gdb_driver: AsyncDriver, award_rows: Dict[str, int], column_name: str, additional_info: str = ""
+    ) -> Dict[str, Any]:
+        estimate = Estimate(settings.SCHEDULER_SLOTS - settings.SCHEDULER_INTERACTIVE_RESERVED)
+        await self.add_columns(gdb_driver, award_rows, [(column_name, additional_info or "")], estimate, phase=1)
+        return {"rows": sum(award_rows.values()), **estimate.to_dict()}
+
+    async def estimate_import(
+        self, gdb_driver: AsyncDriver, employees: List[Dict[str, Any]], columns: List[Tuple[str, str]]
+    ) -> Dict[str, Any]:
+        # employees are classified in shortlist batches (phase 0), their columns are estimated
+        # against the award the prefilter ranks first (phase 1)
+        estimate = Estimate(settings.SCHEDULER_SLOTS - settings.SCHEDULER_INTERACTIVE_RESERVED)
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for employee in employees:
+            groups.setdefault((employee.get("industry"), employee.get("subIndustry")), []).append(employee)
+
+        award_rows: Dict[str, int] = {}
+        unclassifiable = 0
+        for (industry, subindustry), group in groups.items():
+            award_data = ma_db.get_awards(industry, subindustry)
+            if not award_data:
+                unclassifiable += len(group)
+                continue
+            # an estimate doesn't build the bundle (or count a cache hit), a subindustry that
+            # hasn't been seen yet gets the flat guess per shortlist
+            bundle = coverage_cache.peek(industry, subindustry)
+            page_size = award_page_size(award_data)
+            shortlists: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+            for employee in group:
+                ranked = rank_awards(employee, award_data)
+                award_rows[ranked[0]["award_id"]] = award_rows.get(ranked[0]["award_id"], 0) + 1
+                shortlists.setdefault(tuple(sorted(award["award_id"] for award in ranked[:page_size])), []).append(employee)
+            for shortlist, shortlist_employees in shortlists.items():
+                coverage_tokens = sum(
+                    bundle.token_counts.get(award_id, 0) for award_id in shortlist
+                ) if bundle else settings.ADMISSION_CLASSIFY_TOKENS
+                employee_tokens = [llm.count_tokens(json.dumps(employee)) for employee in shortlist_employees]
+                batch_size = settings.CLASSIFY_BATCH_SIZE
+                for start in range(0, len(shortlist_employees), batch_size):
+                    batch = employee_tokens[start:start + batch_size]
+                    if len(batch) == 1:
+                        estimate.add("classify", 1, self.classify_base + coverage_tokens + batch[0])
+                    else:
+                        estimate.add("classify_batch", 1, self.classify_batch_base + coverage_tokens + sum(batch))
+
+        if columns:
+            await self.add_columns(gdb_driver, award_rows, columns, estimate, phase=1, multi=settings.MULTI_COLUMN_PROVISIONS)
+        return {"rows": len(employees), "unclassifiable": unclassifiable, **estimate.to_dict()}
+
+estimator = GenerationEstimator()
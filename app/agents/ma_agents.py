@@ -1,12 +1,21 @@
-from typing import Dict, Any, Tuple, List, AsyncGenerator
+from typing import Dict, Any, Tuple, List, AsyncGenerator, AsyncIterator, Awaitable, Callable, Optional
 import asyncio
 from neo4j import AsyncSession as Neo4jAsyncSession
 from neo4j import AsyncDriver
 from crud.crud_gdb import ma_gdb
+from core.config import settings
+from db import ma_db
+from gdb.session import Neo4jSessionLocal
 import llm, prompts
-from agents.tools import classify_tools, section_choice_tools, provisions_tools
+from agents.section_cache import section_cache
+from agents.coverage_cache import coverage_cache
+from agents.cascade import cascade, classification_validator, provisions_validator
+from retrieval import lexical_retriever, SectionRanking, clause_store, get_award_prefilter
+from agents.tools import classify_tools, classify_batch_tools, section_choice_tools, provisions_tools, multi_provisions_tools
 import json
 import random
+import hashlib
+import time
 from pydantic import BaseModel
 
 class ReferenceContent(BaseModel):
@@ -15,38 +24,93 @@ class ReferenceContent(BaseModel):
     title: str
     content: str
 
-# groq
-llama_tool_models = ["llama3-groq-70b-8192-tool-use-preview", "llama3-groq-8b-8192-tool-use-preview"]
-llama_models = ["llama-3.1-405b-reasoning", "llama-3.1-70b-versatile", "llama-3.1-8b-instant", "llama3-70b-8192", "llama3-8b-8192"]
+# speculative column prefetch during classification, see generate_row_data
+speculation_stats = {"rows": 0, "hits": 0, "misses": 0, "latency_saved": 0.0}
 
-async def classify_employee(employee_data: Dict[str, Any], award_info: str) -> Tuple[Dict[str, Any], str]:
+def column_input_fingerprint(award_dict: Dict[str, Any], classification_dict: Dict[str, Any], column_name: str, additional_info: str = None) -> str:
+    # everything a generated column cell depends on, if this changes the cell needs recomputing
+    inputs = {
+        "award": {k: v for k, v in award_dict.items() if k != "ref_content"},
+        "classification": {k: v for k, v in classification_dict.items() if k != "ref_content"},
+        "column": column_name,
+        "additional_info": additional_info or "",
+        "data_version": settings.MA_DATA_VERSION,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+async def cancel_tasks(tasks: List[asyncio.Task]) -> None:
+    # a stream closed early (client gone, job cancelled) takes its outstanding llm/graph work
+    # with it, awaited so their neo4j sessions are closed before the caller moves on
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def failed_cell(error: Exception) -> Dict[str, Any]:
+    # written in place of a column value that couldn't be generated, so the rest of the row
+    # (or column) still streams. shaped like a Completed value so citation handling just sees none
+    return {
+        "Failed": {
+            "error": str(error) or type(error).__name__,
+            "type": type(error).__name__,
+            "citations": []
+        },
+        "ref_content": {}
+    }
+
+def is_failed(value: Any) -> bool:
+    return isinstance(value, dict) and "Failed" in value
+
+def partial_cell(answer: str) -> Dict[str, Any]:
+    # the answer so far of a column value still being generated, streamed but never saved
+    return {"Partial": {"answer": answer}}
+
+def is_partial(value: Any) -> bool:
+    return isinstance(value, dict) and "Partial" in value
+
+def record_usage(usage: Dict[str, int], response: Any) -> None:
+    # optional token accounting for callers that pass a usage dict (benchmarks)
+    if usage is not None and response.usage:
+        usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + response.usage.prompt_tokens
+        usage["completion_tokens"] = usage.get("completion_tokens", 0) + response.usage.completion_tokens
+        usage["calls"] = usage.get("calls", 0) + 1
+
+def classification_result(function_args: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    award_data = {
+        function_args["award_id"]: {
+            "reasoning": function_args["award_reasoning"],
+            "citations": function_args["award_clauses"]
+        }
+    }
+    classification_data = {
+        function_args["level"]: {
+            "reasoning": function_args["level_reasoning"],
+            "citations": function_args["level_clauses"]
+        }
+    }
+    return award_data, classification_data
+
+async def classify_employee(employee_data: Dict[str, Any], award_info: str, usage: Dict[str, int] = None) -> Tuple[Dict[str, Any], str]:
+    result, _ = await classify_employee_attempt(employee_data, award_info, usage)
+    return result
+
+async def classify_employee_attempt(employee_data: Dict[str, Any], award_info: str, usage: Dict[str, int] = None) -> Tuple[Tuple[Dict[str, Any], Dict[str, Any]], bool]:
+    # the classification and whether the model asked to see more awards
     employee_info = json.dumps(employee_data)
     messages = [
         {"role": "system", "content": prompts.classify_sys_message},
         {"role": "user", "content": prompts.classify_user_message.format(employee_info=employee_info, coverage_info=award_info)}
     ]
-    response = await llm.openai_client_tool_completion_request(messages, classify_tools, tool_choice={"type": "function", "function": {"name": "classify_employee"}})
-    response_message = response.choices[0].message
-    tool_calls = response_message.tool_calls
-    if tool_calls:
-        for tool_call in tool_calls:
-            function_args = json.loads(tool_call.function.arguments)
-            for key, value in function_args.items():
-                print(f"{key}: {value}")
-
-            award_data = {
-                function_args["award_id"]: {
-                    "reasoning": function_args["award_reasoning"],
-                    "citations": function_args["award_clauses"]
-                }
-            }
-            classification_data = {
-                function_args["level"]: {
-                    "reasoning": function_args["level_reasoning"],
-                    "citations": function_args["level_clauses"]
-                }
-            }
-            return award_data, classification_data
+    function_args, responses = await cascade.call(
+        "classify", messages, classify_tools, {"type": "function", "function": {"name": "classify_employee"}},
+        classification_validator(award_info)
+    )
+    for response in responses:
+        record_usage(usage, response)
+    if function_args is not None:
+        for key, value in function_args.items():
+            print(f"{key}: {value}")
+
+        return classification_result(function_args), bool(function_args.get("try_again"))
     else:
         full_name = employee_data["fullName"]
         award_name = f"{full_name} Award"
@@ -64,8 +128,89 @@ async def classify_employee(employee_data: Dict[str, Any], award_info: str) -> T
                 "classification_id": classification_id
             }
         }
-        return award_data, classification_data
+        return (award_data, classification_data), False
+
+def rank_awards(employee_data: Dict[str, Any], award_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if settings.AWARD_PREFILTER_TOP_K <= 0 or len(award_data) <= 1:
+        return list(award_data)
+    return [award for award, _ in get_award_prefilter().rank(employee_data, award_data)]
+
+def award_page_size(award_data: List[Dict[str, Any]]) -> int:
+    return settings.AWARD_PREFILTER_TOP_K if settings.AWARD_PREFILTER_TOP_K > 0 else max(len(award_data), 1)
+
+def coverage_text(coverage: Dict[str, Tuple[str, Dict[str, Any]]], award_ids: List[str]) -> str:
+    return "".join(coverage[award_id][0] for award_id in award_ids if award_id in coverage)
+
+async def classify_employee_paged(
+    employee_data: Dict[str, Any],
+    award_data: List[Dict[str, Any]],
+    coverage: Dict[str, Tuple[str, Dict[str, Any]]],
+    usage: Dict[str, int] = None
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    # only the best job title matches' coverage goes in the prompt, try_again pages through the rest
+    ranked = rank_awards(employee_data, award_data)
+    page_size = award_page_size(ranked)
+    for start in range(0, max(len(ranked), 1), page_size):
+        page = [award['award_id'] for award in ranked[start:start + page_size]]
+        result, try_again = await classify_employee_attempt(employee_data, coverage_text(coverage, page), usage)
+        if not try_again or start + page_size >= len(ranked):
+            return result
+        print(f"Classification asked for more awards after {start + page_size} of {len(ranked)}")
     
+async def classify_employees(
+    employees: Dict[str, Dict[str, Any]],
+    award_info: str,
+    usage: Dict[str, int] = None
+) -> Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]:
+    # employees that share candidate awards go in one call so the coverage context is sent once.
+    # each classification is validated on its own, only the ones that fail are asked again
+    required = classify_batch_tools[0]["function"]["parameters"]["properties"]["classifications"]["items"]["required"]
+    validate = classification_validator(award_info)
+
+    def validate_classification(classification: Dict[str, Any]) -> Optional[str]:
+        if not all(classification.get(key) for key in required):
+            return "incomplete"
+        if classification.get("try_again"):
+            # paging is for the single employee call, a batch has the whole shortlist
+            return "try_again"
+        return validate(classification)
+
+    def build_messages(pending: Dict[str, Dict[str, Any]]) -> List[Dict[str, str]]:
+        employees_info = json.dumps([{"id": employee_id, **data} for employee_id, data in pending.items()])
+        return [
+            {"role": "system", "content": prompts.classify_sys_message},
+            {"role": "user", "content": prompts.classify_batch_user_message.format(employees_info=employees_info, coverage_info=award_info)}
+        ]
+
+    def extract(function_args: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        return {
+            classification["employee_id"]: classification
+            for classification in function_args.get("classifications", [])
+            if isinstance(classification, dict) and isinstance(classification.get("employee_id"), str)
+        }
+
+    classified = {}
+    pending = dict(employees)
+    for attempt in range(settings.CLASSIFY_BATCH_RETRIES + 1):
+        if len(pending) <= 1:
+            break
+        accepted, responses = await cascade.call_batch(
+            "classify_batch", pending, build_messages, classify_batch_tools,
+            {"type": "function", "function": {"name": "classify_employees"}}, extract, validate_classification
+        )
+        for response in responses:
+            record_usage(usage, response)
+        for employee_id, classification in accepted.items():
+            classified[employee_id] = classification_result(classification)
+            del pending[employee_id]
+        if pending:
+            print(f"Batch classification attempt {attempt + 1} left {len(pending)} employee(s) unclassified")
+
+    # whatever is left falls back to the single employee call
+    results = await asyncio.gather(*[classify_employee(data, award_info, usage) for data in pending.values()])
+    classified.update(zip(pending.keys(), results))
+    return classified
+
 async def choose_sections(field: str, award: str, classification: str, sections: str, additional_info: str = None) -> List[str]:
     if additional_info:
         additional_info = f"Additional Information:\n{additional_info}"
@@ -75,7 +220,7 @@ async def choose_sections(field: str, award: str, classification: str, sections:
         {"role": "system", "content": "You are a helpful assistant. You are tasked with determining relevant section(s) from a document to will help answer a question."},
         {"role": "user", "content": prompts.section_choice_user_message.format(field=field, award=award, classification=classification, additional_info=additional_info, sections=sections)}
     ]
-    response = await llm.groq_client_chat_completion_request(messages, section_choice_tools, tool_choice={"type": "function", "function": {"name": "choose_sections"}})
+    response = await llm.router.tool_completion("sections", messages, section_choice_tools, tool_choice={"type": "function", "function": {"name": "choose_sections"}})
     response_message = response.choices[0].message
     print(response_message)
     tool_calls = response_message.tool_calls
@@ -91,34 +236,118 @@ async def choose_sections(field: str, award: str, classification: str, sections:
     else:
         return []
     
-async def determine_column_data(gdb: Neo4jAsyncSession, award_dict: Dict[str, Any], classification_dict: Dict[str, Any], column_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, ReferenceContent]]:
+def log_section_choice(award: str, column_name: str, additional_info: str, sections: List[str]) -> None:
+    if not settings.SECTION_CHOICE_LOG_PATH or not sections:
+        return
+    with open(settings.SECTION_CHOICE_LOG_PATH, 'a') as file:
+        file.write(json.dumps({
+            "award_id": award,
+            "column_name": column_name,
+            "additional_info": additional_info or "",
+            "sections": sections,
+            "data_version": settings.MA_DATA_VERSION,
+        }) + "\n")
+
+async def lexical_select_sections(gdb: Neo4jAsyncSession, award: str, column_name: str, additional_info: str, strategy: str) -> Tuple[List[str], SectionRanking]:
+    # the lexical choice when it can be trusted without the LLM, otherwise [] and the ranking to confirm from
+    ranking = await lexical_retriever.rank(gdb, award, column_name, additional_info, settings.LEXICAL_SHORTLIST_SIZE)
+    selected = ranking.selected(settings.LEXICAL_RELATIVE_THRESHOLD, settings.LEXICAL_MAX_SECTIONS)
+    if selected and (strategy == "lexical" or ranking.confidence >= settings.LEXICAL_MIN_CONFIDENCE):
+        return selected, ranking
+    return [], ranking
+
+async def select_sections(gdb: Neo4jAsyncSession, award: str, column_name: str, award_json: str, classification_json: str, additional_info: str = None, strategy: str = None) -> List[str]:
+    strategy = strategy or settings.SECTION_STRATEGY
+    # pinned or cached selections skip both the outline fetch and the LLM call
+    async def choose() -> List[str]:
+        if strategy != "llm":
+            selected, ranking = await lexical_select_sections(gdb, award, column_name, additional_info, strategy)
+            if selected:
+                return selected
+            if ranking.sections:
+                shortlist = "\n".join(name for name, _ in ranking.sections)
+                return await choose_sections(column_name, award_json, classification_json, shortlist, additional_info)
+        sections = await ma_gdb.get_formatted_award_section_hierarchy(gdb, award)
+        selected = await choose_sections(column_name, award_json, classification_json, sections, additional_info)
+        log_section_choice(award, column_name, additional_info, selected)
+        return selected
+    return await section_cache.get_or_choose(award, column_name, additional_info, choose, strategy)
+
+async def column_context(
+    gdb: Neo4jAsyncSession,
+    award: str,
+    column_name: str,
+    award_json: str,
+    classification_json: str,
+    additional_info: str = None,
+    section_strategy: str = None,
+    clause_strategy: str = None
+) -> Tuple[str, Dict[str, ReferenceContent]]:
+    # the clause text a column is answered from: the award's top clauses by embedding, or the
+    # clauses of the chosen sections (also the fallback when there's no clause index), pins still win
+    if (clause_strategy or settings.CLAUSE_STRATEGY) == "vector" and section_cache.get_pin(award, column_name) is None:
+        ranked = await clause_store.search(award, column_name, additional_info)
+        if ranked:
+            return await ma_gdb.get_clauses_by_ids(gdb, [clause_id for clause_id, _ in ranked])
+    selected_sections = await select_sections(gdb, award, column_name, award_json, classification_json, additional_info, section_strategy)
+    return await ma_gdb.get_clauses(gdb, award, selected_sections)
+
+async def prefetch_column_context(gdb_driver: AsyncDriver, award_id: str, column_data: Dict[str, Any]) -> Tuple[str, Dict[str, ReferenceContent]]:
+    # section choice and clause retrieval only depend on the award, so they can run before the
+    # employee's classification is known
+    async with gdb_driver.session() as gdb:
+        column_name = column_data.get('name', '')
+        additional_info = column_data.get('additionalInfo', '')
+        return await column_context(gdb, award_id, column_name, json.dumps({award_id: {}}), json.dumps({}), additional_info)
+
+def predict_award(employee_data: Dict[str, Any], award_data: List[Dict[str, Any]]) -> str:
+    if len(award_data) == 1:
+        return award_data[0]['award_id']
+    # otherwise only a clear job title winner is worth speculating on
+    if settings.AWARD_PREFILTER_TOP_K > 0 and award_data:
+        ranked = get_award_prefilter().rank(employee_data, award_data)
+        best = ranked[0][1]
+        if best >= settings.SPECULATIVE_MIN_SCORE and (len(ranked) == 1 or best >= 2 * ranked[1][1]):
+            return ranked[0][0]['award_id']
+    return None
+
+async def determine_column_data(
+    gdb: Neo4jAsyncSession,
+    award_dict: Dict[str, Any],
+    classification_dict: Dict[str, Any],
+    column_data: Dict[str, Any],
+    context: Tuple[str, Dict[str, ReferenceContent]] = None,
+    section_strategy: str = None,
+    clause_strategy: str = None,
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Tuple[Dict[str, Any], Dict[str, ReferenceContent]]:
     award = list(award_dict.keys())[0]
     award_json = json.dumps(award_dict)
     classification_json = json.dumps(classification_dict)
     column_name = column_data.get('name', '')
     additional_info = column_data.get('additionalInfo', '')
-    sections = await ma_gdb.get_formatted_award_section_hierarchy(gdb, award)
-    selected_sections = await choose_sections(column_name, award_json, classification_json, sections, additional_info)
-    clauses, references = await ma_gdb.get_clauses(gdb, award, selected_sections)
+    if context:
+        clauses, references = context
+    else:
+        clauses, references = await column_context(gdb, award, column_name, award_json, classification_json, additional_info, section_strategy, clause_strategy)
     messages = [
         {"role": "system", "content": prompts.ma_sys_col_message},
         {"role": "user", "content": prompts.ma_sys_user_message.format(award=award_json, classification=classification_json, field=column_name, additional_info=additional_info, clauses=clauses)}
     ]
-    response = await llm.openai_client_tool_completion_request(messages, provisions_tools, tool_choice={"type": "function", "function": {"name": "employee_provisions"}})
-    response_message = response.choices[0].message
-    tool_calls = response_message.tool_calls
-    if tool_calls:
-        for tool_call in tool_calls:
-            function_args = json.loads(tool_call.function.arguments)
-            for key, value in function_args.items():
-                print(f"{key}: {value}")
+    function_args, _ = await cascade.call(
+        "provisions", messages, provisions_tools, {"type": "function", "function": {"name": "employee_provisions"}},
+        provisions_validator(clauses), stream_field="provision", on_partial=on_partial
+    )
+    if function_args is not None:
+        for key, value in function_args.items():
+            print(f"{key}: {value}")
 
-            column_data = {
-                "Completed": {
-                    "answer": function_args["provision"],
-                    "citations": function_args["provision_clauses"]
-                }
+        column_data = {
+            "Completed": {
+                "answer": function_args["provision"],
+                "citations": function_args["provision_clauses"]
             }
+        }
         return column_data, references
     else:
         column_data = {
@@ -126,57 +355,256 @@ async def determine_column_data(gdb: Neo4jAsyncSession, award_dict: Dict[str, An
         }
         return column_data, {}
     
-async def determine_new_column_data(gdb: Neo4jAsyncSession, column_data: Dict[str, str], row: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    award_dict = row.get('Award', {})
-    classification_dict = row.get('Classification', {})
+def column_fields(columns: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    # field as the model sees it -> column name
+    return {column_data.get('name') or column_name: column_name for column_name, column_data in columns.items()}
+
+async def multi_column_context(
+    gdb_driver: AsyncDriver,
+    award: str,
+    award_json: str,
+    classification_json: str,
+    columns: Dict[str, Dict[str, Any]]
+) -> Tuple[str, Dict[str, ReferenceContent]]:
+    # the clauses of every column's sections in one fetch, pinned/cached columns contribute their
+    # sections and the rest are chosen together in one call
+    fields = column_fields(columns)
+    async with gdb_driver.session() as gdb:
+        selected_sections = []
+        uncached = {}
+        for field, column_name in fields.items():
+            additional_info = columns[column_name].get('additionalInfo')
+            cached = section_cache.get(award, field, additional_info)
+            if cached is None and settings.SECTION_STRATEGY != "llm":
+                cached, _ = await lexical_select_sections(gdb, award, field, additional_info, settings.SECTION_STRATEGY)
+                section_cache.put(award, field, additional_info, cached)
+            if cached:
+                selected_sections.extend(cached)
+            else:
+                uncached[field] = column_name
+        if uncached:
+            uncached_info = "\n".join(
+                f"{field}: {columns[column_name]['additionalInfo']}"
+                for field, column_name in uncached.items()
+                if columns[column_name].get('additionalInfo')
+            )
+            sections = await ma_gdb.get_formatted_award_section_hierarchy(gdb, award)
+            selected_sections.extend(await choose_sections(", ".join(uncached), award_json, classification_json, sections, uncached_info))
+        selected_sections = list(dict.fromkeys(selected_sections))
+        return await ma_gdb.get_clauses(gdb, award, selected_sections)
+
+async def prefetch_multi_column_context(gdb_driver: AsyncDriver, award_id: str, columns: Dict[str, Dict[str, Any]]) -> Tuple[str, Dict[str, ReferenceContent]]:
+    # prefetch_column_context for a row whose columns go through determine_multi_column_data
+    return await multi_column_context(gdb_driver, award_id, json.dumps({award_id: {}}), json.dumps({}), columns)
+
+async def determine_multi_column_data(
+    gdb_driver: AsyncDriver,
+    award_dict: Dict[str, Any],
+    classification_dict: Dict[str, Any],
+    columns: Dict[str, Dict[str, Any]],
+    context: Tuple[str, Dict[str, ReferenceContent]] = None
+) -> AsyncGenerator[Tuple[str, Dict[str, Any], Dict[str, Any]], None]:
+    # one section choice, one clause fetch and one provisions call for all of a row's empty columns,
+    # the per column path is the fallback for oversized contexts or columns the model skipped.
+    # context is the prefetched multi_column_context when speculation got it
     award = list(award_dict.keys())[0]
     award_json = json.dumps(award_dict)
     classification_json = json.dumps(classification_dict)
-    column_name = column_data.get('name', '')
-    additional_info = column_data.get('additionalInfo', '')
-    sections = await ma_gdb.get_formatted_award_section_hierarchy(gdb, award)
-    selected_sections = await choose_sections(column_name, award_json, classification_json, sections, additional_info)
-    clauses, references = await ma_gdb.get_clauses(gdb, award, selected_sections)
-    messages = [
-        {"role": "system", "content": prompts.ma_sys_col_message},
-        {"role": "user", "content": prompts.ma_sys_user_message.format(award=award_json, classification=classification_json, field=column_name, additional_info=additional_info, clauses=clauses)}
-    ]
-    response = await llm.openai_client_tool_completion_request(messages, provisions_tools, tool_choice={"type": "function", "function": {"name": "employee_provisions"}})
-    response_message = response.choices[0].message
-    tool_calls = response_message.tool_calls
-    if tool_calls:
-        for tool_call in tool_calls:
-            function_args = json.loads(tool_call.function.arguments)
-            for key, value in function_args.items():
-                print(f"{key}: {value}")
+    fields = column_fields(columns)
+    if context:
+        clauses, references = context
+    else:
+        clauses, references = await multi_column_context(gdb_driver, award, award_json, classification_json, columns)
+
+    def build_messages(pending: Dict[str, Dict[str, Any]]) -> List[Dict[str, str]]:
+        fields_info = "\n".join(
+            f"- {field}" + (f" ({columns[column_name]['additionalInfo']})" if columns[column_name].get('additionalInfo') else "")
+            for field, column_name in fields.items()
+            if column_name in pending
+        )
+        return [
+            {"role": "system", "content": prompts.ma_sys_col_message},
+            {"role": "user", "content": prompts.ma_multi_col_user_message.format(award=award_json, classification=classification_json, fields=fields_info, clauses=clauses)}
+        ]
+
+    def extract(function_args: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        return {
+            fields[provision["field"]]: provision
+            for provision in function_args.get("provisions", [])
+            if isinstance(provision, dict) and isinstance(provision.get("field"), str) and provision["field"] in fields
+        }
 
-            column_data = {
+    # each provision is validated against the clauses on its own, the ones that fail every tier
+    # go to the per column path
+    pending = dict(columns)
+    if llm.count_tokens(build_messages(pending)[1]["content"]) <= settings.MULTI_COLUMN_MAX_TOKENS:
+        try:
+            accepted, _ = await cascade.call_batch(
+                "provisions_multi", pending, build_messages, multi_provisions_tools,
+                {"type": "function", "function": {"name": "employee_provisions_multi"}}, extract, provisions_validator(clauses)
+            )
+        except Exception as e:
+            print(f"Multi column provisions for {award} failed, falling back to per column calls: {e}")
+            accepted = {}
+        for column_name, provision in accepted.items():
+            del pending[column_name]
+            column_value = {
                 "Completed": {
-                    "answer": function_args["provision"],
-                    "citations": function_args["provision_clauses"]
+                    "answer": provision["provision"],
+                    "citations": provision["provision_clauses"]
                 }
             }
-        return column_data, references
+            yield column_name, column_value, references
     else:
-        column_data = {
-            award: f"{column_name} Data"
-        }
-        return column_data, {}
+        print(f"Multi column context for {award} too large, falling back to per column calls")
+
+    async def single_column(column_name: str, column_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        try:
+            async with gdb_driver.session() as gdb:
+                column_value, column_references = await determine_column_data(gdb, award_dict, classification_dict, column_data)
+            return column_name, column_value, column_references
+        except Exception as e:
+            print(f"Column {column_name} failed: {e}")
+            return column_name, failed_cell(e), {}
+
+    tasks = [asyncio.create_task(single_column(column_name, column_data)) for column_name, column_data in pending.items()]
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        await cancel_tasks(tasks)
+
+async def determine_new_column_data(
+    gdb: Neo4jAsyncSession,
+    column_data: Dict[str, str],
+    row: Dict[str, Any],
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    # a column added, edited or recomputed on an already classified row, answered like the row
+    # path's columns (same clause retrieval) from its stored award and classification
+    award_dict = {k: v for k, v in row.get('Award', {}).items() if k != "ref_content"}
+    classification_dict = {k: v for k, v in row.get('Classification', {}).items() if k != "ref_content"}
+    return await determine_column_data(gdb, award_dict, classification_dict, column_data, on_partial=on_partial)
+
+async def build_award_coverage(gdb_driver: AsyncDriver, award_data: List[Dict[str, Any]]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    # award id -> (coverage text, references), a session can't run queries concurrently so each award gets its own
+    async def award_coverage(award: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        async with gdb_driver.session() as session:
+            return await ma_gdb.get_award_coverage_clauses(session, [award])
 
-async def generate_row_data(gdb: Neo4jAsyncSession, row_data: Dict[str, Any], award_data: List[Dict[str, Any]]) -> AsyncGenerator[Dict[str, Any], None]:
-    tasks = [ma_gdb.get_award_coverage_clauses(gdb, [award]) for award in award_data]
-    results = await asyncio.gather(*tasks)
-    award_info = ""
-    all_references = {}
-    for award, (output_str, references) in zip(award_data, results):
-        award_info += output_str
-        all_references[award['award_id']] = references
+    results = await asyncio.gather(*[award_coverage(award) for award in award_data])
+    return {award['award_id']: result for award, result in zip(award_data, results)}
+
+async def get_coverage(
+    gdb_driver: AsyncDriver,
+    industry: str,
+    subindustry: str = None,
+    award_data: List[Dict[str, Any]] = None
+) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    # per award coverage for an industry/subindustry, only built (from the graph) on a cache miss
+    if award_data is None:
+        award_data = ma_db.get_awards(industry, subindustry)
+    bundle = await coverage_cache.get_or_build(industry, subindustry, lambda: build_award_coverage(gdb_driver, award_data))
+    return bundle.coverage
+
+async def warm_coverage_cache(concurrency: int = 4) -> None:
+    # builds every industry/subindustry bundle (and the industry wide ones) ahead of the first rows
+    keys = list(dict.fromkeys(
+        key
+        for industry, subindustry, _, _ in ma_db.iter_awards()
+        for key in [(industry, subindustry), (industry, None)]
+    ))
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    async with Neo4jSessionLocal() as (session, driver):
+        await session.close()
+
+        async def warm(industry: str, subindustry: str) -> None:
+            async with semaphore:
+                try:
+                    await get_coverage(driver, industry, subindustry)
+                except Exception as e:
+                    print(f"Coverage warm up for {industry}/{subindustry} failed: {e}")
+
+        await asyncio.gather(*[warm(industry, subindustry) for industry, subindustry in keys])
+    print(f"Warmed {len(keys)} coverage bundles in {time.perf_counter() - start:.1f} s")
+
+async def build_coverage_context(gdb_driver: AsyncDriver, award_data: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+    coverage = await build_award_coverage(gdb_driver, award_data)
+    award_info = coverage_text(coverage, [award['award_id'] for award in award_data])
+    all_references = {award_id: references for award_id, (_, references) in coverage.items()}
+    return award_info, all_references
+
+async def generate_row_data(
+    gdb_driver: AsyncDriver,
+    row_data: Dict[str, Any],
+    award_data: List[Dict[str, Any]],
+    coverage: Dict[str, Tuple[str, Dict[str, Any]]] = None,
+    classified: Tuple[Dict[str, Any], Dict[str, Any]] = None,
+    partials: bool = False
+) -> AsyncGenerator[Dict[str, Any], None]:
+    # coverage (per award) can be built once and shared by employees in the same industry/subindustry,
+    # classified is passed when the employee was already classified as part of a batch. with
+    # partials, columns answered one call each also yield their partial_cell as it streams in
+    if coverage is None:
+        employee_data = row_data["EmployeeData"]
+        coverage = await get_coverage(gdb_driver, employee_data.get("industry"), employee_data.get("subIndustry"), award_data)
+    all_references = {award_id: references for award_id, (_, references) in coverage.items()}
 
     columns_to_process = row_data.pop('Columns', {})
-    
+    columns_to_process = {k: v for k, v in columns_to_process.items() if k not in ["Award", "Classification"]}
+    empty_columns = {k: v for k, v in columns_to_process.items() if v['value'] == ""}
+
+    # speculatively start section choice + clause retrieval for the most likely award while
+    # the employee is classified, dropped if classification lands on a different award. columns
+    # answered together get one combined context (keyed None), the others one each
+    multi_column = settings.MULTI_COLUMN_PROVISIONS and len(empty_columns) > 1
+    speculation: Dict[Optional[str], asyncio.Task] = {}
+    finished = {}
+    predicted_award = None
+    if settings.SPECULATIVE_COLUMNS and not classified and empty_columns:
+        predicted_award = predict_award(row_data["EmployeeData"], award_data)
+    if predicted_award:
+        prefetches = (
+            {None: prefetch_multi_column_context(gdb_driver, predicted_award, empty_columns)} if multi_column
+            else {column_name: prefetch_column_context(gdb_driver, predicted_award, column_data) for column_name, column_data in empty_columns.items()}
+        )
+        for key, prefetch in prefetches.items():
+            task = asyncio.create_task(prefetch)
+            task.add_done_callback(lambda _, key=key: finished.setdefault(key, time.perf_counter()))
+            speculation[key] = task
+    # how much classification time each prefetched context that's actually used saved
+    saved: List[float] = []
+
+    async def speculated(key: Optional[str]) -> Optional[Tuple[str, Dict[str, ReferenceContent]]]:
+        if key not in speculation:
+            return None
+        try:
+            context = await speculation[key]
+        except Exception as e:
+            print(f"Speculative prefetch for {key or 'the row'} failed: {e}")
+            return None
+        saved.append(min(finished.get(key, classify_end), classify_end) - classify_start)
+        return context
+
     # this process seems ugly
-    award, classification = await classify_employee(row_data["EmployeeData"], award_info)
+    classify_start = time.perf_counter()
+    try:
+        award, classification = classified or await classify_employee_paged(row_data["EmployeeData"], award_data, coverage)
+    except BaseException:
+        await cancel_tasks(list(speculation.values()))
+        raise
+    classify_end = time.perf_counter()
     award_id = list(award.keys())[0]
+
+    if speculation:
+        speculation_stats["rows"] += 1
+        if award_id == predicted_award:
+            speculation_stats["hits"] += 1
+        else:
+            speculation_stats["misses"] += 1
+            await cancel_tasks(list(speculation.values()))
+            speculation = {}
     award_references = all_references.get(award_id, {})
     award_ref_content = {
         key: award_references[key] 
@@ -197,35 +625,95 @@ async def generate_row_data(gdb: Neo4jAsyncSession, row_data: Dict[str, Any], aw
         **classification,
         "ref_content": classification_ref_content
     }
-    yield {"Award": award_result, "Classification": classification_result}
+    try:
+        yield {"Award": award_result, "Classification": classification_result}
+    except BaseException:
+        await cancel_tasks(list(speculation.values()))
+        raise
 
-    async def process_column(column_name: str, column_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    async def process_column(
+        column_name: str, column_data: Dict[str, Any], on_partial: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> Tuple[str, Dict[str, Any]]:
         if column_data['value'] == "":
-            column_value, column_references = await determine_column_data(gdb, award, classification, column_data)
-            column_key = list(column_value.keys())[0]
-            column_ref_content = {
-                key: column_references[key] 
-                for key in column_value[column_key]['citations'] 
-                if key in column_references
-            }
+            context = await speculated(column_name)
+            # one column failing (bad tool arguments, missing citations...) fails just its cell
+            try:
+                async with gdb_driver.session() as gdb:
+                    column_value, column_references = await determine_column_data(gdb, award, classification, column_data, context, on_partial=on_partial)
+                column_key = list(column_value.keys())[0]
+                column_ref_content = {
+                    key: column_references[key] 
+                    for key in column_value[column_key]['citations'] 
+                    if key in column_references
+                }
+            except Exception as e:
+                print(f"Column {column_name} failed: {e}")
+                return column_name, failed_cell(e)
             column_value_result = {**column_value, "ref_content": column_ref_content}
             return column_name, column_value_result
         return column_name, column_data
-    
-    columns_to_process = {k: v for k, v in columns_to_process.items() if k not in ["Award", "Classification"]}
-    tasks = [process_column(column_name, column_data) for column_name, column_data in columns_to_process.items()]
 
-    for future in asyncio.as_completed(tasks):
-        column_name, column_value = await future
-        row_data[column_name] = column_value
-        yield {column_name: column_value}
+    # (column name, value, final) in the order they're ready, partial values in between
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def queue_column(column_name: str, column_data: Dict[str, Any]) -> None:
+        async def on_partial(answer: str) -> None:
+            await results.put((column_name, partial_cell(answer), False))
+        await results.put((*await process_column(column_name, column_data, on_partial if partials else None), True))
+
+    tasks = []
+    try:
+        if multi_column:
+            for column_name in empty_columns:
+                del columns_to_process[column_name]
+            columns = determine_multi_column_data(gdb_driver, award, classification, empty_columns, await speculated(None))
+            try:
+                async for column_name, column_value, column_references in columns:
+                    column_key = list(column_value.keys())[0]
+                    try:
+                        column_ref_content = {
+                            key: column_references[key] 
+                            for key in column_value[column_key]['citations'] 
+                            if key in column_references
+                        }
+                        column_value_result = {**column_value, "ref_content": column_ref_content}
+                    except Exception as e:
+                        print(f"Column {column_name} failed: {e}")
+                        column_value_result = failed_cell(e)
+                    row_data[column_name] = column_value_result
+                    yield {column_name: column_value_result}
+            finally:
+                await columns.aclose()
 
+        # tasks rather than bare coroutines, as_completed would otherwise leave them running
+        # once nobody is reading the stream
+        tasks = [asyncio.create_task(queue_column(column_name, column_data)) for column_name, column_data in columns_to_process.items()]
 
-async def generate_column_data(gdb_driver: AsyncDriver, column_data: Dict[str, str], rows: List[Dict[str, Any]]) -> AsyncGenerator[Dict[str, Any], None]:
-    async def process_row_column(row: Dict[str, Any]) -> Tuple[str, str, Any]:
+        remaining = len(tasks)
+        while remaining:
+            column_name, column_value, final = await results.get()
+            if final:
+                remaining -= 1
+                row_data[column_name] = column_value
+            yield {column_name: column_value}
+    finally:
+        await cancel_tasks([*speculation.values(), *tasks])
+        if saved:
+            # the prefetch work that overlapped classification is latency the columns didn't pay
+            speculation_stats["latency_saved"] += max(saved)
+
+
+async def generate_column_data(
+    gdb_driver: AsyncDriver,
+    column_data: Dict[str, str],
+    rows: AsyncIterator[List[Dict[str, Any]]],
+    partials: bool = False
+) -> AsyncGenerator[Dict[str, Any], None]:
+    # with partials each row's partial_cell is yielded as its answer streams in, before its value
+    async def process_row_column(row: Dict[str, Any], on_partial: Optional[Callable[[str], Awaitable[None]]] = None) -> Tuple[str, str, Any]:
         async with gdb_driver.session() as session:
             row_id = row['id']
-            column_value, column_references = await determine_new_column_data(session, column_data, row)
+            column_value, column_references = await determine_new_column_data(session, column_data, row, on_partial)
             column_key = list(column_value.keys())[0]
 
             column_value[column_key]["ref_content"] = {
@@ -236,8 +724,128 @@ async def generate_column_data(gdb_driver: AsyncDriver, column_data: Dict[str, s
             
             return row_id, column_value
 
-    tasks = [process_row_column(row) for row in rows]
+    # rows arrive in batches from the db, each row is scheduled as soon as its batch lands
+    # and results are handed back in completion order through the queue
+    results: asyncio.Queue = asyncio.Queue()
+    tasks: List[asyncio.Task] = []
+
+    async def queue_result(row: Dict[str, Any]) -> None:
+        async def on_partial(answer: str) -> None:
+            await results.put((row['id'], partial_cell(answer)))
+
+        # a row failing fails its cell, not the whole column
+        try:
+            await results.put(await process_row_column(row, on_partial if partials else None))
+        except Exception as e:
+            print(f"Column {column_data.get('name')} failed for row {row['id']}: {e}")
+            await results.put((row['id'], failed_cell(e)))
+
+    async def feed_rows() -> None:
+        try:
+            async for batch in rows:
+                for row in batch:
+                    tasks.append(asyncio.create_task(queue_result(row)))
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            await results.put(e)
+        await results.put(None)
+
+    feeder = asyncio.create_task(feed_rows())
+    try:
+        while (result := await results.get()) is not None:
+            if isinstance(result, Exception):
+                raise result
+            row_id, data = result
+            yield {row_id: data}
+    finally:
+        await cancel_tasks([feeder, *tasks])
+        # closes the caller's row source (and the db session it reads through)
+        if hasattr(rows, "aclose"):
+            await rows.aclose()
+
+
+async def generate_bulk_row_data(gdb_driver: AsyncDriver, rows: List[Dict[str, Any]], concurrency: int = settings.BULK_IMPORT_CONCURRENCY) -> AsyncGenerator[Dict[str, Any], None]:
+    # employees in the same industry/subindustry share candidate awards and coverage, so that is
+    # looked up and rendered once per group and they're classified in batches, the rows
+    # themselves then go through a bounded pipeline. rows carrying "classified" (award,
+    # classification) skip classification
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for row in rows:
+        employee_data = row["EmployeeData"]
+        groups.setdefault((employee_data.get("industry"), employee_data.get("subIndustry")), []).append(row)
+
+    results: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process_row(row: Dict[str, Any], award_data: List[Dict[str, Any]], coverage_context: Dict, classified: Tuple) -> None:
+        try:
+            async with semaphore:
+                async for result in generate_row_data(gdb_driver, row, award_data, coverage_context, classified):
+                    await results.put({row["id"]: result})
+        except Exception as e:
+            print(f"Bulk row {row['id']} failed: {e}")
+            await results.put({row["id"]: {"error": str(e)}})
+
+    async def process_batch(batch_rows: List[Dict[str, Any]], award_data: List[Dict[str, Any]], coverage: asyncio.Task, shortlist: Tuple[str, ...]) -> None:
+        try:
+            coverage_context = await coverage
+            async with semaphore:
+                classified = await classify_employees({row["id"]: row["EmployeeData"] for row in batch_rows}, coverage_text(coverage_context, shortlist))
+        except Exception as e:
+            print(f"Bulk classification failed: {e}")
+            for row in batch_rows:
+                await results.put({row["id"]: {"error": str(e)}})
+            return
+        await asyncio.gather(*[process_row(row, award_data, coverage_context, classified[row["id"]]) for row in batch_rows])
+
+    async def process_classified(classified_rows: List[Dict[str, Any]], award_data: List[Dict[str, Any]], coverage: asyncio.Task) -> None:
+        try:
+            coverage_context = await coverage
+        except Exception as e:
+            print(f"Bulk coverage failed: {e}")
+            for row in classified_rows:
+                await results.put({row["id"]: {"error": str(e)}})
+            return
+        await asyncio.gather(*[process_row(row, award_data, coverage_context, row.pop("classified")) for row in classified_rows])
+
+    async def process_group(industry: str, subindustry: str, group_rows: List[Dict[str, Any]]) -> None:
+        award_data = ma_db.get_awards(industry, subindustry)
+        if not award_data:
+            for row in group_rows:
+                await results.put({row["id"]: {"error": "No awards found for this industry"}})
+            return
+        coverage = asyncio.create_task(get_coverage(gdb_driver, industry, subindustry, award_data))
+        # a batch shares one prompt, so employees are batched with others that have the same award shortlist
+        page_size = award_page_size(award_data)
+        shortlists: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        classified_rows = [row for row in group_rows if row.get("classified")]
+        for row in group_rows:
+            if row.get("classified"):
+                continue
+            shortlist = tuple(sorted(award['award_id'] for award in rank_awards(row["EmployeeData"], award_data)[:page_size]))
+            shortlists.setdefault(shortlist, []).append(row)
+        batch_size = settings.CLASSIFY_BATCH_SIZE
+        try:
+            await asyncio.gather(process_classified(classified_rows, award_data, coverage), *[
+                process_batch(shortlist_rows[i:i + batch_size], award_data, coverage, shortlist)
+                for shortlist, shortlist_rows in shortlists.items()
+                for i in range(0, len(shortlist_rows), batch_size)
+            ])
+        finally:
+            await cancel_tasks([coverage])
+
+    async def feed_groups() -> None:
+        try:
+            await asyncio.gather(*[
+                process_group(industry, subindustry, group_rows)
+                for (industry, subindustry), group_rows in groups.items()
+            ])
+        finally:
+            await results.put(None)
 
-    for future in asyncio.as_completed(tasks):
-        row_id, data = await future
-        yield {row_id: data}
\ No newline at end of file
+    feeder = asyncio.create_task(feed_groups())
+    try:
+        while (result := await results.get()) is not None:
+            yield result
+    finally:
+        await cancel_tasks([feeder])
@@ -0,0 +1,232 @@
+import asyncio
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional
+
+from neo4j import AsyncDriver
+
+from core.config import settings
+from crud.crud_gdb import ma_gdb
+from db import ma_db
+from gdb.session import Neo4jSessionLocal
+import llm, prompts
+from retrieval import clause_store, get_award_prefilter, lexical_retriever
+
+AWARD_ID = re.compile(r"\bMA\d{6}\b", re.IGNORECASE)
+# "clause 25.5", "cl. 25.5(b)" or "Schedule B"
+CLAUSE_MENTION = re.compile(r"\b(?i:clauses?|cl\.)\s*(\d+(?:\.\d+)*)|\b(?i:schedule)\s+([A-Z](?:\.\d+)*)\b")
+# "Hospitality Industry (General) Award 2020" -> "Hospitality Industry (General)"
+AWARD_SUFFIX = re.compile(r"\s+award(?:\s+\d{4})?$", re.IGNORECASE)
+# an inline citation of source N in the answer, "([25.5](ref:3))"
+ANSWER_REF = re.compile(r"\(ref:(\d+)\)")
+
+@lru_cache(maxsize=1)
+def award_names() -> Dict[str, str]:
+    return {award_id: award_data["Award Name"] for _, _, award_id, award_data in ma_db.iter_awards()}
+
+@dataclass
+class QueryAnalysis:
+    question: str
+    # awards to search best first, empty searches every award in the clause index
+    award_ids: List[str]
+    # clause keys the question names, looked up in each award ahead of the ranked ones
+    clause_keys: List[str]
+    # "named" (award ids or names in the question), "matched" (job titles) or "all"
+    scope: str
+
+def analyse_query(question: str) -> QueryAnalysis:
+    # local and quick (no llm call), it's on the way to the first token
+    names = award_names()
+    lowered = question.lower()
+    named = [award_id.upper() for award_id in AWARD_ID.findall(question) if award_id.upper() in names]
+    for award_id, name in names.items():
+        short_name = AWARD_SUFFIX.sub("", name).lower()
+        if len(short_name) >= 6 and short_name in lowered:
+            named.append(award_id)
+    clause_keys = list(dict.fromkeys(key or schedule for key, schedule in CLAUSE_MENTION.findall(question)))
+    if named:
+        return QueryAnalysis(question, list(dict.fromkeys(named))[:settings.CHAT_MAX_AWARDS], clause_keys, "named")
+    ranked = get_award_prefilter().rank({"jobTitle": question}, [{"award_id": award_id} for award_id in names])
+    matched = [award["award_id"] for award, score in ranked[:settings.CHAT_MAX_AWARDS] if score >= settings.CHAT_MIN_AWARD_SCORE]
+    return QueryAnalysis(question, matched, clause_keys, "matched" if matched else "all")
+
+def render_source(record: Dict[str, Any], award_name: str) -> str:
+    return f"ref: {record['key']} | {award_name} | {record['name'] or ''}\n{record['content'] or ''}"
+
+class ChatStats:
+    def __init__(self, recent: int = 500):
+        """
+        Per stage latency (seconds, last `recent` questions) of the qa chat pipeline, with how
+        questions were scoped and retrieved.
+        """
+        self.recent = recent
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.counts: Dict[str, Any] = {"questions": 0, "retrieval_timeouts": 0, "scopes": {}, "retrievers": {}}
+
+    def count(self, group: str, name: str) -> None:
+        self.counts[group][name] = self.counts[group].get(name, 0) + 1
+
+    def record(self, timings: Dict[str, float]) -> None:
+        self.counts["questions"] += 1
+        for stage, seconds in timings.items():
+            self.latencies.setdefault(stage, deque(maxlen=self.recent)).append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latency = {}
+        for stage, recent in self.latencies.items():
+            latencies = sorted(recent)
+            latency[stage] = {
+                "avg": sum(latencies) / len(latencies),
+                "p50": latencies[len(latencies) // 2],
+                "p95": latencies[int(len(latencies) * 0.95)],
+            }
+        return {**self.counts, "latency": latency}
+
+chat_stats = ChatStats()
+
+async def ranked_clause_ids(gdb_driver: AsyncDriver, award_id: Optional[str], question: str, k: int) -> List[str]:
+    # from the clause embedding index, or the award's lexical index when there's no usable one.
+    # a search across every award (award_id None) needs the embedding index
+    hits = await clause_store.search(award_id, question, k=k)
+    if hits is not None:
+        chat_stats.count("retrievers", "vector")
+        return [clause_id for clause_id, _ in hits]
+    if award_id is None:
+        chat_stats.count("retrievers", "none")
+        return []
+    chat_stats.count("retrievers", "lexical")
+    async with gdb_driver.session() as gdb:
+        ranking = await lexical_retriever.rank(gdb, award_id, question, k=k)
+    return [f"{award_id}:{key}" for key, _ in ranking.clauses]
+
+async def retrieve_sources(gdb_driver: AsyncDriver, analysis: QueryAnalysis, award_id: Optional[str]) -> List[Dict[str, Any]]:
+    # one award's clauses, fetched and rendered for the prompt as soon as they're ranked so the
+    # other awards' searches overlap it
+    k = settings.CHAT_CLAUSES_PER_AWARD if award_id else settings.CHAT_MAX_SOURCES
+    clause_ids = await ranked_clause_ids(gdb_driver, award_id, analysis.question, k)
+    if award_id:
+        clause_ids = [f"{award_id}:{key}" for key in analysis.clause_keys] + clause_ids
+    if not clause_ids:
+        return []
+    async with gdb_driver.session() as gdb:
+        records = await ma_gdb.fetch_clause_records(gdb, clause_ids)
+    names = award_names()
+    sources = []
+    for record in records:
+        source_award = record["id"].split(":", 1)[0]
+        sources.append({**record, "award_id": source_award, "text": render_source(record, names.get(source_award, source_award))})
+    return sources
+
+def interleave(results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    # best of each award first, so a cut at CHAT_MAX_SOURCES keeps every award
+    merged: Dict[str, Dict[str, Any]] = {}
+    for rank in range(max((len(sources) for sources in results), default=0)):
+        for sources in results:
+            if rank < len(sources):
+                merged.setdefault(sources[rank]["id"], sources[rank])
+    return list(merged.values())
+
+async def connect(gdb_driver: AsyncDriver) -> None:
+    # opens the driver's first connection while the question is analysed and embedded, a failure
+    # surfaces on the retrieval queries
+    try:
+        await gdb_driver.verify_connectivity()
+    except Exception as e:
+        print(f"Chat graph connection failed: {e}")
+
+async def gather_sources(question: str, timings: Dict[str, float]) -> List[Dict[str, Any]]:
+    async with Neo4jSessionLocal() as (session, gdb_driver):
+        await session.close()
+        connecting = asyncio.create_task(connect(gdb_driver))
+        start = time.perf_counter()
+        analysis = await asyncio.to_thread(analyse_query, question)
+        timings["analysis"] = time.perf_counter() - start
+        chat_stats.count("scopes", analysis.scope)
+
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(retrieve_sources(gdb_driver, analysis, award_id))
+            for award_id in analysis.award_ids or [None]
+        ]
+        done, pending = await asyncio.wait(tasks, timeout=settings.CHAT_RETRIEVAL_TIMEOUT_SECONDS)
+        for task in [*pending, connecting]:
+            task.cancel()
+        # before the driver closes under them
+        await asyncio.gather(*pending, connecting, return_exceptions=True)
+        if pending:
+            chat_stats.counts["retrieval_timeouts"] += 1
+            print(f"Chat retrieval timed out for {len(pending)} of {len(tasks)} awards, answering from the rest")
+        results = []
+        for task in tasks:
+            if task not in done:
+                continue
+            if task.exception():
+                print(f"Chat retrieval failed: {task.exception()}")
+                continue
+            results.append(task.result())
+        timings["retrieval"] = time.perf_counter() - start
+    return interleave(results)[:settings.CHAT_MAX_SOURCES]
+
+def chat_messages(corpus: str, question: str, sources: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    system = {"role": "system", "content": prompts.qa_chat_sys_message.format(corpus=corpus)}
+    if not sources:
+        return [system, {"role": "user", "content": prompts.qa_chat_ungrounded_user_message.format(question=question, corpus=corpus)}]
+    names = award_names()
+    awards = ", ".join(dict.fromkeys(names.get(source["award_id"], source["award_id"]) for source in sources))
+    numbered = "\n\n".join(f"[{i}] {source['text']}" for i, source in enumerate(sources, 1))
+    return [system, {"role": "user", "content": prompts.qa_chat_user_message.format(question=question, sources=numbered, awards=awards)}]
+
+@dataclass
+class ChatAnswer:
+    text: str = ""
+    # cited source number -> clause id, and each cited clause by id
+    enumeration_mapping: Dict[str, str] = field(default_factory=dict)
+    references: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    # seconds per pipeline stage, see stream_chat_answer
+    timings: Dict[str, float] = field(default_factory=dict)
+
+def cite(answer: ChatAnswer, sources: List[Dict[str, Any]]) -> None:
+    for number in dict.fromkeys(ANSWER_REF.findall(answer.text)):
+        if not 0 < int(number) <= len(sources):
+            continue
+        source = sources[int(number) - 1]
+        answer.enumeration_mapping[number] = source["id"]
+        answer.references[source["id"]] = {
+            "id": source["id"],
+            "title": source["name"] or source["key"],
+            "content": source["content"] or "",
+        }
+
+async def stream_chat_answer(corpus: str, question: str, answer: ChatAnswer, grounded: bool = True) -> AsyncGenerator[str, None]:
+    """
+    Answers a qa chat question, yielding the answer as it's generated. A grounded question is
+    analysed locally (awards and clauses it names, else job title matches), the clauses of each
+    award are retrieved concurrently and rendered for the prompt as they arrive, and the answer
+    is streamed from the chat route citing them by number. Once the stream ends `answer` has the
+    citations and the timings: analysis, retrieval, assembly, first_token (model, from the prompt
+    being ready), time_to_first_token (from the question), generation and total.
+    """
+    start = time.perf_counter()
+    timings = answer.timings
+    sources = await gather_sources(question, timings) if grounded else []
+    assembly_start = time.perf_counter()
+    messages = chat_messages(corpus, question, sources)
+    prompt_ready = time.perf_counter()
+    timings["assembly"] = prompt_ready - assembly_start
+
+    first_token = None
+    async for chunk in llm.router.chat_stream("chat", messages):
+        if first_token is None:
+            first_token = time.perf_counter()
+            timings["first_token"] = first_token - prompt_ready
+            timings["time_to_first_token"] = first_token - start
+        answer.text += chunk
+        yield chunk
+    end = time.perf_counter()
+    timings["generation"] = end - (first_token or prompt_ready)
+    timings["total"] = end - start
+    cite(answer, sources)
+    chat_stats.record(timings)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+import prompts
+
+class SectionSelectionCache:
+    def __init__(self, max_size: int, pins_path: str):
+        """
+        Section choices keyed by (award id, award data version, column name, additional info,
+        prompt version, section strategy). They only depend on the award outline and the column definition, so
+        every row asking for the same column reuses the first answer.
+        Pins are operator approved section sets per (award, column) that always win over the
+        LLM, persisted to `pins_path`.
+        """
+        self.max_size = max_size
+        self.pins_path = Path(pins_path)
+        self.cache: OrderedDict[Tuple[str, ...], List[str]] = OrderedDict()
+        self.in_flight: Dict[Tuple[str, ...], asyncio.Future] = {}
+        self.pins: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.stats = {"pinned": 0, "hits": 0, "misses": 0}
+        self.load_pins()
+
+    @staticmethod
+    def key(award_id: str, column_name: str, additional_info: Optional[str], strategy: Optional[str] = None) -> Tuple[str, ...]:
+        return (
+            award_id,
+            settings.MA_DATA_VERSION,
+            column_name,
+            additional_info or "",
+            prompts.SECTION_CHOICE_PROMPT_VERSION,
+            strategy or settings.SECTION_STRATEGY,
+        )
+
+    def load_pins(self) -> None:
+        if self.pins_path.exists():
+            with open(self.pins_path, 'r') as file:
+                self.pins = {(pin["award_id"], pin["column_name"]): pin for pin in json.load(file)}
+
+    def save_pins(self) -> None:
+        with open(self.pins_path, 'w') as file:
+            json.dump(list(self.pins.values()), file, indent=2)
+
+    def get_pin(self, award_id: str, column_name: str) -> Optional[List[str]]:
+        pin = self.pins.get((award_id, column_name))
+        # a pin approved against older award data may name sections that no longer exist
+        if pin and pin["data_version"] == settings.MA_DATA_VERSION:
+            return pin["sections"]
+        return None
+
+    def pin(self, award_id: str, column_name: str, sections: List[str]) -> Dict[str, Any]:
+        pin = {
+            "award_id": award_id,
+            "column_name": column_name,
+            "sections": sections,
+            "data_version": settings.MA_DATA_VERSION,
+        }
+        self.pins[(award_id, column_name)] = pin
+        self.save_pins()
+        return pin
+
+    def unpin(self, award_id: str, column_name: str) -> Optional[Dict[str, Any]]:
+        pin = self.pins.pop((award_id, column_name), None)
+        if pin:
+            self.save_pins()
+        return pin
+
+    def get(self, award_id: str, column_name: str, additional_info: Optional[str] = None, strategy: Optional[str] = None) -> Optional[List[str]]:
+        pinned = self.get_pin(award_id, column_name)
+        if pinned is not None:
+            self.stats["pinned"] += 1
+            return pinned
+        key = self.key(award_id, column_name, additional_info, strategy)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return self.cache[key]
+        return None
+
+    def peek(self, award_id: str, column_name: str, additional_info: Optional[str] = None, strategy: Optional[str] = None) -> Optional[List[str]]:
+        # what get() would return, without counting it or refreshing the lru position (estimates)
+        pinned = self.get_pin(award_id, column_name)
+        if pinned is not None:
+            return pinned
+        return self.cache.get(self.key(award_id, column_name, additional_info, strategy))
+
+    def put(self, award_id: str, column_name: str, additional_info: Optional[str], sections: List[str], strategy: Optional[str] = None) -> None:
+        # an empty choice is a failed call rather than an answer
+        if not sections:
+            return
+        key = self.key(award_id, column_name, additional_info, strategy)
+        self.cache[key] = sections
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    async def get_or_choose(
+        self,
+        award_id: str,
+        column_name: str,
+        additional_info: Optional[str],
+        choose: Callable[[], Awaitable[List[str]]],
+        strategy: Optional[str] = None
+    ) -> List[str]:
+        cached = self.get(award_id, column_name, additional_info, strategy)
+        if cached is not None:
+            return cached
+        # a column fill asks for the same key from every row at once, only the first one calls the LLM
+        key = self.key(award_id, column_name, additional_info, strategy)
+        if key in self.in_flight:
+            self.stats["hits"] += 1
+            return await asyncio.shield(self.in_flight[key])
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            sections = await choose()
+            self.put(award_id, column_name, additional_info, sections, strategy)
+            future.set_result(sections)
+            return sections
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # waiters get the error, mark it retrieved in case there are none
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+
+section_cache = SectionSelectionCache(settings.SECTION_CACHE_SIZE, settings.SECTION_PINS_PATH)
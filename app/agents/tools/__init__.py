@@ -1 +1,7 @@
-from .ma_tools import classify_tools, section_choice_tools, provisions_tools
\ No newline at end of file
+from .ma_tools import (
+    classify_tools,
+    classify_batch_tools,
+    provisions_tools,
+    multi_provisions_tools,
+    section_choice_tools,
+)
@@ -34,6 +34,10 @@ classify_tools = [
                     "try_again": {
                         "type": "boolean",
                         "description": "If the award(s) do not cover the employee, set this to True to see additional awards."
+                    },
+                    "confidence": {
+                        "type": "number",
+                        "description": "How confident you are in this classification, from 0 (a guess) to 1 (certain)."
                     }
                 },
                 "required": ["award_id", "award_reasoning", "award_clauses", "level", "level_reasoning", "level_clauses"]
@@ -41,6 +45,36 @@ classify_tools = [
         }
     }
 ]
+classify_batch_tools = [
+    {
+        "type": "function",
+        "function": {
+            "name": "classify_employees",
+            "description": "Classify each of the employees under the correct Modern Award and level.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "classifications": {
+                        "type": "array",
+                        "description": "One classification for every employee provided.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "employee_id": {
+                                    "type": "string",
+                                    "description": "The id of the employee exactly as provided."
+                                },
+                                **classify_tools[0]["function"]["parameters"]["properties"]
+                            },
+                            "required": ["employee_id", "award_id", "award_reasoning", "award_clauses", "level", "level_reasoning", "level_clauses"]
+                        }
+                    }
+                },
+                "required": ["classifications"]
+            }
+        }
+    }
+]
 provisions_tools = [
     {
         "type": "function",
@@ -57,6 +91,10 @@ provisions_tools = [
                     "provision_clauses": {
                         "type": "string",
                         "description": "Array of strings, containing all clauses that you used to make your award decision. For example: [\"1.1\", \"34.2\", \"A.1.14\"]"
+                    },
+                    "confidence": {
+                        "type": "number",
+                        "description": "How confident you are that the clauses support this determination, from 0 (a guess) to 1 (certain)."
                     }
                 },
                 "required": ["provision", "provision_clauses"]
@@ -64,6 +102,36 @@ provisions_tools = [
         }
     }
 ]
+multi_provisions_tools = [
+    {
+        "type": "function",
+        "function": {
+            "name": "employee_provisions_multi",
+            "description": "Set the correct provisions and information about an employee for each of the requested fields based on their Modern Award and classification.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "provisions": {
+                        "type": "array",
+                        "description": "One entry for every requested field.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "field": {
+                                    "type": "string",
+                                    "description": "The requested field exactly as provided."
+                                },
+                                **provisions_tools[0]["function"]["parameters"]["properties"]
+                            },
+                            "required": ["field", "provision", "provision_clauses"]
+                        }
+                    }
+                },
+                "required": ["provisions"]
+            }
+        }
+    }
+]
 section_choice_tools = [
         {
             "type": "function",
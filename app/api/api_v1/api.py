@@ -1,12 +1,40 @@
+import asyncio
 from fastapi import APIRouter
 
+import agents, jobs
+from core.config import settings
+
 from api.api_v1.endpoints import (
     login,
     projects,
     chat,
+    sections,
+    metrics,
+    health,
 )
 
 api_router = APIRouter()
 api_router.include_router(login.router, prefix='/login', tags=["login"])
 api_router.include_router(projects.router, prefix='/projects', tags=["projects"])
-api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
\ No newline at end of file
+api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
+api_router.include_router(sections.router, prefix="/sections", tags=["sections"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+api_router.include_router(health.router, prefix="/health", tags=["health"])
+
+# held so the warm up task isn't garbage collected mid run
+startup_tasks = set()
+
+@api_router.on_event("startup")
+async def warm_caches():
+    # in the background, the app serves (and builds bundles on demand) while it runs
+    if settings.COVERAGE_WARMUP:
+        task = asyncio.create_task(agents.warm_coverage_cache())
+        startup_tasks.add(task)
+        task.add_done_callback(startup_tasks.discard)
+
+@api_router.on_event("startup")
+async def resume_jobs():
+    # generation jobs left pending or abandoned by a stopped worker carry on here
+    task = asyncio.create_task(jobs.runner.resume())
+    startup_tasks.add(task)
+    task.add_done_callback(startup_tasks.discard)
\ No newline at end of file
@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+import jobs, llm
+
+router = APIRouter()
+
+@router.get("/load")
+async def get_load():
+    # unauthenticated, for the load balancer's health check. always 200 while the worker is up,
+    # a busy worker answers new generation requests with a 429 from admission. "saturated" is
+    # when it couldn't admit even the smallest request (one cell), for balancers that weight by it
+    admission = jobs.admission.load()
+    scheduler = llm.scheduler.snapshot()
+    in_flight = admission["in_flight"]
+    saturated = in_flight > 0 and in_flight + jobs.cell_cost(1) > admission["budget"]
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "saturated" if saturated else "ok",
+            "admission": admission,
+            "llm_slots": {
+                "slots": scheduler["slots"],
+                "in_use": scheduler["in_use"],
+                "queued": sum(stats["queued"] for stats in scheduler["classes"].values()),
+            },
+            "jobs_running": len(jobs.runner.tasks),
+        }
+    )
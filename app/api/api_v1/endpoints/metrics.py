@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends
+
+import models, agents, llm
+from api import deps
+
+router = APIRouter()
+
+@router.get("/speculation")
+async def get_speculation_metrics(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    stats = agents.speculation_stats
+    return {
+        **stats,
+        "hit_rate": stats["hits"] / stats["rows"] if stats["rows"] else None,
+        "avg_latency_saved": stats["latency_saved"] / stats["hits"] if stats["hits"] else None,
+    }
+
+@router.get("/coverage")
+async def get_coverage_metrics(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    bundles = list(agents.coverage_cache.cache.values())
+    return {
+        "size": len(bundles),
+        **agents.coverage_cache.stats,
+        "tokens": sum(bundle.tokens for bundle in bundles),
+    }
+
+@router.get("/scheduler")
+async def get_scheduler_metrics(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    # slots in use and queue wait (seconds) per priority class
+    return llm.scheduler.snapshot()
+
+@router.get("/llm")
+async def get_llm_metrics(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    # calls, tokens, dollars and latency per model and stage
+    return llm.telemetry.snapshot()
+
+@router.get("/cascade")
+async def get_cascade_metrics(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    # escalation rate and reasons, and calls/latency per model tier, per cascaded stage
+    return agents.cascade.snapshot()
+
+@router.get("/router")
+async def get_router_metrics(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    # per stage routing decisions and where a call would go now, health per model
+    return llm.router.snapshot()
+
+@router.get("/chat")
+async def get_chat_metrics(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    # qa chat latency per pipeline stage, how questions were scoped and retrieved
+    return agents.chat_stats.snapshot()
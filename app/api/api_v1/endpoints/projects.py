@@ -1,19 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, UploadFile, File
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from neo4j import AsyncSession as Neo4jAsyncSession
 from neo4j import AsyncDriver
-import asyncio
-from typing import List, Dict, Any
-from uuid import UUID
+from typing import Iterator, List, Dict, Any, Optional
+from uuid import UUID, uuid4
+from contextlib import contextmanager
 import json
+import math
+import csv
+import io
 
-import crud, models, schemas, agents
+import crud, models, schemas, agents, jobs
 from db import ma_db
+from core.config import settings
+from models.generation_job import GenerationJob
 from api import deps
 
 router = APIRouter()
 
+# written by row creation and the classifier, every row has them and they're found by name
+CLASSIFIER_COLUMNS = ["Award", "Classification"]
+FIXED_COLUMNS = ["Employee", *CLASSIFIER_COLUMNS]
+
 PROJECT_MAPPING = {
     UUID('badbc443-b870-4fda-ae32-7db2e4bfd8b5'): {
         'name': 'Modern Awards',
@@ -89,16 +98,99 @@ async def get_project_table(
     if not table:
         raise HTTPException(status_code=404, detail="Table not found")
 
-    full_table = await crud.agtable.get_full_table(db=db, table_id=table.id)
-    return full_table
+    # postgres builds the json, the bytes are streamed straight through
+    return StreamingResponse(
+        crud.agtable.stream_full_table_json(db, table_id=table.id),
+        media_type="application/json"
+    )
+
+@router.get("/{project_id}/table/query")
+async def query_project_table(
+    project_id: UUID,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user),
+    award_id: Optional[str] = None,
+    level: Optional[str] = None,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    sort_desc: bool = False,
+    skip: int = 0,
+    limit: int = 100
+):
+    # filter/sort/paginate rows server side instead of downloading the full table
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    return await crud.agtable.query_rows(
+        db,
+        table_id=project.agtable.id,
+        award_id=award_id,
+        level=level,
+        search=search,
+        sort_by=sort_by,
+        descending=sort_desc,
+        skip=skip,
+        limit=min(limit, settings.TABLE_QUERY_MAX_LIMIT)
+    )
 
 
+@contextmanager
+def admit_job(cost: float) -> Iterator[UUID]:
+    # reserves the job's estimated llm work before anything is written, the id is the job's.
+    # the reservation is dropped if the request fails before the job is created
+    job_id = uuid4()
+    retry_after = jobs.admission.try_admit(job_id, cost)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too much generation work in progress, try again shortly",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    try:
+        yield job_id
+    except BaseException:
+        jobs.admission.cancel(job_id)
+        raise
+
+async def stream_job(
+    db: AsyncSession,
+    job_id: UUID,
+    table_id: UUID,
+    current_user: models.User,
+    kind: str,
+    priority: str,
+    background: bool,
+    params: Dict[str, Any],
+    lines: Optional[List[Dict[str, Any]]] = None
+) -> StreamingResponse:
+    # generation runs as a background job, the response just follows it and can be
+    # picked up again from /jobs/{job_id}/stream with the X-Job-Id header. the job is
+    # cancelled if the client disconnects, unless background is set. priority is its
+    # llm.scheduler class
+    job = await crud.generation_job.create_with_lines(db, obj_in=schemas.GenerationJobCreate(
+        id=job_id,
+        table_id=table_id,
+        user_id=current_user.id,
+        kind=kind,
+        params={**params, "priority": priority, "background": background, "cost": jobs.admission.cost(job_id)}
+    ), lines=lines)
+    await jobs.runner.submit(job.id)
+    return StreamingResponse(
+        jobs.runner.attach(job.id),
+        media_type="application/x-ndjson",
+        headers={"X-Job-Id": str(job.id)}
+    )
+
 @router.post("/{project_id}/rows/add")
 async def add_project_row(
     project_id: UUID,
     row_data: Dict[str, Any],
+    background: bool = False,
     db: AsyncSession = Depends(deps.get_db),
-    gdb: tuple[Neo4jAsyncSession, AsyncDriver] = Depends(deps.get_gdb),
     current_user: models.User = Depends(deps.get_current_user)
 ):  
     print(row_data)
@@ -109,75 +201,174 @@ async def add_project_row(
     if not project.agtable:
         raise HTTPException(status_code=400, detail="This project does not have an associated table")
 
-    employee_column = await crud.agtable_column.get_by_name(db=db, table_id=project.agtable.id, name='Employee')
-    if not employee_column:
-        employee_column = await crud.agtable_column.create(db=db, obj_in=schemas.AGTableColumnCreate(
-            table_id=project.agtable.id,
-            name='Employee',
-            order=1
-        ))
+    employee_data = row_data.get('EmployeeData', {})
+    pending_columns = sum(
+        1 for name, column in row_data.get('Columns', {}).items()
+        if name not in CLASSIFIER_COLUMNS and column.get('value') == ""
+    )
+    # checked before anything is written or reserved, a row without awards can't be generated
+    if not ma_db.get_awards(employee_data.get('industry'), employee_data.get('subIndustry')):
+        raise HTTPException(status_code=404, detail="No awards found for this industry")
 
-    row_count = await crud.agtable.get_row_count(db=db, table_id=project.agtable.id)
+    with admit_job(jobs.row_cost(employee_data, pending_columns)) as job_id:
+        employee_column = await crud.agtable_column.get_by_name(db=db, table_id=project.agtable.id, name='Employee')
+        if not employee_column:
+            employee_column = await crud.agtable_column.create(db=db, obj_in=schemas.AGTableColumnCreate(
+                table_id=project.agtable.id,
+                name='Employee',
+                order=1
+            ))
 
-    row_create_data = {
-        "table_id": project.agtable.id,
-        "order": row_count + 1
-    }
+        row_count = await crud.agtable.get_row_count(db=db, table_id=project.agtable.id)
+
+        row_create_data = {
+            "table_id": project.agtable.id,
+            "order": row_count + 1
+        }
 
-    # include the ID if it's present in row_data
-    if 'id' in row_data:
-        row_create_data["id"] = UUID(row_data['id'])
-        new_row = await crud.agtable_row.create_with_id(db=db, obj_in=schemas.AGTableRowCreate(**row_create_data))
+        # include the ID if it's present in row_data
+        if 'id' in row_data:
+            row_create_data["id"] = UUID(row_data['id'])
+            new_row = await crud.agtable_row.create_with_id(db=db, obj_in=schemas.AGTableRowCreate(**row_create_data))
+        else:
+            new_row = await crud.agtable_row.create(db=db, obj_in=schemas.AGTableRowCreate(**row_create_data))
+
+        # create the 'Employee' cell with EmployeeData (conforming to FE schema)
+        employee_name = employee_data.get('fullName', '')
+        employee_cell_data = schemas.AGTableCellCreate(
+            row_id=new_row.id,
+            column_id=employee_column.id,
+            value={
+                "Employee": employee_name,
+                "EmployeeData": employee_data
+            }
+        )
+        await crud.agtable_cell.create(db=db, obj_in=employee_cell_data)
+
+        # a single row streams its results unwrapped
+        return await stream_job(db, job_id, project.agtable.id, current_user, "rows", "interactive", background, {
+            "rows": [{**row_data, "id": str(new_row.id)}],
+            "wrap": False
+        })
+
+def parse_employee_import(filename: str, content: bytes) -> List[schemas.EmployeeData]:
+    # every error is a ValueError naming the line, a bad upload is a 400 not a server error
+    text = content.decode("utf-8-sig")
+    records = []
+    if filename.lower().endswith(".csv"):
+        reader = csv.DictReader(io.StringIO(text))
+        try:
+            for record in reader:
+                record = {k: v for k, v in record.items() if v not in (None, "")}
+                # qualifications are ; separated in a csv cell
+                record["qualifications"] = [q.strip() for q in record.get("qualifications", "").split(";") if q.strip()]
+                records.append((reader.reader.line_num, record))
+        except csv.Error as e:
+            raise ValueError(f"line {reader.reader.line_num}: {e}") from e
     else:
-        new_row = await crud.agtable_row.create(db=db, obj_in=schemas.AGTableRowCreate(**row_create_data))
+        for line_num, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {line_num}: {e}") from e
+            if not isinstance(record, dict):
+                raise ValueError(f"line {line_num}: expected a JSON object")
+            records.append((line_num, record))
+    employees = []
+    for line_num, record in records:
+        try:
+            employees.append(schemas.EmployeeData(**record))
+        except ValueError as e:
+            raise ValueError(f"line {line_num}: {e}") from e
+    return employees
+
+@router.post("/{project_id}/rows/import/estimate")
+async def estimate_project_rows_import(
+    project_id: UUID,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(deps.get_db),
+    gdb: tuple[Neo4jAsyncSession, AsyncDriver] = Depends(deps.get_gdb),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    # expected calls, tokens, dollars and seconds of importing this file, nothing is written
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-    # create the 'Employee' cell with EmployeeData (conforming to FE schema)
-    employee_data = row_data.get('EmployeeData', {})
-    employee_name = employee_data.get('fullName', '')
-    employee_cell_data = schemas.AGTableCellCreate(
-        row_id=new_row.id,
-        column_id=employee_column.id,
-        value={
-            "Employee": employee_name,
-            "EmployeeData": employee_data
-        }
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    try:
+        employees = parse_employee_import(file.filename or "", await file.read())
+    except (ValueError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid employee import: {e}")
+
+    columns = await crud.agtable_column.get_by_table(db, table_id=project.agtable.id)
+    return await agents.estimator.estimate_import(
+        gdb[1],
+        [employee.model_dump() for employee in employees],
+        [(column.name, column.additional_info or "") for column in columns if column.name not in FIXED_COLUMNS]
     )
-    await crud.agtable_cell.create(db=db, obj_in=employee_cell_data)
 
-    industry = employee_data.get('industry')
-    subindustry = employee_data.get('subIndustry')
-    award_data = ma_db.get_awards(industry, subindustry)
+@router.post("/{project_id}/rows/import")
+async def import_project_rows(
+    project_id: UUID,
+    file: UploadFile = File(...),
+    background: bool = False,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-    if not award_data:
-        raise HTTPException(status_code=404, detail="No awards found for this industry")
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    try:
+        employees = parse_employee_import(file.filename or "", await file.read())
+    except (ValueError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid employee import: {e}")
+    if not employees:
+        raise HTTPException(status_code=400, detail="No employees found in import")
+
+    # existing provision columns get filled for the new rows too
+    columns = await crud.agtable_column.get_by_table(db, table_id=project.agtable.id)
+    row_columns = {
+        column.name: {"name": column.name, "additionalInfo": column.additional_info or "", "value": ""}
+        for column in columns
+        if column.name not in FIXED_COLUMNS
+    }
+    employee_data = [employee.model_dump() for employee in employees]
+    with admit_job(sum(jobs.row_cost(data, len(row_columns), batched=True) for data in employee_data)) as job_id:
+        employee_column = await crud.agtable_column.get_by_name(db=db, table_id=project.agtable.id, name='Employee')
+        if not employee_column:
+            employee_column = await crud.agtable_column.create(db=db, obj_in=schemas.AGTableColumnCreate(
+                table_id=project.agtable.id,
+                name='Employee',
+                order=1
+            ))
+
+        row_count = await crud.agtable.get_row_count(db=db, table_id=project.agtable.id)
+        row_ids = await crud.agtable_row.bulk_create_employee_rows(
+            db,
+            table_id=project.agtable.id,
+            employee_column_id=employee_column.id,
+            start_order=row_count + 1,
+            employees=employee_data
+        )
+
+        rows = [
+            {"id": str(row_id), "EmployeeData": data, "Columns": dict(row_columns)}
+            for row_id, data in zip(row_ids, employee_data)
+        ]
 
-    # function to stream the row data
-    async def generate_row_data_stream():
-        async for result in agents.generate_row_data(gdb[0], row_data, award_data):
-            for column_name, value in result.items():
-                # get or create the column
-                column = await crud.agtable_column.get_by_name(db=db, table_id=project.agtable.id, name=column_name)
-                if not column:
-                    column_count = await crud.agtable_column.get_column_count(db=db, table_id=project.agtable.id)
-                    column = await crud.agtable_column.create(db=db, obj_in=schemas.AGTableColumnCreate(
-                        table_id=project.agtable.id,
-                        name=column_name,
-                        order=column_count + 1
-                        # it doesn't matter that we're not passing additional_info here
-                        # this should never be called 
-                    ))
-                # create or update the cell
-                cell_data = schemas.AGTableCellCreate(
-                    row_id=new_row.id,
-                    column_id=column.id,
-                    value=value
-                )
-                # now adding the references to the cells - not scalable
-                await crud.agtable_cell.update_or_create(db=db, obj_in=cell_data)
-                
-            yield json.dumps(result) + "\n"
-
-    return StreamingResponse(generate_row_data_stream(), media_type="application/x-ndjson")
+        return await stream_job(
+            db, job_id, project.agtable.id, current_user, "rows", "bulk", background, {"rows": rows, "wrap": True},
+            lines=[{"rows": [{"id": row["id"], "Employee": row["EmployeeData"]["fullName"]} for row in rows]}]
+        )
 
 @router.post("/{project_id}/rows/delete")
 async def delete_project_rows(
@@ -201,13 +392,35 @@ async def delete_project_rows(
 
     return {"message": f"Successfully deleted {len(deleted_rows)} rows and their associated cells"}
 
+@router.post("/{project_id}/columns/estimate")
+async def estimate_project_column(
+    project_id: UUID,
+    column_data: Dict[str, str] = Body(..., embed=True),
+    row_ids: Optional[List[UUID]] = Body(None),
+    db: AsyncSession = Depends(deps.get_db),
+    gdb: tuple[Neo4jAsyncSession, AsyncDriver] = Depends(deps.get_gdb),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    # expected calls, tokens, dollars and seconds of adding this column, nothing is written
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    award_rows = await crud.agtable_cell.count_rows_by_award(db, table_id=project.agtable.id, row_ids=row_ids)
+    return await agents.estimator.estimate_column(
+        gdb[1], award_rows, column_data['name'], column_data.get('additionalInfo', '')
+    )
+
 @router.post("/{project_id}/columns/add")
 async def add_project_column(
     project_id: UUID,
     column_data: Dict[str, str] = Body(..., embed=True),
-    rows: List[Dict[str, Any]] = Body(...),
+    row_ids: Optional[List[UUID]] = Body(None),
+    background: bool = False,
     db: AsyncSession = Depends(deps.get_db),
-    gdb: tuple[Neo4jAsyncSession, AsyncDriver] = Depends(deps.get_gdb),
     current_user: models.User = Depends(deps.get_current_user)
 ):  
     project = await crud.project.get(db=db, id=project_id, user=current_user)
@@ -217,31 +430,70 @@ async def add_project_column(
     if not project.agtable:
         raise HTTPException(status_code=400, detail="This project does not have an associated table")
 
-    column_count = await crud.agtable_column.get_column_count(db=db, table_id=project.agtable.id)
-
-    new_column = await crud.agtable_column.create(
-        db=db,
-        obj_in=schemas.AGTableColumnCreate(
-            table_id=project.agtable.id,
-            name=column_data['name'],
-            order=column_count + 1,
-            additional_info=column_data.get('additionalInfo', '')
+    row_count = len(row_ids) if row_ids is not None else await crud.agtable.get_row_count(db=db, table_id=project.agtable.id)
+    with admit_job(jobs.cell_cost(row_count)) as job_id:
+        column_count = await crud.agtable_column.get_column_count(db=db, table_id=project.agtable.id)
+
+        new_column = await crud.agtable_column.create(
+            db=db,
+            obj_in=schemas.AGTableColumnCreate(
+                table_id=project.agtable.id,
+                name=column_data['name'],
+                order=column_count + 1,
+                additional_info=column_data.get('additionalInfo', '')
+            )
         )
-    )
-    async def generate_column_data_stream():
-        async for result in agents.generate_column_data(gdb[1], column_data, rows): # maybe all gdb instances should use driver > session bc coroutine
-            for row_id, column_value in result.items():
-                # create or update the cell for this row and the new column
-                cell_data = schemas.AGTableCellCreate(
-                    row_id=UUID(row_id),
-                    column_id=new_column.id,
-                    value=column_value
-                )
-                await crud.agtable_cell.update_or_create(db=db, obj_in=cell_data)
+        return await stream_job(db, job_id, project.agtable.id, current_user, "columns", "column", background, {"columns": [{
+            "column_id": str(new_column.id),
+            "row_ids": [str(row_id) for row_id in row_ids] if row_ids is not None else None
+        }]})
+
+@router.post("/{project_id}/columns/edit")
+async def edit_project_column(
+    project_id: UUID,
+    column_data: Dict[str, str] = Body(..., embed=True),
+    background: bool = False,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-                yield json.dumps({row_id: column_value}) + "\n"
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    column_name = column_data.get('column_name')
+    if not column_name:
+        raise HTTPException(status_code=400, detail="Column name is required")
+
+    if column_name in FIXED_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Column '{column_name}' can't be edited")
+
+    column = await crud.agtable_column.get_by_name(db, table_id=project.agtable.id, name=column_name)
+    if not column:
+        raise HTTPException(status_code=404, detail="Column not found")
+
+    new_name = column_data.get('name', column.name)
+    if new_name in FIXED_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Column name '{new_name}' is reserved")
+    if new_name != column.name and await crud.agtable_column.get_by_name(db, table_id=project.agtable.id, name=new_name):
+        raise HTTPException(status_code=400, detail=f"Column '{new_name}' already exists")
+
+    # every row is counted, how many are stale isn't known until the job reads them
+    with admit_job(jobs.cell_cost(await crud.agtable.get_row_count(db=db, table_id=project.agtable.id))) as job_id:
+        # the column keeps its id and order, only cells whose inputs changed are recomputed
+        column = await crud.agtable_column.update_definition(
+            db,
+            column=column,
+            name=new_name,
+            additional_info=column_data.get('additionalInfo', column.additional_info)
+        )
 
-    return StreamingResponse(generate_column_data_stream(), media_type="application/x-ndjson")
+        return await stream_job(db, job_id, project.agtable.id, current_user, "columns", "column", background, {"columns": [{
+            "column_id": str(column.id),
+            "only_stale": True
+        }]})
 
 @router.post("/{project_id}/columns/delete")
 async def delete_project_column(
@@ -270,4 +522,191 @@ async def delete_project_column(
     # reorder remaining columns
     await crud.agtable_column.reorder_columns(db, table_id=project.agtable.id)
 
-    return {"message": f"Column '{column_name}' and its associated cells have been deleted"}
\ No newline at end of file
+    return {"message": f"Column '{column_name}' and its associated cells have been deleted"}
+### Citation index endpoints
+@router.post("/{project_id}/citations/affected", response_model=List[schemas.AGCellCitationAffected])
+async def get_affected_cells(
+    project_id: UUID,
+    citation_query: schemas.AGCellCitationQuery,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    return await crud.agcell_citation.get_affected_cells(
+        db, table_id=project.agtable.id, award_id=citation_query.award_id, clause_keys=citation_query.clause_keys
+    )
+
+@router.post("/{project_id}/citations/recompute")
+async def recompute_affected_cells(
+    project_id: UUID,
+    citation_query: schemas.AGCellCitationQuery,
+    background: bool = False,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    affected = await crud.agcell_citation.get_affected_cells(
+        db, table_id=project.agtable.id, award_id=citation_query.award_id, clause_keys=citation_query.clause_keys
+    )
+
+    # provision columns are re-run for the affected rows only, Award/Classification cells
+    # would invalidate the whole row so they're reported back for a reclassification instead
+    rows_by_column: Dict[UUID, List[UUID]] = {}
+    reclassify_rows = []
+    for cell in affected:
+        if cell["column_name"] in CLASSIFIER_COLUMNS:
+            reclassify_rows.append(str(cell["row_id"]))
+        else:
+            rows_by_column.setdefault(cell["column_id"], []).append(cell["row_id"])
+
+    column_names = {cell["column_id"]: cell["column_name"] for cell in affected}
+    with admit_job(jobs.cell_cost(sum(len(row_ids) for row_ids in rows_by_column.values()))) as job_id:
+        return await stream_job(db, job_id, project.agtable.id, current_user, "columns", "column", background, {
+            "columns": [
+                {
+                    "column_id": str(column_id),
+                    "row_ids": [str(row_id) for row_id in row_ids],
+                    "line_key": column_names[column_id]
+                }
+                for column_id, row_ids in rows_by_column.items()
+            ],
+            "final_line": {"requires_reclassification": list(dict.fromkeys(reclassify_rows))}
+        })
+
+### Failed cell endpoints
+@router.post("/{project_id}/cells/failed", response_model=List[schemas.AGTableCellFailed])
+async def get_failed_cells(
+    project_id: UUID,
+    failed_query: schemas.AGTableCellFailedQuery,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    return await crud.agtable_cell.get_failed_cells(
+        db, table_id=project.agtable.id, column_ids=failed_query.column_ids, row_ids=failed_query.row_ids
+    )
+
+@router.post("/{project_id}/cells/retry")
+async def retry_failed_cells(
+    project_id: UUID,
+    failed_query: schemas.AGTableCellFailedQuery,
+    background: bool = False,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if not project.agtable:
+        raise HTTPException(status_code=400, detail="This project does not have an associated table")
+
+    failed = await crud.agtable_cell.get_failed_cells(
+        db, table_id=project.agtable.id, column_ids=failed_query.column_ids, row_ids=failed_query.row_ids
+    )
+    if not failed:
+        raise HTTPException(status_code=404, detail="No failed cells")
+
+    # only the failed cells are re-run, from the row's stored award/classification and the
+    # cached section choices, streamed per column like a citation recompute
+    rows_by_column: Dict[UUID, List[UUID]] = {}
+    column_names = {}
+    for cell in failed:
+        rows_by_column.setdefault(cell["column_id"], []).append(cell["row_id"])
+        column_names[cell["column_id"]] = cell["column_name"]
+    with admit_job(jobs.cell_cost(len(failed))) as job_id:
+        return await stream_job(db, job_id, project.agtable.id, current_user, "columns", "column", background, {
+            "columns": [
+                {
+                    "column_id": str(column_id),
+                    "row_ids": [str(row_id) for row_id in row_ids],
+                    "line_key": column_names[column_id]
+                }
+                for column_id, row_ids in rows_by_column.items()
+            ]
+        })
+
+### Generation job endpoints
+async def get_project_job(db: AsyncSession, project_id: UUID, job_id: UUID, current_user: models.User) -> GenerationJob:
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project or not project.agtable:
+        raise HTTPException(status_code=404, detail="Project not found")
+    job = await crud.generation_job.get(db, id=job_id)
+    if not job or job.table_id != project.agtable.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{project_id}/jobs", response_model=List[schemas.GenerationJobStatus])
+async def get_project_jobs(
+    project_id: UUID,
+    active_only: bool = True,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    project = await crud.project.get(db=db, id=project_id, user=current_user)
+    if not project or not project.agtable:
+        raise HTTPException(status_code=404, detail="Project not found")
+    table_jobs = await crud.generation_job.get_by_table(db, table_id=project.agtable.id, active_only=active_only)
+    return [
+        schemas.GenerationJobStatus.model_validate(job).model_copy(update={"line_count": await crud.generation_job.count_results(db, job_id=job.id)})
+        for job in table_jobs
+    ]
+
+@router.get("/{project_id}/jobs/{job_id}", response_model=schemas.GenerationJobStatus)
+async def get_project_job_status(
+    project_id: UUID,
+    job_id: UUID,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    job = await get_project_job(db, project_id, job_id, current_user)
+    status = schemas.GenerationJobStatus.model_validate(job)
+    return status.model_copy(update={"line_count": await crud.generation_job.count_results(db, job_id=job.id)})
+
+@router.get("/{project_id}/jobs/{job_id}/stream")
+async def stream_project_job(
+    project_id: UUID,
+    job_id: UUID,
+    background: Optional[bool] = None,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    # replays everything the job has produced so far, then follows it to the end. background
+    # overrides whether a disconnect cancels the job, unset it's what the job was started with
+    job = await get_project_job(db, project_id, job_id, current_user)
+    return StreamingResponse(
+        jobs.runner.attach(job.id, background=background),
+        media_type="application/x-ndjson",
+        headers={"X-Job-Id": str(job.id)}
+    )
+
+@router.post("/{project_id}/jobs/{job_id}/cancel")
+async def cancel_project_job(
+    project_id: UUID,
+    job_id: UUID,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    # cells already written stay, the rest of the job's llm and graph work is dropped
+    job = await get_project_job(db, project_id, job_id, current_user)
+    if not await jobs.runner.cancel(job.id):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    return {"message": "Job cancelled"}
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List
+
+import models, schemas
+from agents import section_cache
+from api import deps
+
+router = APIRouter()
+
+@router.get("/pins", response_model=List[schemas.SectionPin])
+async def get_section_pins(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    return list(section_cache.pins.values())
+
+@router.post("/pins", response_model=schemas.SectionPin)
+async def pin_sections(
+    pin: schemas.SectionPinCreate,
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    # approved sections for an (award, column) are used for every row, skipping the LLM
+    if not pin.sections:
+        raise HTTPException(status_code=400, detail="At least one section is required")
+    return section_cache.pin(pin.award_id, pin.column_name, pin.sections)
+
+@router.post("/pins/delete", response_model=schemas.SectionPin)
+async def unpin_sections(
+    pin: schemas.SectionPinBase,
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    removed = section_cache.unpin(pin.award_id, pin.column_name)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Pin not found")
+    return removed
+
+@router.get("/cache")
+async def get_section_cache_stats(
+    current_user: models.User = Depends(deps.get_current_active_admin_user)
+):
+    return {"size": len(section_cache.cache), "pins": len(section_cache.pins), **section_cache.stats}
@@ -0,0 +1,62 @@
+"""
+Tokens and wall time per employee: classify_employee once per employee vs classify_employees batches.
+
+Takes an NDJSON file of EmployeeData (same format as /rows/import), only the first industry/subindustry
+group is used so every employee shares the same coverage context. Needs the graph and OpenAI keys.
+Run from app/: python -m benchmarks.bench_classify_batch employees.ndjson [employees] [batch_size]
+"""
+import asyncio
+import json
+import sys
+import time
+
+import agents
+from core.config import settings
+from db import ma_db
+from gdb.session import Neo4jSessionLocal
+
+async def run_single(employees, award_info):
+    usage = {}
+    start = time.perf_counter()
+    await asyncio.gather(*[agents.classify_employee(data, award_info, usage) for data in employees.values()])
+    return usage, time.perf_counter() - start
+
+async def run_batched(employees, award_info, batch_size):
+    usage = {}
+    items = list(employees.items())
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        agents.classify_employees(dict(items[i:i + batch_size]), award_info, usage)
+        for i in range(0, len(items), batch_size)
+    ])
+    return usage, time.perf_counter() - start
+
+async def main(path: str, n_employees: int = 10, batch_size: int = settings.CLASSIFY_BATCH_SIZE):
+    with open(path) as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    group = (records[0]["industry"], records[0].get("subIndustry", ""))
+    employees = {
+        f"emp-{i}": record
+        for i, record in enumerate(r for r in records if (r["industry"], r.get("subIndustry", "")) == group)
+        if i < n_employees
+    }
+    award_data = ma_db.get_awards(*group)
+
+    async with Neo4jSessionLocal() as (_, driver):
+        award_info, _ = await agents.build_coverage_context(driver, award_data)
+
+    print(f"{len(employees)} employees in {group}, {len(award_data)} candidate award(s), batch size {batch_size}")
+    for name, (usage, elapsed) in [
+        ("single", await run_single(employees, award_info)),
+        ("batched", await run_batched(employees, award_info, batch_size)),
+    ]:
+        n = len(employees)
+        print(
+            f"{name:<8} calls {usage.get('calls', 0):3d}"
+            f"  prompt tokens/employee {usage.get('prompt_tokens', 0) / n:9.0f}"
+            f"  completion tokens/employee {usage.get('completion_tokens', 0) / n:6.0f}"
+            f"  wall {elapsed:6.1f} s ({elapsed / n:5.2f} s/employee)"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1], *[int(arg) for arg in sys.argv[2:]]))
@@ -0,0 +1,89 @@
+"""
+ma_db startup time, memory and lookup latency: the old load-everything-and-walk MADatabase vs the
+compiled one, cold (JSON parse + compile + snapshot write) and warm (snapshot load).
+
+Uses the real award JSON, the snapshot goes to a temp dir so the one next to the JSON is untouched.
+Run from app/: python -m benchmarks.bench_ma_db [repeats]
+"""
+import gc
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from db.ma_db_init import DB_PATH, MADatabase
+
+class LegacyMADatabase:
+    # the walk over the raw JSON MADatabase used to do on every lookup
+    def __init__(self):
+        with open(DB_PATH, 'r') as file:
+            self.data = json.load(file)
+
+    def get_awards(self, industry, subindustry=None):
+        awards = []
+        if industry in self.data:
+            if subindustry and subindustry in self.data[industry]:
+                groups = [self.data[industry][subindustry]]
+            else:
+                groups = self.data[industry].values()
+            for group in groups:
+                for award_id, award_data in group.items():
+                    awards.append({"award_id": award_id, "award_name": award_data["Award Name"], "coverage_clauses": award_data["Coverage Clauses"]})
+        return awards
+
+    def get_jobs(self, industry, subindustry=None):
+        groups = [self.data[industry][subindustry]] if subindustry and subindustry in self.data[industry] else self.data[industry].values()
+        return [job for group in groups for award_data in group.values() for job in award_data["Jobs"]]
+
+    def get_qualifications(self, industry, subindustry=None):
+        groups = [self.data[industry][subindustry]] if subindustry and subindustry in self.data[industry] else self.data[industry].values()
+        return list({q for group in groups for award_data in group.values() for q in award_data["Qualifications"]})
+
+def measure_load(load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    database = load()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return database, elapsed, current, peak
+
+def lookup_latency(database, keys, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for industry, subindustry in keys:
+            database.get_awards(industry, subindustry)
+            database.get_jobs(industry, subindustry)
+            database.get_qualifications(industry, subindustry)
+        timings.append((time.perf_counter() - start) / len(keys))
+    return statistics.median(timings)
+
+def main(repeats: int = 20):
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = Path(tmp) / "ma_db.pickle"
+
+        def compiled_load():
+            database = MADatabase(DB_PATH, snapshot)
+            database.load_data()
+            return database
+
+        legacy, legacy_time, legacy_mem, legacy_peak = measure_load(LegacyMADatabase)
+        _, cold_time, _, cold_peak = measure_load(compiled_load)
+        compiled, warm_time, warm_mem, warm_peak = measure_load(compiled_load)
+
+        keys = [(industry, None) for industry in legacy.data]
+        keys += [(industry, subindustry) for industry, subindustries in legacy.data.items() for subindustry in subindustries]
+        print(f"{len(keys)} industry/subindustry lookups, snapshot {snapshot.stat().st_size / 1e6:.1f} MB")
+        print(f"{'legacy json':<28} load {legacy_time * 1000:8.1f} ms  retained {legacy_mem / 1e6:6.1f} MB  peak {legacy_peak / 1e6:6.1f} MB")
+        print(f"{'compiled, cold (json)':<28} load {cold_time * 1000:8.1f} ms  {'':>18}  peak {cold_peak / 1e6:6.1f} MB")
+        print(f"{'compiled, warm (snapshot)':<28} load {warm_time * 1000:8.1f} ms  retained {warm_mem / 1e6:6.1f} MB  peak {warm_peak / 1e6:6.1f} MB")
+        for name, database in [("legacy", legacy), ("compiled", compiled)]:
+            print(f"{name:<10} awards+jobs+qualifications per lookup {lookup_latency(database, keys, repeats) * 1e6:8.1f} us")
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
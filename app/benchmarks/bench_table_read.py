@@ -0,0 +1,93 @@
+"""
+GET /projects/{id}/table read paths at ~10k cells: get_full_table + jsonable_encoder + json.dumps
+(what fastapi does with the returned dict) vs the postgres built json passthrough.
+
+Seeds a throwaway table inside a transaction against the configured postgres and rolls it back.
+Run from app/: python -m benchmarks.bench_table_read [rows] [columns] [repeats]
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+from uuid import uuid4
+from fastapi.encoders import jsonable_encoder
+
+import crud
+from db.session import SessionLocal
+from models.user import User
+from models.project import Project
+from models.agtable import AGTable, AGTableColumn, AGTableRow, AGTableCell
+
+def cell_value(column_name: str, row_index: int) -> dict:
+    ref_content = {
+        f"{n}.{row_index % 7}": {
+            "id": f"MA000004:{n}.{row_index % 7}",
+            "key": f"{n}.{row_index % 7}",
+            "title": "Ordinary hours of work",
+            "content": "An employee's ordinary hours of work must not exceed 38 per week. " * 4
+        }
+        for n in (14, 15)
+    }
+    if column_name == "Employee":
+        return {"Employee": f"Employee {row_index}", "EmployeeData": {"fullName": f"Employee {row_index}", "industry": "Retail"}}
+    if column_name == "Award":
+        return {"MA000004": {"reasoning": "Covered by the General Retail Industry Award.", "citations": ["4.1"]}, "ref_content": ref_content}
+    if column_name == "Classification":
+        return {f"Level {row_index % 8 + 1}": {"reasoning": "Duties match the level.", "citations": ["A.1.2"]}, "ref_content": ref_content}
+    return {"Completed": {"answer": f"{column_name} entitlement for employee {row_index}. " * 6, "citations": ["14.1", "15.2"]}, "ref_content": ref_content}
+
+async def seed(db, n_rows: int, n_columns: int) -> AGTable:
+    user = User(email=f"bench-{uuid4()}@qxd.ai", full_name="bench")
+    db.add(user)
+    await db.flush()
+    project = Project(name="bench", project_type="table", user_id=user.id)
+    db.add(project)
+    await db.flush()
+    table = AGTable(name="bench", project_id=project.id)
+    db.add(table)
+    await db.flush()
+    names = ["Employee", "Award", "Classification"] + [f"Column {i}" for i in range(n_columns - 3)]
+    columns = [AGTableColumn(table_id=table.id, name=name, order=i + 1) for i, name in enumerate(names)]
+    rows = [AGTableRow(table_id=table.id, order=i + 1) for i in range(n_rows)]
+    db.add_all(columns + rows)
+    await db.flush()
+    db.add_all([
+        AGTableCell(row_id=row.id, column_id=column.id, value=cell_value(column.name, i))
+        for i, row in enumerate(rows)
+        for column in columns
+    ])
+    await db.flush()
+    return table
+
+async def current_path(db, table_id) -> bytes:
+    full_table = await crud.agtable.get_full_table(db=db, table_id=table_id)
+    return json.dumps(jsonable_encoder(full_table)).encode()
+
+async def passthrough_path(db, table_id) -> bytes:
+    return "".join([chunk async for chunk in crud.agtable.stream_full_table_json(db, table_id=table_id)]).encode()
+
+async def main(n_rows: int = 1000, n_columns: int = 10, repeats: int = 10):
+    async with SessionLocal() as db:
+        table = await seed(db, n_rows, n_columns)
+        try:
+            current = json.loads(await current_path(db, table.id))
+            passthrough = json.loads(await passthrough_path(db, table.id))
+            assert current == passthrough, "read paths returned different documents"
+
+            print(f"{n_rows} rows x {n_columns} columns = {n_rows * n_columns} cells")
+            for name, path in [("get_full_table + jsonable_encoder", current_path), ("postgres json passthrough", passthrough_path)]:
+                timings = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    body = await path(db, table.id)
+                    timings.append(time.perf_counter() - start)
+                print(
+                    f"{name:<36} median {statistics.median(timings) * 1000:8.1f} ms"
+                    f"  min {min(timings) * 1000:8.1f} ms  body {len(body) / 1e6:.1f} MB"
+                )
+        finally:
+            await db.rollback()
+
+if __name__ == "__main__":
+    asyncio.run(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,60 @@
+"""
+Lexical section selection vs the LLM's choices on logged queries.
+
+Takes the JSONL written when SECTION_CHOICE_LOG_PATH is set (one LLM outline choice per line),
+only lines for the current MA_DATA_VERSION are used. Reports agreement (precision/recall/jaccard
+against the LLM's sections, top-1 hit), how often the lexical choice would be trusted on its own
+and the selection latency with the indexes warm. Needs the graph, no LLM calls are made.
+Run from app/: python -m benchmarks.eval_lexical_sections section_choices.jsonl
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from core.config import settings
+from gdb.session import Neo4jSessionLocal
+from retrieval import lexical_retriever, column_query
+
+async def main(path: str):
+    with open(path) as file:
+        queries = [json.loads(line) for line in file if line.strip()]
+    queries = [query for query in queries if query.get("data_version") == settings.MA_DATA_VERSION]
+    if not queries:
+        print(f"no logged choices for data version {settings.MA_DATA_VERSION}")
+        return
+
+    async with Neo4jSessionLocal() as (gdb, _):
+        for award_id in {query["award_id"] for query in queries}:
+            await lexical_retriever.get_index(gdb, award_id)
+
+    precisions, recalls, jaccards, top1, confident, timings = [], [], [], [], [], []
+    for query in queries:
+        index = lexical_retriever.indexes[(query["award_id"], settings.MA_DATA_VERSION)]
+        start = time.perf_counter()
+        ranking = index.rank(column_query(query["column_name"], query["additional_info"]), settings.LEXICAL_SHORTLIST_SIZE)
+        selected = ranking.selected(settings.LEXICAL_RELATIVE_THRESHOLD, settings.LEXICAL_MAX_SECTIONS)
+        timings.append(time.perf_counter() - start)
+
+        expected, chosen = set(query["sections"]), set(selected)
+        overlap = len(expected & chosen)
+        precisions.append(overlap / len(chosen) if chosen else 0.0)
+        recalls.append(overlap / len(expected))
+        jaccards.append(overlap / len(expected | chosen))
+        top1.append(bool(selected) and selected[0] in expected)
+        confident.append(bool(selected) and ranking.confidence >= settings.LEXICAL_MIN_CONFIDENCE)
+
+    n = len(queries)
+    agreeing_confident = [jaccard for jaccard, sure in zip(jaccards, confident) if sure]
+    print(f"{n} logged choices over {len({query['award_id'] for query in queries})} award(s)")
+    print(f"precision {statistics.mean(precisions):.3f}  recall {statistics.mean(recalls):.3f}  jaccard {statistics.mean(jaccards):.3f}  top-1 {sum(top1) / n:.3f}")
+    print(
+        f"confident (>= {settings.LEXICAL_MIN_CONFIDENCE}) {sum(confident) / n:.3f}"
+        + (f", jaccard when confident {statistics.mean(agreeing_confident):.3f}" if agreeing_confident else "")
+    )
+    timings.sort()
+    print(f"selection latency median {statistics.median(timings) * 1e3:.3f} ms  p99 {timings[int(0.99 * (n - 1))] * 1e3:.3f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1]))
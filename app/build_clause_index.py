@@ -0,0 +1,23 @@
+import asyncio
+import sys
+import time
+from core.config import settings
+from crud.crud_gdb import ma_gdb
+from gdb.session import Neo4jSessionLocal
+from retrieval import VectorIndex, get_embedder
+
+async def build_clause_index(path: str = settings.CLAUSE_INDEX_PATH):
+    embedder = get_embedder()
+    async with Neo4jSessionLocal() as (gdb, _):
+        clauses = await ma_gdb.fetch_all_clauses(gdb)
+        await gdb.close()
+
+    start = time.perf_counter()
+    vectors = await embedder.embed([f"{clause['name'] or ''}\n{clause['content'] or ''}" for clause in clauses])
+    index = VectorIndex.build([clause['id'] for clause in clauses], vectors, embedder.name, settings.CLAUSE_INDEX_QUANTIZE)
+    index.save(path)
+
+    print(f"Embedded {len(clauses)} clauses with {embedder.name} in {time.perf_counter() - start:.1f} s, saved to {path}")
+
+if __name__ == "__main__":
+    asyncio.run(build_clause_index(*sys.argv[1:]))
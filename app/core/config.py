@@ -31,6 +31,122 @@ class Settings(BaseSettings):
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost", "http://localhost:4200", "http://localhost:3000", "http://localhost:8080"]
     # GENERAL SETTINGS
     MULTI_MAX: int = 20
+    TABLE_QUERY_MAX_LIMIT: int = 500
+    # rows classified/generated concurrently by a bulk employee import
+    BULK_IMPORT_CONCURRENCY: int = 8
+    # employees sharing candidate awards classified per tool call, and re-asks for any left out
+    CLASSIFY_BATCH_SIZE: int = 5
+    CLASSIFY_BATCH_RETRIES: int = 2
+    # answer all of a new row's empty columns in one provisions call, unless the shared
+    # clause context gets bigger than this (then it's one call per column as before)
+    MULTI_COLUMN_PROVISIONS: bool = True
+    MULTI_COLUMN_MAX_TOKENS: int = 60000
+    # start column section choice/clause retrieval on the predicted award during classification,
+    # with several candidates the prefilter's best has to score at least this and double the runner up
+    SPECULATIVE_COLUMNS: bool = True
+    SPECULATIVE_MIN_SCORE: float = 0.6
+    # rendered coverage clauses per (industry, subindustry), built on first use or at startup
+    COVERAGE_CACHE_SIZE: int = 512
+    COVERAGE_WARMUP: bool = False
+    # generation jobs heartbeat while running, one silent for JOB_STALE_SECONDS is taken over by
+    # the next worker to start or have a client attach, attached streams poll the db this often
+    JOB_HEARTBEAT_SECONDS: float = 10
+    JOB_STALE_SECONDS: float = 60
+    JOB_POLL_SECONDS: float = 2
+    # concurrent llm calls per process, shared fairly across users and priority classes
+    # (interactive/column/bulk, see llm.scheduler) with some kept for interactive work only
+    SCHEDULER_SLOTS: int = 32
+    SCHEDULER_INTERACTIVE_RESERVED: int = 6
+    # generation requests are admitted while the estimated prompt tokens of this process's jobs fit
+    # the budget, otherwise 429 + Retry-After. classification is estimated from the cached coverage
+    # bundle (the flat guess until it's built), each column cell at the observed column prompt size
+    # (ADMISSION_COLUMN_TOKENS until there is one), the same numbers as the /estimate endpoints
+    ADMISSION_BUDGET_TOKENS: int = 5_000_000
+    ADMISSION_CLASSIFY_TOKENS: int = 12000
+    ADMISSION_COLUMN_TOKENS: int = 6000
+    ADMISSION_RESERVATION_SECONDS: float = 30
+    ADMISSION_DEFAULT_RETRY_SECONDS: float = 10
+    ADMISSION_MAX_RETRY_SECONDS: float = 120
+    # models classification and column provisions run on, cheapest first as "provider:model". an answer
+    # that fails validation (unknown award/citations, malformed level, empty provision) or reports a
+    # confidence under CASCADE_MIN_CONFIDENCE goes to the next tier, the last tier's answer is kept
+    MODEL_CASCADE: Dict[str, List[str]] = {
+        "classify": ["groq:llama-3.1-8b-instant", "openai:gpt-4o"],
+        "provisions": ["groq:llama-3.1-8b-instant", "openai:gpt-4o"],
+        # batched stages escalate only the employees/columns whose answers fail
+        "classify_batch": ["groq:llama-3.1-8b-instant", "openai:gpt-4o"],
+        "provisions_multi": ["groq:llama-3.1-8b-instant", "openai:gpt-4o"],
+    }
+    CASCADE_MIN_CONFIDENCE: float = 0.7
+    # acceptable models per stage, most preferred first. a call goes to the first one that isn't
+    # cooling down (throttled, or ROUTER_ERROR_THRESHOLD errors in a row), hasn't been failing more
+    # than ROUTER_MAX_ERROR_RATE of the time and isn't ROUTER_LATENCY_TOLERANCE times slower on the
+    # stage than the fastest healthy one, and fails over down the list. a cascaded stage's final
+    # tier is routed across these too
+    MODEL_ROUTES: Dict[str, List[str]] = {
+        "classify": ["openai:gpt-4o", "groq:llama-3.1-70b-versatile"],
+        "classify_batch": ["openai:gpt-4o", "groq:llama-3.1-70b-versatile"],
+        "sections": ["groq:llama3-groq-70b-8192-tool-use-preview", "openai:gpt-4o-mini"],
+        "provisions": ["openai:gpt-4o", "groq:llama-3.1-70b-versatile"],
+        "provisions_multi": ["openai:gpt-4o"],
+        "chat": ["groq:llama3-70b-8192", "openai:gpt-4o-mini"],
+    }
+    ROUTER_WINDOW_SECONDS: float = 300
+    ROUTER_ERROR_THRESHOLD: int = 3
+    ROUTER_ERROR_COOLDOWN_SECONDS: float = 30
+    ROUTER_THROTTLE_COOLDOWN_SECONDS: float = 20
+    ROUTER_MAX_ERROR_RATE: float = 0.5
+    ROUTER_LATENCY_TOLERANCE: float = 2.0
+    # passes over a stage's models before a routed call gives up
+    ROUTER_MAX_ROUNDS: int = 3
+    # single column provisions stream their answer to attached row/column streams as it's
+    # generated ({"Partial": {"answer": ...}} lines, never recorded), at most this often. every cascade
+    # tier streams, an answer the cascade rejects is cleared with an empty partial
+    STREAM_PARTIAL_ANSWERS: bool = True
+    PARTIAL_ANSWER_INTERVAL_SECONDS: float = 0.25
+    # only this many candidate awards (best job title/qualification matches) go into a classification
+    # prompt, try_again shows the next page, 0 sends every candidate as before
+    AWARD_PREFILTER_TOP_K: int = 3
+    # section choices per (award, column), pins are operator approved choices
+    SECTION_CACHE_SIZE: int = 10000
+    SECTION_PINS_PATH: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "section_pins.json")
+    # how column sections are chosen: "llm" (whole outline), "lexical" (local BM25 over the award's
+    # sections/clauses) or "lexical_confirm" (BM25, the LLM picks from its shortlist when unsure)
+    SECTION_STRATEGY: str = "llm"
+    LEXICAL_MIN_CONFIDENCE: float = 0.6
+    LEXICAL_RELATIVE_THRESHOLD: float = 0.5
+    LEXICAL_MAX_SECTIONS: int = 3
+    LEXICAL_SHORTLIST_SIZE: int = 10
+    # where column clauses come from: "sections" (chosen sections, see SECTION_STRATEGY) or "vector"
+    # (top clauses of the award from the local clause embedding index, built by build_clause_index.py)
+    CLAUSE_STRATEGY: str = "sections"
+    CLAUSE_VECTOR_TOP_K: int = 12
+    CLAUSE_INDEX_PATH: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "clause_index")
+    CLAUSE_INDEX_QUANTIZE: bool = True
+    # "openai" or "hashing" (deterministic, offline, for tests and local runs)
+    EMBEDDER: str = "openai"
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIMENSIONS: int = 512
+    # concurrent single text embeds are coalesced into requests of up to this many inputs
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_BATCH_WAIT_MS: int = 10
+    # qa chat: projects whose answers are grounded in the award graph (the other qa projects have
+    # no corpus loaded), awards searched per question (named in it, else the best job title
+    # matches scoring CHAT_MIN_AWARD_SCORE, else the whole clause index), clauses per award and
+    # numbered sources in the prompt. generation starts with whatever retrieval has finished
+    # after CHAT_RETRIEVAL_TIMEOUT_SECONDS
+    CHAT_GRAPH_PROJECTS: List[str] = ["Modern Awards"]
+    CHAT_MAX_AWARDS: int = 3
+    CHAT_MIN_AWARD_SCORE: float = 0.2
+    CHAT_CLAUSES_PER_AWARD: int = 6
+    CHAT_MAX_SOURCES: int = 10
+    CHAT_RETRIEVAL_TIMEOUT_SECONDS: float = 2.0
+    # JSONL of (award, column, sections) LLM outline choices for benchmarks.eval_lexical_sections
+    SECTION_CHOICE_LOG_PATH: Optional[str] = None
+    # MODERN AWARD SETTINGS
+    # bump whenever the award graph / ma_db data is re-ingested so cached and
+    # fingerprinted results derived from the old data are treated as stale
+    MA_DATA_VERSION: str = "2024"
     # POSTGRESQL SETTINGS
     POSTGRES_SERVER: str = "localhost"
     POSTGRES_USER: str = "jamesqxd"
@@ -6,6 +6,8 @@ from .crud_agtable import (
     agtable,
     agtable_column,
     agtable_row,
-    agtable_cell
+    agtable_cell,
+    agcell_citation
 )
-from .crud_gdb import ma_gdb
\ No newline at end of file
+from .crud_gdb import ma_gdb
+from .crud_generation_job import generation_job
\ No newline at end of file
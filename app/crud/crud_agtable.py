@@ -1,20 +1,65 @@
-from typing import List, Optional, Dict, Any
-from uuid import UUID
+from typing import List, Optional, Dict, Any, AsyncGenerator
+from uuid import UUID, uuid4
+import json
+import re
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, and_, select, delete
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func, and_, or_, select, delete, tuple_, cast, literal_column, text, Text
 
 from crud.base import CRUDBase
-from models.agtable import AGTable, AGTableColumn, AGTableRow, AGTableCell
+from models.agtable import AGTable, AGTableColumn, AGTableRow, AGTableCell, AGCellCitation
 from schemas.agtable import (
     AGTableCreate, AGTableUpdate,
     AGTableColumnCreate, AGTableColumnUpdate,
     AGTableRowCreate, AGTableRowUpdate,
-    AGTableCellCreate, AGTableCellUpdate
+    AGTableCellCreate, AGTableCellUpdate,
+    AGCellCitationQuery
 )
 
 # del: cell -> row -> column -> table
 
+# a normalised clause key, "34", "34.2(a)(ii)" or "b.1", see citation_key
+CLAUSE_KEY = re.compile(r"[0-9a-z]+(?:\.[0-9a-z]+)*(?:\([0-9a-z]+\))*")
+# AGCellCitation.clause_key
+MAX_CLAUSE_KEY_LENGTH = 50
+
+def answer_text(cell):
+    # literal keys (not bind params) so postgres can match ix_agtablecell_answer_trgm
+    return cell.value.op("->")(literal_column("'Completed'")).op("->>")(literal_column("'answer'"))
+
+def citation_list(citations: Any) -> List[str]:
+    # the tools ask for an array but the models sometimes return a json encoded string
+    if isinstance(citations, str):
+        try:
+            citations = json.loads(citations)
+        except json.JSONDecodeError:
+            citations = citations.strip("[]").replace('"', '').split(",")
+    if not isinstance(citations, list):
+        citations = [citations]
+    return [str(citation).strip() for citation in citations if str(citation).strip()]
+
+def citation_key(citation: str) -> str:
+    # "Clause 34.2(a)" and "34.2(A)" index (and are looked up) as the same key
+    return citation.lower().removeprefix("clause").strip()
+
+def index_key(citation: str) -> Optional[str]:
+    # the AGCellCitation key of a citation, a clause id ("MA000004:34.2") indexes as its key.
+    # None when it isn't a clause key
+    key = citation_key(citation).rsplit(":", 1)[-1]
+    if len(key) > MAX_CLAUSE_KEY_LENGTH or not CLAUSE_KEY.fullmatch(key):
+        return None
+    return key
+
+def cell_citation_keys(value: Dict[str, Any]) -> List[str]:
+    keys = []
+    for key, data in value.items():
+        if key == "ref_content" or not isinstance(data, dict):
+            continue
+        keys.extend(citation_list(data.get("citations", [])))
+    return list(dict.fromkeys(keys))
+
 class CRUDAGTable(CRUDBase[AGTable, AGTableCreate, AGTableUpdate]):
     async def get_by_project(self, db: AsyncSession, *, project_id: UUID) -> Optional[AGTable]:
         result = await db.execute(select(AGTable).filter(AGTable.project_id == project_id))
@@ -89,6 +134,152 @@ class CRUDAGTable(CRUDBase[AGTable, AGTableCreate, AGTableUpdate]):
 
         return table_data
 
+    async def stream_full_table_json(
+        self, db: AsyncSession, *, table_id: UUID, batch_size: int = 500
+    ) -> AsyncGenerator[str, None]:
+        # same document as get_full_table but built by postgres and passed through as text,
+        # cell values never get decoded into python or re-encoded by fastapi
+        header = await db.execute(text("""
+            SELECT json_build_object(
+                'id', t.id,
+                'name', t.name,
+                'columns', coalesce((
+                    SELECT json_agg(json_build_object(
+                        'id', c.id,
+                        'name', c.name,
+                        'order', c."order",
+                        'additional_info', c.additional_info
+                    ) ORDER BY c."order")
+                    FROM agtablecolumn c
+                    WHERE c.table_id = t.id
+                    AND EXISTS (
+                        SELECT 1 FROM agtablecell cell
+                        JOIN agtablerow r ON r.id = cell.row_id AND r.table_id = t.id
+                        WHERE cell.column_id = c.id
+                    )
+                ), '[]'::json)
+            )::text AS header
+            FROM agtable t
+            WHERE t.id = :table_id
+            AND EXISTS (
+                SELECT 1 FROM agtablerow r
+                JOIN agtablecell cell ON cell.row_id = r.id
+                JOIN agtablecolumn c ON c.id = cell.column_id AND c.table_id = t.id
+                WHERE r.table_id = t.id
+            )
+        """), {"table_id": table_id})
+        header = header.scalar_one_or_none()
+        if header is None:
+            # get_full_table returns None for an empty table
+            yield "null"
+            return
+
+        # json_build_object always closes with the last key's value, reopen it to append the rows
+        yield header[:-1] + ', "rows" : ['
+        rows = await db.stream(text("""
+            SELECT json_build_object(
+                'id', r.id,
+                'order', r."order",
+                'cells', json_object_agg(cell.column_id, json_build_object('id', cell.id, 'value', cell.value))
+            )::text
+            FROM agtablerow r
+            JOIN agtablecell cell ON cell.row_id = r.id
+            JOIN agtablecolumn c ON c.id = cell.column_id AND c.table_id = r.table_id
+            WHERE r.table_id = :table_id
+            GROUP BY r.id, r."order"
+            ORDER BY r."order"
+        """), {"table_id": table_id})
+        first = True
+        async for partition in rows.partitions(batch_size):
+            chunk = ",".join(row[0] for row in partition)
+            yield chunk if first else "," + chunk
+            first = False
+        yield "]}"
+
+    async def query_rows(
+        self,
+        db: AsyncSession,
+        *,
+        table_id: UUID,
+        award_id: Optional[str] = None,
+        level: Optional[str] = None,
+        search: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Dict[str, Any]:
+        def cell_exists(column_name: Optional[str], condition):
+            cell = aliased(AGTableCell)
+            column = aliased(AGTableColumn)
+            column_filter = [column.name == column_name] if column_name else []
+            return (
+                select(cell.id)
+                .join(column, and_(column.id == cell.column_id, column.table_id == table_id, *column_filter))
+                .where(cell.row_id == AGTableRow.id, condition(cell))
+                .exists()
+            )
+
+        row_query = select(AGTableRow.id).filter(AGTableRow.table_id == table_id)
+        if award_id:
+            row_query = row_query.filter(cell_exists('Award', lambda cell: cell.value.has_key(award_id)))
+        if level:
+            row_query = row_query.filter(cell_exists('Classification', lambda cell: cell.value.has_key(level)))
+        if search:
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            row_query = row_query.filter(cell_exists(None, lambda cell: answer_text(cell).ilike(pattern, escape="\\")))
+
+        total = (await db.execute(select(func.count()).select_from(row_query.subquery()))).scalar_one()
+
+        order_by = [AGTableRow.order, AGTableRow.id]
+        if sort_by:
+            sort_column = aliased(AGTableColumn)
+            sort_cell = aliased(AGTableCell)
+            row_query = (
+                row_query
+                .outerjoin(sort_column, and_(sort_column.table_id == table_id, sort_column.name == sort_by))
+                .outerjoin(sort_cell, and_(sort_cell.row_id == AGTableRow.id, sort_cell.column_id == sort_column.id))
+            )
+            # provision cells sort on their answer, Award/Classification on their jsonb text which
+            # starts with the award id / level (jsonb orders keys shortest first, before ref_content)
+            sort_key = func.coalesce(answer_text(sort_cell), cast(sort_cell.value, Text))
+            order_by.insert(0, sort_key.desc().nulls_last() if descending else sort_key.asc().nulls_last())
+
+        page_ids = (await db.execute(row_query.order_by(*order_by).offset(skip).limit(limit))).scalars().all()
+
+        table = await self.get(db, table_id)
+        columns = await db.execute(
+            select(AGTableColumn).filter(AGTableColumn.table_id == table_id).order_by(AGTableColumn.order)
+        )
+        rows_data = {
+            row.id: {"id": row.id, "order": row.order, "cells": {}}
+            for row in (await db.execute(select(AGTableRow).filter(AGTableRow.id.in_(page_ids)))).scalars().all()
+        }
+        cells = await db.execute(select(AGTableCell).filter(AGTableCell.row_id.in_(page_ids)))
+        for cell in cells.scalars().all():
+            rows_data[cell.row_id]["cells"][cell.column_id] = {
+                "id": cell.id,
+                "value": cell.value
+            }
+
+        return {
+            "id": table.id,
+            "name": table.name,
+            "columns": [
+                {
+                    "id": column.id,
+                    "name": column.name,
+                    "order": column.order,
+                    "additional_info": column.additional_info
+                }
+                for column in columns.scalars().all()
+            ],
+            "rows": [rows_data[row_id] for row_id in page_ids],
+            "total": total,
+            "skip": skip,
+            "limit": limit
+        }
+
 class CRUDAGTableColumn(CRUDBase[AGTableColumn, AGTableColumnCreate, AGTableColumnUpdate]):
     async def get_by_table(self, db: AsyncSession, *, table_id: UUID) -> List[AGTableColumn]:
         result = await db.execute(select(AGTableColumn).filter(AGTableColumn.table_id == table_id))
@@ -119,6 +310,15 @@ class CRUDAGTableColumn(CRUDBase[AGTableColumn, AGTableColumnCreate, AGTableColu
         await db.commit()
         return column
 
+    async def update_definition(
+        self, db: AsyncSession, *, column: AGTableColumn, name: str, additional_info: Optional[str]
+    ) -> AGTableColumn:
+        column.name = name
+        column.additional_info = additional_info
+        await db.commit()
+        await db.refresh(column)
+        return column
+
     async def reorder_columns(self, db: AsyncSession, *, table_id: UUID) -> None:
         columns = await self.get_by_table(db, table_id=table_id)
         for index, column in enumerate(columns, start=1):
@@ -145,6 +345,41 @@ class CRUDAGTableRow(CRUDBase[AGTableRow, AGTableRowCreate, AGTableRowUpdate]):
     async def get_by_table(self, db: AsyncSession, *, table_id: UUID) -> List[AGTableRow]:
         result = await db.execute(select(AGTableRow).filter(AGTableRow.table_id == table_id))
         return result.scalars().all()
+
+    async def bulk_create_employee_rows(
+        self,
+        db: AsyncSession,
+        *,
+        table_id: UUID,
+        employee_column_id: UUID,
+        start_order: int,
+        employees: List[Dict[str, Any]]
+    ) -> List[UUID]:
+        # COPY straight through the session's asyncpg connection (same transaction),
+        # the ORM would issue one insert per row and per cell
+        row_ids = [uuid4() for _ in employees]
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        asyncpg_connection = raw_connection.driver_connection
+        await asyncpg_connection.copy_records_to_table(
+            'agtablerow',
+            records=[(row_id, table_id, start_order + i) for i, row_id in enumerate(row_ids)],
+            columns=['id', 'table_id', 'order']
+        )
+        # the session's jsonb codec takes already encoded json
+        await asyncpg_connection.copy_records_to_table(
+            'agtablecell',
+            records=[
+                (uuid4(), row_id, employee_column_id, json.dumps({
+                    "Employee": employee.get('fullName', ''),
+                    "EmployeeData": employee
+                }))
+                for row_id, employee in zip(row_ids, employees)
+            ],
+            columns=['id', 'row_id', 'column_id', 'value']
+        )
+        await db.commit()
+        return row_ids
     
     async def remove_multi(self, db: AsyncSession, *, ids: List[UUID], table_id: UUID) -> List[AGTableRow]:
         # delete all cells associated with these rows
@@ -172,7 +407,9 @@ class CRUDAGTableCell(CRUDBase[AGTableCell, AGTableCellCreate, AGTableCellUpdate
         result = await db.execute(select(AGTableCell).filter(AGTableCell.row_id == row_id))
         return result.scalars().all()
 
-    async def update_or_create(self, db: AsyncSession, *, obj_in: AGTableCellCreate) -> AGTableCell:
+    async def update_or_create(
+        self, db: AsyncSession, *, obj_in: AGTableCellCreate, award_id: Optional[str] = None
+    ) -> AGTableCell:
         result = await db.execute(
             select(AGTableCell).filter(
                 AGTableCell.row_id == obj_in.row_id,
@@ -183,15 +420,174 @@ class CRUDAGTableCell(CRUDBase[AGTableCell, AGTableCellCreate, AGTableCellUpdate
 
         if cell:
             cell.value = obj_in.value
+            cell.input_fingerprint = obj_in.input_fingerprint
         else:
             cell = AGTableCell(**obj_in.model_dump())
             db.add(cell)
 
+        # keep the citation index in step with the value, award_id is the row's award. the index
+        # is rebuilt in a savepoint so a failure there doesn't lose the cell
+        if award_id is not None:
+            await db.flush()
+            try:
+                async with db.begin_nested():
+                    await agcell_citation.replace_for_cell(
+                        db, cell_id=cell.id, award_id=award_id, clause_keys=cell_citation_keys(obj_in.value)
+                    )
+            except SQLAlchemyError as e:
+                print(f"Failed to index citations of cell {cell.id}: {e}")
+
         await db.commit()
         await db.refresh(cell)
         return cell
 
+    async def get_column_inputs(
+        self,
+        db: AsyncSession,
+        *,
+        table_id: UUID,
+        row_ids: Optional[List[UUID]] = None,
+        column_id: Optional[UUID] = None,
+        batch_size: int = 100
+    ) -> AsyncGenerator[List[Dict[str, Any]], None]:
+        # pages through the Award and Classification cells of a table (keyset on row order)
+        # so column generation can start on the first batch while the rest is still being read.
+        # with column_id each row also carries the input fingerprint of its cell in that column
+        award_column = aliased(AGTableColumn)
+        award_cell = aliased(AGTableCell)
+        classification_column = aliased(AGTableColumn)
+        classification_cell = aliased(AGTableCell)
+        target_cell = aliased(AGTableCell)
+        query = (
+            select(AGTableRow.id, AGTableRow.order, award_cell.value, classification_cell.value, target_cell.input_fingerprint)
+            .join(award_cell, award_cell.row_id == AGTableRow.id)
+            .join(award_column, and_(
+                award_column.id == award_cell.column_id,
+                award_column.table_id == table_id,
+                award_column.name == 'Award'
+            ))
+            .join(classification_cell, classification_cell.row_id == AGTableRow.id)
+            .join(classification_column, and_(
+                classification_column.id == classification_cell.column_id,
+                classification_column.table_id == table_id,
+                classification_column.name == 'Classification'
+            ))
+            .outerjoin(target_cell, and_(target_cell.row_id == AGTableRow.id, target_cell.column_id == column_id))
+            .filter(AGTableRow.table_id == table_id)
+            .order_by(AGTableRow.order, AGTableRow.id)
+            .limit(batch_size)
+        )
+        if row_ids is not None:
+            query = query.filter(AGTableRow.id.in_(row_ids))
+
+        last_key = None
+        while True:
+            page = query if last_key is None else query.filter(tuple_(AGTableRow.order, AGTableRow.id) > last_key)
+            result = await db.execute(page)
+            records = result.all()
+            if not records:
+                return
+            # ref_content isn't needed for generation and jsonb doesn't keep key order,
+            # so drop it to leave the award/level as the only key
+            yield [
+                {
+                    "id": str(row_id),
+                    "Award": {k: v for k, v in award_value.items() if k != "ref_content"},
+                    "Classification": {k: v for k, v in classification_value.items() if k != "ref_content"},
+                    "fingerprint": fingerprint
+                }
+                for row_id, _, award_value, classification_value, fingerprint in records
+            ]
+            if len(records) < batch_size:
+                return
+            last_key = (records[-1][1], records[-1][0])
+
+    async def count_rows_by_award(
+        self, db: AsyncSession, *, table_id: UUID, row_ids: Optional[List[UUID]] = None
+    ) -> Dict[str, int]:
+        # award id (the Award cell's key besides ref_content) -> classified rows under it
+        award_key = func.jsonb_object_keys(AGTableCell.value).label("award_id")
+        keys = (
+            select(award_key)
+            .join(AGTableColumn, AGTableColumn.id == AGTableCell.column_id)
+            .join(AGTableRow, AGTableRow.id == AGTableCell.row_id)
+            .filter(AGTableColumn.table_id == table_id, AGTableColumn.name == 'Award')
+        )
+        if row_ids is not None:
+            keys = keys.filter(AGTableRow.id.in_(row_ids))
+        keys = keys.subquery()
+        result = await db.execute(
+            select(keys.c.award_id, func.count())
+            .filter(keys.c.award_id != 'ref_content')
+            .group_by(keys.c.award_id)
+        )
+        return {award_id: count for award_id, count in result.all()}
+
+    async def get_failed_cells(
+        self,
+        db: AsyncSession,
+        *,
+        table_id: UUID,
+        column_ids: Optional[List[UUID]] = None,
+        row_ids: Optional[List[UUID]] = None
+    ) -> List[Dict[str, Any]]:
+        # cells written as {"Failed": ...} when their generation errored, see agents.failed_cell
+        query = (
+            select(AGTableCell.id, AGTableCell.row_id, AGTableColumn.id, AGTableColumn.name)
+            .join(AGTableColumn, AGTableColumn.id == AGTableCell.column_id)
+            .filter(AGTableColumn.table_id == table_id, AGTableCell.value.has_key('Failed'))
+            .order_by(AGTableColumn.order, AGTableCell.row_id)
+        )
+        if column_ids is not None:
+            query = query.filter(AGTableColumn.id.in_(column_ids))
+        if row_ids is not None:
+            query = query.filter(AGTableCell.row_id.in_(row_ids))
+        result = await db.execute(query)
+        return [
+            {"cell_id": cell_id, "row_id": row_id, "column_id": column_id, "column_name": column_name}
+            for cell_id, row_id, column_id, column_name in result.all()
+        ]
+
+class CRUDAGCellCitation(CRUDBase[AGCellCitation, AGCellCitationQuery, AGCellCitationQuery]):
+    async def replace_for_cell(self, db: AsyncSession, *, cell_id: UUID, award_id: str, clause_keys: List[str]) -> None:
+        # caller commits. free text the model put in its citations isn't a clause key and isn't indexed
+        keys = [index_key(clause_key) for clause_key in clause_keys]
+        await db.execute(delete(AGCellCitation).where(AGCellCitation.cell_id == cell_id))
+        db.add_all([
+            AGCellCitation(cell_id=cell_id, award_id=award_id, clause_key=clause_key)
+            for clause_key in dict.fromkeys(filter(None, keys))
+        ])
+
+    async def get_affected_cells(
+        self, db: AsyncSession, *, table_id: UUID, award_id: str, clause_keys: List[str]
+    ) -> List[Dict[str, Any]]:
+        # a change to clause 34 also affects cells citing 34.2, 34.2(a) etc. keys are escaped so
+        # a % or _ in one is matched literally
+        clause_keys = [key for key in map(index_key, clause_keys) if key]
+        key_conditions = [AGCellCitation.clause_key.in_(clause_keys)]
+        key_conditions += [AGCellCitation.clause_key.startswith(f"{key}.", autoescape=True) for key in clause_keys]
+        key_conditions += [AGCellCitation.clause_key.startswith(f"{key}(", autoescape=True) for key in clause_keys]
+        result = await db.execute(
+            select(AGCellCitation.clause_key, AGTableCell.id, AGTableCell.row_id, AGTableColumn.id, AGTableColumn.name)
+            .join(AGTableCell, AGTableCell.id == AGCellCitation.cell_id)
+            .join(AGTableColumn, AGTableColumn.id == AGTableCell.column_id)
+            .filter(AGTableColumn.table_id == table_id, AGCellCitation.award_id == award_id, or_(*key_conditions))
+            .order_by(AGTableColumn.order, AGTableCell.row_id)
+        )
+        affected = {}
+        for clause_key, cell_id, row_id, column_id, column_name in result.all():
+            # one entry per cell, keep the first matching clause
+            affected.setdefault(cell_id, {
+                "cell_id": cell_id,
+                "row_id": row_id,
+                "column_id": column_id,
+                "column_name": column_name,
+                "clause_key": clause_key
+            })
+        return list(affected.values())
+
 agtable = CRUDAGTable(AGTable)
 agtable_column = CRUDAGTableColumn(AGTableColumn)
 agtable_row = CRUDAGTableRow(AGTableRow)
 agtable_cell = CRUDAGTableCell(AGTableCell)
+agcell_citation = CRUDAGCellCitation(AGCellCitation)
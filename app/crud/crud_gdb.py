@@ -69,6 +69,30 @@ class CRUDGDB:
         hierarchy = await CRUDGDB.get_award_section_hierarchy(session, award_id)
         return CRUDGDB.format_hierarchy(hierarchy)
 
+    @staticmethod
+    async def fetch_award_section_clauses(session: AsyncSession, award_id: str) -> List[Dict[str, Any]]:
+        # every section/subsection of an award with the clauses directly under it, sections with no
+        # clauses come back once with null clause fields
+        query = """
+        MATCH (doc:Document {name: $award_id})-[:CONTAINS]->(section:Section)
+        OPTIONAL MATCH (section)-[:CONTAINS]->(clause:Clause)
+        RETURN section.name AS section_name,
+               null AS subsection_name,
+               clause.key AS clause_key,
+               clause.name AS clause_name,
+               clause.content AS clause_content
+        UNION ALL
+        MATCH (doc:Document {name: $award_id})-[:CONTAINS]->(section:Section)-[:CONTAINS]->(subsection:Subsection)
+        OPTIONAL MATCH (subsection)-[:CONTAINS]->(clause:Clause)
+        RETURN section.name AS section_name,
+               subsection.name AS subsection_name,
+               clause.key AS clause_key,
+               clause.name AS clause_name,
+               clause.content AS clause_content
+        """
+        result = await session.run(query, award_id=award_id)
+        return await result.data()
+
     @staticmethod
     async def fetch_coverage_clauses(session: AsyncSession, award_id: str, coverage_clauses: List[str]) -> List[Dict[str, Any]]:
         where_conditions = []
@@ -215,6 +239,76 @@ class CRUDGDB:
                             }
         return output_str, references
 
+    @staticmethod
+    async def fetch_all_clauses(session: AsyncSession) -> List[Dict[str, Any]]:
+        query = """
+        MATCH (clause:Clause)
+        RETURN clause.id AS id, clause.name AS name, clause.content AS content
+        ORDER BY clause.id
+        """
+        result = await session.run(query)
+        return await result.data()
+
+    @staticmethod
+    async def fetch_clause_records(session: AsyncSession, clause_ids: List[str]) -> List[Dict[str, Any]]:
+        # id, key, name and content of each clause found, in the order asked for
+        query = """
+        MATCH (clause:Clause)
+        WHERE clause.id IN $clause_ids
+        RETURN clause.id AS id, clause.key AS key, clause.name AS name, clause.content AS content
+        """
+        result = await session.run(query, clause_ids=clause_ids)
+        records = {record["id"]: record for record in await result.data()}
+        return [records[clause_id] for clause_id in dict.fromkeys(clause_ids) if clause_id in records]
+
+    @staticmethod
+    async def get_clauses_by_ids(session: AsyncSession, clause_ids: List[str]) -> Tuple[str, Dict[str, ReferenceContent]]:
+        # same output as get_clauses for an explicit (ranked) list of clauses instead of sections
+        query = """
+        MATCH (clause:Clause)
+        WHERE clause.id IN $clause_ids
+        OPTIONAL MATCH (clause)-[:REFERENCES]->(refClause:Clause)
+        RETURN clause.id AS clause_id,
+            clause.key AS clause_key,
+            clause.name AS clause_name,
+            clause.content AS clause_content,
+            collect({
+                name: refClause.name,
+                id: refClause.id,
+                key: refClause.key,
+                content: refClause.content
+            }) AS references
+        """
+        result = await session.run(query, clause_ids=clause_ids)
+        records = {record["clause_id"]: record for record in await result.data()}
+
+        output_str = ""
+        references = {}
+        previous_name = None
+        for clause_id in clause_ids:
+            record = records.get(clause_id)
+            if not record:
+                continue
+            if previous_name != record["clause_name"]:
+                output_str += f"\n--- {record['clause_name']} ---\n"
+                previous_name = record["clause_name"]
+            output_str += f"{record['clause_id']} (ref: {record['clause_key']})\n"
+            output_str += record['clause_content'] + "\n"
+            refs = [ref for ref in record["references"] if ref["id"]]
+            if refs:
+                output_str += "Clause References:\n"
+                for ref in refs:
+                    output_str += f"{ref['id']} (ref: {ref['key']})\n"
+                    output_str += ref['content'] + "\n"
+                    if ref['key'] not in references:
+                        references[ref['key']] = {
+                            'id': ref['id'],
+                            'key': ref['key'],
+                            'title': ref['name'],
+                            'content': ref['content']
+                        }
+        return output_str, references
+
 
         
     
@@ -0,0 +1,102 @@
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, or_, and_
+
+from crud.base import CRUDBase
+from models.generation_job import GenerationJob, GenerationJobResult
+from schemas.generation_job import GenerationJobCreate, GenerationJobUpdate
+
+ACTIVE_STATUSES = ("pending", "running")
+
+class CRUDGenerationJob(CRUDBase[GenerationJob, GenerationJobCreate, GenerationJobUpdate]):
+    async def create_with_lines(
+        self, db: AsyncSession, *, obj_in: GenerationJobCreate, lines: Optional[List[Dict[str, Any]]] = None
+    ) -> GenerationJob:
+        # lines known up front (e.g. the imported row ids) are recorded with the job so they replay too
+        lines = list(lines or [])
+        job = GenerationJob(**obj_in.model_dump(exclude_none=True), status="pending")
+        db.add(job)
+        await db.flush()
+        db.add_all([GenerationJobResult(job_id=job.id, seq=seq, line=line) for seq, line in enumerate(lines, 1)])
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    async def get_by_table(self, db: AsyncSession, *, table_id: UUID, active_only: bool = False) -> List[GenerationJob]:
+        query = select(GenerationJob).filter(GenerationJob.table_id == table_id)
+        if active_only:
+            query = query.filter(GenerationJob.status.in_(ACTIVE_STATUSES))
+        result = await db.execute(query.order_by(GenerationJob.created.desc()))
+        return result.scalars().all()
+
+    async def claim(
+        self, db: AsyncSession, *, worker_id: str, stale_after: float, job_id: Optional[UUID] = None
+    ) -> List[GenerationJob]:
+        # pending jobs, and running ones whose worker stopped heartbeating, move to this worker.
+        # one UPDATE so two workers can't both take the same job
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+        query = (
+            update(GenerationJob)
+            .where(or_(
+                GenerationJob.status == "pending",
+                and_(GenerationJob.status == "running", or_(GenerationJob.heartbeat.is_(None), GenerationJob.heartbeat < stale_before))
+            ))
+            .values(status="running", worker_id=worker_id, heartbeat=func.now())
+            .returning(GenerationJob)
+            .execution_options(synchronize_session=False)
+        )
+        if job_id is not None:
+            query = query.where(GenerationJob.id == job_id)
+        result = await db.execute(query)
+        jobs = result.scalars().all()
+        await db.commit()
+        return jobs
+
+    async def heartbeat(self, db: AsyncSession, *, job_id: UUID, worker_id: str) -> bool:
+        # false once the job was taken over (or finished) elsewhere
+        result = await db.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job_id, GenerationJob.worker_id == worker_id, GenerationJob.status == "running")
+            .values(heartbeat=func.now())
+        )
+        await db.commit()
+        return result.rowcount > 0
+
+    async def finish(self, db: AsyncSession, *, job_id: UUID, worker_id: str, status: str, error: Optional[str] = None) -> None:
+        # only while this worker still owns it, a cancelled or taken over job keeps its status
+        await db.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job_id, GenerationJob.worker_id == worker_id, GenerationJob.status == "running")
+            .values(status=status, error=error[:500] if error else None, heartbeat=None)
+        )
+        await db.commit()
+
+    async def cancel(self, db: AsyncSession, *, job_id: UUID) -> bool:
+        # the worker running it notices on its next heartbeat (immediately if it's this one)
+        result = await db.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == job_id, GenerationJob.status.in_(ACTIVE_STATUSES))
+            .values(status="cancelled", heartbeat=None)
+        )
+        await db.commit()
+        return result.rowcount > 0
+
+    def add_result(self, db: AsyncSession, *, job_id: UUID, seq: int, line: Dict[str, Any]) -> None:
+        # caller commits, together with the cell the line describes
+        db.add(GenerationJobResult(job_id=job_id, seq=seq, line=line))
+
+    async def get_results(self, db: AsyncSession, *, job_id: UUID, after_seq: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        result = await db.execute(
+            select(GenerationJobResult.seq, GenerationJobResult.line)
+            .filter(GenerationJobResult.job_id == job_id, GenerationJobResult.seq > after_seq)
+            .order_by(GenerationJobResult.seq)
+        )
+        return [(seq, line) for seq, line in result.all()]
+
+    async def count_results(self, db: AsyncSession, *, job_id: UUID) -> int:
+        result = await db.execute(select(func.count()).select_from(GenerationJobResult).filter(GenerationJobResult.job_id == job_id))
+        return result.scalar_one()
+
+generation_job = CRUDGenerationJob(GenerationJob)
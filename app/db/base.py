@@ -3,7 +3,8 @@ from models.user import User  # noqa
 from models.token import Token  # noqa
 #from models.table import Table  # noqa
 from models.project import Project  # noqa
-from models.agtable import AGTable, AGTableColumn, AGTableRow, AGTableCell  # noqa
+from models.agtable import AGTable, AGTableColumn, AGTableRow, AGTableCell, AGCellCitation  # noqa
+from models.generation_job import GenerationJob, GenerationJobResult  # noqa
 
 # # Import all the models, so that Base has them before being
 # # imported by Alembic
@@ -1,60 +1,142 @@
 import json
-from typing import Dict, List, Any
+import os
+import pickle
+import sys
+import threading
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 from pathlib import Path
 
 DB_PATH = Path(__file__).parent / "2024_cindy_industry_grouped_combined.json"
+SNAPSHOT_PATH = Path(__file__).parent / "2024_cindy_industry_grouped_combined.pickle"
+# bump when the compiled layout below changes so old snapshots get rebuilt
+SNAPSHOT_FORMAT = 1
+
+def intern(value: Any) -> Any:
+    # the same industry/award names and clause/job strings repeat across subindustries,
+    # interned they're stored (and pickled) once
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return tuple(intern(item) for item in value)
+    if isinstance(value, dict):
+        return {intern(key): intern(item) for key, item in value.items()}
+    return value
 
 class MADatabase:
-    def __init__(self):
-        self.data: Dict[str, Any] = {}
-        self.load_data()
+    def __init__(self, json_path: Path = DB_PATH, snapshot_path: Path = SNAPSHOT_PATH):
+        """
+        Award coverage data grouped by industry/subindustry. Nothing is read until the first lookup,
+        then it comes from a pickled compiled snapshot, rebuilt from the JSON when that changes.
+        Lookups return precomputed tuples (as new lists), the award dicts in them are shared and
+        must not be mutated.
+        """
+        self.json_path = Path(json_path)
+        self.snapshot_path = Path(snapshot_path)
+        self.compiled: Optional[Dict[str, Any]] = None
+        self.lock = threading.Lock()
 
-    def load_data(self):
-        with open(DB_PATH, 'r') as file:
-            self.data = json.load(file)
+    def source_signature(self) -> Tuple[int, int, int]:
+        stat = os.stat(self.json_path)
+        return SNAPSHOT_FORMAT, stat.st_size, stat.st_mtime_ns
 
-    def get_awards(self, industry: str, subindustry: str = None) -> List[Dict[str, Any]]:
-        awards = []
-        if industry in self.data:
-            if subindustry and subindustry in self.data[industry]:
-                for award_id, award_data in self.data[industry][subindustry].items():
-                    awards.append({
+    def load_data(self) -> Dict[str, Any]:
+        if self.compiled is None:
+            with self.lock:
+                if self.compiled is None:
+                    self.compiled = self.load_snapshot() or self.build_snapshot()
+        return self.compiled
+
+    def load_snapshot(self) -> Optional[Dict[str, Any]]:
+        if not self.snapshot_path.exists():
+            return None
+        try:
+            with open(self.snapshot_path, 'rb') as file:
+                compiled = pickle.load(file)
+        except Exception as e:
+            print(f"Unreadable ma_db snapshot {self.snapshot_path}, rebuilding: {e}")
+            return None
+        if compiled.get("signature") != self.source_signature():
+            return None
+        return compiled
+
+    def build_snapshot(self) -> Dict[str, Any]:
+        with open(self.json_path, 'r') as file:
+            compiled = self.compile(intern(json.load(file)))
+        compiled["signature"] = self.source_signature()
+        # written next to the json and swapped in, so concurrent workers never read half a file
+        tmp_path = self.snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as file:
+                pickle.dump(compiled, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Could not write ma_db snapshot {self.snapshot_path}: {e}")
+        return compiled
+
+    @staticmethod
+    def compile(data: Dict[str, Any]) -> Dict[str, Any]:
+        entries = []
+        awards: Dict[Tuple[str, Optional[str]], Tuple[Dict[str, Any], ...]] = {}
+        jobs: Dict[Tuple[str, Optional[str]], Tuple[Any, ...]] = {}
+        qualifications: Dict[Tuple[str, Optional[str]], Tuple[str, ...]] = {}
+        for industry, subindustries in data.items():
+            industry_awards, industry_jobs, industry_qualifications = [], [], set()
+            for subindustry, subindustry_awards in subindustries.items():
+                key = (industry, subindustry)
+                awards[key] = tuple(
+                    {
                         "award_id": award_id,
                         "award_name": award_data["Award Name"],
                         "coverage_clauses": award_data["Coverage Clauses"]
-                    })
-            else:
-                for subind in self.data[industry].values():
-                    for award_id, award_data in subind.items():
-                        awards.append({
-                            "award_id": award_id,
-                            "award_name": award_data["Award Name"],
-                            "coverage_clauses": award_data["Coverage Clauses"]
-                        })
-        return awards
+                    }
+                    for award_id, award_data in subindustry_awards.items()
+                )
+                jobs[key] = tuple(job for award_data in subindustry_awards.values() for job in award_data["Jobs"])
+                qualifications[key] = tuple(sorted({
+                    qualification
+                    for award_data in subindustry_awards.values()
+                    for qualification in award_data["Qualifications"]
+                }))
+                entries.extend((industry, subindustry, award_id, award_data) for award_id, award_data in subindustry_awards.items())
+                industry_awards.extend(awards[key])
+                industry_jobs.extend(jobs[key])
+                industry_qualifications.update(qualifications[key])
+            # no (or an unknown) subindustry means every subindustry of the industry
+            awards[(industry, None)] = tuple(industry_awards)
+            jobs[(industry, None)] = tuple(industry_jobs)
+            qualifications[(industry, None)] = tuple(sorted(industry_qualifications))
+        return {
+            "entries": tuple(entries),
+            "awards": awards,
+            "jobs": jobs,
+            "qualifications": qualifications,
+        }
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        # the raw industry -> subindustry -> award id -> award data nesting
+        data: Dict[str, Any] = {}
+        for industry, subindustry, award_id, award_data in self.iter_awards():
+            data.setdefault(industry, {}).setdefault(subindustry, {})[award_id] = award_data
+        return data
+
+    def lookup(self, table: str, industry: str, subindustry: str = None) -> Tuple[Any, ...]:
+        compiled = self.load_data()[table]
+        if subindustry and (industry, subindustry) in compiled:
+            return compiled[(industry, subindustry)]
+        return compiled.get((industry, None), ())
+
+    def iter_awards(self) -> Iterator[Tuple[str, str, str, Dict[str, Any]]]:
+        # (industry, subindustry, award id, award data), an award shows up once per subindustry it's listed under
+        return iter(self.load_data()["entries"])
+
+    def get_awards(self, industry: str, subindustry: str = None) -> List[Dict[str, Any]]:
+        return list(self.lookup("awards", industry, subindustry))
 
     def get_jobs(self, industry: str, subindustry: str = None) -> List[Dict[str, str]]:
-        jobs = []
-        if industry in self.data:
-            if subindustry and subindustry in self.data[industry]:
-                for award_data in self.data[industry][subindustry].values():
-                    jobs.extend(award_data["Jobs"])
-            else:
-                for subind in self.data[industry].values():
-                    for award_data in subind.values():
-                        jobs.extend(award_data["Jobs"])
-        return jobs
+        return list(self.lookup("jobs", industry, subindustry))
 
     def get_qualifications(self, industry: str, subindustry: str = None) -> List[str]:
-        qualifications = set()
-        if industry in self.data:
-            if subindustry and subindustry in self.data[industry]:
-                for award_data in self.data[industry][subindustry].values():
-                    qualifications.update(award_data["Qualifications"])
-            else:
-                for subind in self.data[industry].values():
-                    for award_data in subind.values():
-                        qualifications.update(award_data["Qualifications"])
-        return list(qualifications)
-    
-ma_db = MADatabase()
\ No newline at end of file
+        return list(self.lookup("qualifications", industry, subindustry))
+
+ma_db = MADatabase()
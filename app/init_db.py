@@ -1,4 +1,5 @@
 import asyncio
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
 from core.config import settings
 from db.base import Base
@@ -8,6 +9,8 @@ async def init_db():
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all) # CARE DROP ALL TABLES
+        # trigram index on cell answers
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
     
     await engine.dispose()
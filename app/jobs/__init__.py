@@ -0,0 +1,6 @@
+from .runner import runner
+from .admission import admission, row_cost, cell_cost
+from .generation import (
+    save_row_result,
+    generate_column_part,
+)
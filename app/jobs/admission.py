@@ -0,0 +1,103 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+from uuid import UUID
+
+import agents
+from core.config import settings
+
+# the same prompt sizes the pre-flight estimates use, see agents.estimator
+
+def row_cost(employee_data: Dict[str, Any], pending_columns: int, batched: bool = False) -> float:
+    # batched rows (imports) share a classification prompt with CLASSIFY_BATCH_SIZE others
+    classify = agents.classification_prompt_tokens(employee_data.get("industry"), employee_data.get("subIndustry"))
+    if batched:
+        classify /= settings.CLASSIFY_BATCH_SIZE
+    return classify + pending_columns * agents.column_prompt_tokens()
+
+def cell_cost(cells: int) -> float:
+    return cells * agents.column_prompt_tokens()
+
+class AdmissionController:
+    def __init__(self, budget: float, reservation_seconds: float, window_seconds: float = 60):
+        """
+        Caps the estimated llm work (prompt tokens) this process has in flight. A request is
+        admitted if its estimate fits in what's left of the budget, otherwise it's told when to
+        retry from how fast recent jobs got through their estimates. An admitted request
+        reserves its cost until its job starts, a reservation that never becomes a job (the
+        request failed after admission) lapses after `reservation_seconds`.
+        """
+        self.budget = budget
+        self.reservation_seconds = reservation_seconds
+        self.window_seconds = window_seconds
+        # job id -> (cost, reserved at, started)
+        self.admitted: Dict[UUID, Tuple[float, float, bool]] = {}
+        # (finished at, cost) of recent jobs for the drain rate
+        self.finished: Deque[Tuple[float, float]] = deque()
+        self.stats = {"admitted": 0, "rejected": 0}
+
+    def expire(self) -> None:
+        now = time.monotonic()
+        for job_id, (_, reserved_at, started) in list(self.admitted.items()):
+            if not started and now - reserved_at > self.reservation_seconds:
+                del self.admitted[job_id]
+        while self.finished and now - self.finished[0][0] > self.window_seconds:
+            self.finished.popleft()
+
+    def in_flight(self) -> float:
+        self.expire()
+        return sum(cost for cost, _, _ in self.admitted.values())
+
+    def drain_rate(self) -> Optional[float]:
+        # estimated tokens per second completed over the window
+        self.expire()
+        if not self.finished:
+            return None
+        return sum(cost for _, cost in self.finished) / self.window_seconds
+
+    def try_admit(self, job_id: UUID, cost: float) -> Optional[float]:
+        # None when admitted, otherwise seconds to wait before retrying. something bigger than
+        # the whole budget gets in only when nothing else is running
+        in_flight = self.in_flight()
+        if in_flight + cost <= self.budget or in_flight == 0:
+            self.admitted[job_id] = (cost, time.monotonic(), False)
+            self.stats["admitted"] += 1
+            return None
+        self.stats["rejected"] += 1
+        rate = self.drain_rate()
+        if not rate:
+            return settings.ADMISSION_DEFAULT_RETRY_SECONDS
+        excess = in_flight + min(cost, self.budget) - self.budget
+        return min(max(excess / rate, 1.0), settings.ADMISSION_MAX_RETRY_SECONDS)
+
+    def cost(self, job_id: UUID) -> float:
+        return self.admitted.get(job_id, (0.0, 0.0, False))[0]
+
+    def start(self, job_id: UUID, cost: float) -> None:
+        # jobs resumed or taken over from another worker weren't admitted here, they run anyway
+        cost = self.admitted[job_id][0] if job_id in self.admitted else cost
+        self.admitted[job_id] = (cost, time.monotonic(), True)
+
+    def cancel(self, job_id: UUID) -> None:
+        # a reservation whose request failed before its job was created, dropped rather than
+        # counted as work done
+        if job_id in self.admitted and not self.admitted[job_id][2]:
+            del self.admitted[job_id]
+
+    def release(self, job_id: UUID) -> None:
+        if job_id in self.admitted:
+            cost, _, _ = self.admitted.pop(job_id)
+            self.finished.append((time.monotonic(), cost))
+
+    def load(self) -> Dict[str, Any]:
+        in_flight = self.in_flight()
+        return {
+            "budget": self.budget,
+            "in_flight": in_flight,
+            "utilisation": in_flight / self.budget if self.budget else None,
+            "jobs": len(self.admitted),
+            "drain_rate": self.drain_rate(),
+            **self.stats,
+        }
+
+admission = AdmissionController(settings.ADMISSION_BUDGET_TOKENS, settings.ADMISSION_RESERVATION_SECONDS)
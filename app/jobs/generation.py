@@ -0,0 +1,198 @@
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from neo4j import AsyncDriver
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud, schemas, agents
+from core.config import settings
+from db import ma_db
+from db.session import SessionLocal
+from jobs.runner import runner, Emit
+from models.agtable import AGTableColumn
+from models.generation_job import GenerationJob
+
+async def save_row_result(db: AsyncSession, table_id: UUID, row_id: UUID, row_inputs: Dict[str, Any], result: Dict[str, Any]) -> None:
+    # row_inputs collects the row's Award/Classification as they stream in
+    row_inputs.update({k: v for k, v in result.items() if k in ["Award", "Classification"]})
+    for column_name, value in result.items():
+        # get or create the column
+        column = await crud.agtable_column.get_by_name(db=db, table_id=table_id, name=column_name)
+        if not column:
+            column_count = await crud.agtable_column.get_column_count(db=db, table_id=table_id)
+            column = await crud.agtable_column.create(db=db, obj_in=schemas.AGTableColumnCreate(
+                table_id=table_id,
+                name=column_name,
+                order=column_count + 1
+                # it doesn't matter that we're not passing additional_info here
+                # this should never be called
+            ))
+        # create or update the cell
+        input_fingerprint = None
+        award_id = next(k for k in row_inputs["Award"] if k != "ref_content") if "Award" in row_inputs else None
+        # failed cells keep no fingerprint so they count as stale
+        if column_name not in ["Award", "Classification"] and not agents.is_failed(value):
+            input_fingerprint = agents.column_input_fingerprint(
+                row_inputs["Award"], row_inputs["Classification"], column.name, column.additional_info
+            )
+        cell_data = schemas.AGTableCellCreate(
+            row_id=row_id,
+            column_id=column.id,
+            value=value,
+            input_fingerprint=input_fingerprint
+        )
+        # now adding the references to the cells - not scalable
+        await crud.agtable_cell.update_or_create(db=db, obj_in=cell_data, award_id=award_id)
+
+def without_ref_content(value: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in value.items() if k != "ref_content"}
+
+@runner.handler("rows")
+async def run_rows_job(db: AsyncSession, gdb_driver: AsyncDriver, job: GenerationJob, lines: List[Dict[str, Any]], emit: Emit) -> None:
+    # params: rows [{id, EmployeeData, Columns}], wrap (lines are {row_id: result}, a single
+    # /rows/add row streams bare results). recorded Award/Classification are reused, recorded
+    # columns are not asked for again
+    rows = job.params["rows"]
+    wrap = job.params.get("wrap", True)
+    recorded: Dict[str, Dict[str, Any]] = {row["id"]: {} for row in rows}
+    for line in lines:
+        for row_id, result in (line.items() if wrap else [(rows[0]["id"], line)]):
+            if row_id in recorded:
+                recorded[row_id].update(result)
+    row_inputs = {
+        row_id: {k: v for k, v in results.items() if k in ["Award", "Classification"]}
+        for row_id, results in recorded.items()
+    }
+
+    pending = []
+    for row in rows:
+        done = recorded[row["id"]]
+        if "error" in done:
+            continue
+        columns = row.get("Columns", {})
+        remaining = [name for name in columns if name not in ["Award", "Classification"] and name not in done]
+        row = {**row, "Columns": {
+            name: {**data, "value": done[name]} if name in done else data
+            for name, data in columns.items()
+        }}
+        if "Award" in done and "Classification" in done:
+            if not remaining:
+                continue
+            row["classified"] = (without_ref_content(done["Award"]), without_ref_content(done["Classification"]))
+        pending.append(row)
+    if not pending:
+        return
+
+    async def row_results():
+        if wrap:
+            async for result in agents.generate_bulk_row_data(gdb_driver, pending):
+                for row_id, row_result in result.items():
+                    yield row_id, row_result
+            return
+        row = dict(pending[0])
+        employee_data = row["EmployeeData"]
+        award_data = ma_db.get_awards(employee_data.get("industry"), employee_data.get("subIndustry"))
+        async for result in agents.generate_row_data(
+            gdb_driver, row, award_data, classified=row.pop("classified", None), partials=settings.STREAM_PARTIAL_ANSWERS
+        ):
+            yield row["id"], result
+
+    async for row_id, result in row_results():
+        if any(agents.is_partial(value) for value in result.values()):
+            await emit({row_id: result} if wrap else result, partial=True)
+            continue
+        if "error" not in result:
+            result = {k: v for k, v in result.items() if k not in recorded[row_id]}
+        if not result:
+            continue
+        recorded[row_id].update(result)
+
+        async def write(row_id: str = row_id, result: Dict[str, Any] = result) -> None:
+            if "error" not in result:
+                await save_row_result(db, job.table_id, UUID(row_id), row_inputs[row_id], result)
+
+        await emit({row_id: result} if wrap else result, write)
+
+async def generate_column_part(
+    db: AsyncSession,
+    gdb_driver: AsyncDriver,
+    table_id: UUID,
+    column: AGTableColumn,
+    column_data: Dict[str, str],
+    emit: Emit,
+    row_ids: Optional[List[UUID]] = None,
+    only_stale: bool = False,
+    line_key: Optional[str] = None,
+    done_row_ids: frozenset = frozenset()
+) -> None:
+    fingerprints = {}
+    award_ids = {}
+
+    # award and classification inputs are read server side in batches, on a separate session
+    # since `db` is busy writing cells while the rows are still being paged in
+    async def column_rows():
+        async with SessionLocal() as read_db:
+            async for batch in crud.agtable_cell.get_column_inputs(
+                read_db, table_id=table_id, row_ids=row_ids, column_id=column.id
+            ):
+                pending = []
+                for row in batch:
+                    if str(row["id"]) in done_row_ids:
+                        continue
+                    fingerprint = agents.column_input_fingerprint(
+                        row["Award"], row["Classification"], column.name, column.additional_info
+                    )
+                    if only_stale and row["fingerprint"] == fingerprint:
+                        continue
+                    fingerprints[row["id"]] = fingerprint
+                    award_ids[row["id"]] = list(row["Award"].keys())[0]
+                    pending.append(row)
+                yield pending
+
+    async for result in agents.generate_column_data(gdb_driver, column_data, column_rows(), partials=settings.STREAM_PARTIAL_ANSWERS): # maybe all gdb instances should use driver > session bc coroutine
+        for row_id, column_value in result.items():
+            if agents.is_partial(column_value):
+                line = {row_id: column_value}
+                await emit({line_key: line} if line_key else line, partial=True)
+                continue
+            # create or update the cell for this row and column, a failed cell keeps no fingerprint
+            fingerprint = fingerprints.pop(row_id, None)
+            cell_data = schemas.AGTableCellCreate(
+                row_id=UUID(row_id),
+                column_id=column.id,
+                value=column_value,
+                input_fingerprint=None if agents.is_failed(column_value) else fingerprint
+            )
+
+            async def write(cell_data: schemas.AGTableCellCreate = cell_data, award_id: Optional[str] = award_ids.pop(row_id, None)) -> None:
+                await crud.agtable_cell.update_or_create(db=db, obj_in=cell_data, award_id=award_id)
+
+            line = {row_id: column_value}
+            await emit({line_key: line} if line_key else line, write)
+
+@runner.handler("columns")
+async def run_columns_job(db: AsyncSession, gdb_driver: AsyncDriver, job: GenerationJob, lines: List[Dict[str, Any]], emit: Emit) -> None:
+    # params: columns [{column_id, row_ids, only_stale, line_key}], final_line. rows already
+    # recorded for a column are skipped
+    for part in job.params["columns"]:
+        line_key = part.get("line_key")
+        done_row_ids = frozenset(
+            row_id
+            for line in lines
+            for row_id in (line.get(line_key, {}) if line_key else line)
+        )
+        column = await crud.agtable_column.get(db, id=UUID(part["column_id"]))
+        if not column:
+            # deleted since the job started
+            continue
+        column_data = {"name": column.name, "additionalInfo": column.additional_info or ""}
+        await generate_column_part(
+            db, gdb_driver, job.table_id, column, column_data, emit,
+            row_ids=[UUID(row_id) for row_id in part["row_ids"]] if part.get("row_ids") is not None else None,
+            only_stale=part.get("only_stale", False),
+            line_key=line_key,
+            done_row_ids=done_row_ids
+        )
+    final_line = job.params.get("final_line")
+    if final_line and final_line not in lines:
+        await emit(final_line)
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from neo4j import AsyncDriver
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+import llm
+from crud.crud_generation_job import ACTIVE_STATUSES
+from jobs.admission import admission
+from core.config import settings
+from db.session import SessionLocal
+from gdb.session import Neo4jSessionLocal
+from models.generation_job import GenerationJob
+
+# emit(line, write): records the line, running `write` (which commits) in the same transaction.
+# emit(line, partial=True) only hands it to the streams attached here, for progress that is
+# superseded by a later line (partial answers) and must not be replayed or saved
+Emit = Callable[..., Awaitable[None]]
+Handler = Callable[[AsyncSession, AsyncDriver, GenerationJob, List[Dict[str, Any]], Emit], Awaitable[None]]
+
+class JobRunner:
+    def __init__(self):
+        """
+        Runs generation jobs in the background of this worker, independent of the request that
+        started them. Every line a job produces is committed with the cell it describes, then
+        handed to the streams attached to the job. A job whose worker stops heartbeating is
+        claimed by the next worker that starts up or has a client attach to it, and its handler
+        is given the lines already recorded so it only does the remaining work. Unless started
+        with params["background"], a job is cancelled once the last stream following it goes.
+        """
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.handlers: Dict[str, Handler] = {}
+        self.tasks: Dict[UUID, asyncio.Task] = {}
+        self.subscribers: Dict[UUID, Set[asyncio.Queue]] = {}
+        # held so disconnect cancellations aren't garbage collected mid run
+        self.cancellations: Set[asyncio.Task] = set()
+
+    def handler(self, kind: str) -> Callable[[Handler], Handler]:
+        def register(handler: Handler) -> Handler:
+            self.handlers[kind] = handler
+            return handler
+        return register
+
+    async def submit(self, job_id: Optional[UUID] = None) -> None:
+        # claims the job (or with no id every pending/abandoned job) and starts it here
+        async with SessionLocal() as db:
+            jobs = await crud.generation_job.claim(
+                db, worker_id=self.worker_id, stale_after=settings.JOB_STALE_SECONDS, job_id=job_id
+            )
+        for job in jobs:
+            self.start(job)
+
+    async def resume(self) -> None:
+        try:
+            await self.submit()
+        except Exception as e:
+            print(f"Resuming generation jobs failed: {e}")
+
+    def start(self, job: GenerationJob) -> None:
+        if job.id in self.tasks:
+            return
+        admission.start(job.id, job.params.get("cost", 0))
+        task = asyncio.create_task(self.run(job))
+        self.tasks[job.id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job.id, None))
+
+    async def cancel(self, job_id: UUID) -> bool:
+        async with SessionLocal() as db:
+            cancelled = await crud.generation_job.cancel(db, job_id=job_id)
+        # cancelling the task cancels the handler's pending llm calls and graph queries with it
+        if job_id in self.tasks:
+            self.tasks[job_id].cancel()
+        self.publish(job_id, None)
+        return cancelled
+
+    def publish(self, job_id: UUID, item: Optional[Tuple[Optional[int], Dict[str, Any]]]) -> None:
+        for queue in self.subscribers.get(job_id, ()):
+            queue.put_nowait(item)
+
+    async def keep_alive(self, job_id: UUID, task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            async with SessionLocal() as db:
+                if not await crud.generation_job.heartbeat(db, job_id=job_id, worker_id=self.worker_id):
+                    print(f"Generation job {job_id} was cancelled or taken over, stopping here")
+                    task.cancel()
+                    return
+
+    async def run(self, job: GenerationJob) -> None:
+        keep_alive = asyncio.create_task(self.keep_alive(job.id, asyncio.current_task()))
+        status, error = "completed", None
+        try:
+            async with SessionLocal() as db, Neo4jSessionLocal() as (gdb_session, gdb_driver):
+                await gdb_session.close()
+                recorded = await crud.generation_job.get_results(db, job_id=job.id)
+                seq = recorded[-1][0] if recorded else 0
+
+                async def emit(line: Dict[str, Any], write: Optional[Callable[[], Awaitable[None]]] = None, partial: bool = False) -> None:
+                    nonlocal seq
+                    if partial:
+                        self.publish(job.id, (None, line))
+                        return
+                    seq += 1
+                    crud.generation_job.add_result(db, job_id=job.id, seq=seq, line=line)
+                    if write:
+                        await write()
+                    await db.commit()
+                    self.publish(job.id, (seq, line))
+
+                # the job's llm calls queue in its priority class, fair shared per user
+                with llm.scheduler.context(job.params.get("priority", "column"), job.user_id):
+                    await self.handlers[job.kind](db, gdb_driver, job, [line for _, line in recorded], emit)
+        except asyncio.CancelledError:
+            # cancelled (already recorded), or shutdown/takeover where the job stays running and
+            # is picked up once its heartbeat is stale
+            self.publish(job.id, None)
+            raise
+        except Exception as e:
+            print(f"Generation job {job.id} failed: {e}")
+            status, error = "failed", str(e)
+        finally:
+            keep_alive.cancel()
+            admission.release(job.id)
+
+        async with SessionLocal() as db:
+            await crud.generation_job.finish(db, job_id=job.id, worker_id=self.worker_id, status=status, error=error)
+        self.publish(job.id, None)
+
+    async def attach(self, job_id: UUID, background: Optional[bool] = None) -> AsyncGenerator[str, None]:
+        # replays the recorded lines then follows the job until it finishes, lines produced by
+        # this worker arrive through the queue, anything else (another worker, gaps) from the db.
+        # background overrides the job's own flag for whether it outlives this stream
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.setdefault(job_id, set()).add(queue)
+        last = 0
+        finished = False
+        try:
+            while True:
+                async with SessionLocal() as db:
+                    job = await crud.generation_job.get(db, id=job_id)
+                    lines = await crud.generation_job.get_results(db, job_id=job_id, after_seq=last)
+                for seq, line in lines:
+                    yield json.dumps(line) + "\n"
+                    last = seq
+                if job is None or job.status not in ACTIVE_STATUSES:
+                    finished = True
+                    return
+                if background is None:
+                    background = job.params.get("background", False)
+                if job_id not in self.tasks and self.is_abandoned(job):
+                    await self.submit(job_id)
+                try:
+                    while (item := await asyncio.wait_for(queue.get(), timeout=settings.JOB_POLL_SECONDS)) is not None:
+                        seq, line = item
+                        if seq is None:
+                            # partial, only for streams that are live when it's produced
+                            yield json.dumps(line) + "\n"
+                            continue
+                        if seq <= last:
+                            continue
+                        if seq > last + 1:
+                            break
+                        yield json.dumps(line) + "\n"
+                        last = seq
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.subscribers[job_id].discard(queue)
+            if not self.subscribers[job_id]:
+                del self.subscribers[job_id]
+                # the client went away mid job. starlette cancels the response on disconnect and
+                # nothing can be awaited in here after that, so the cancellation runs as its own task
+                if not finished and background is False:
+                    task = asyncio.create_task(self.cancel(job_id))
+                    self.cancellations.add(task)
+                    task.add_done_callback(self.cancellations.discard)
+
+    @staticmethod
+    def is_abandoned(job: GenerationJob) -> bool:
+        if job.status == "pending":
+            return True
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_STALE_SECONDS)
+        return job.heartbeat is None or job.heartbeat < stale_before
+
+runner = JobRunner()
@@ -1,13 +1,17 @@
 from .groq_api import (
     groq_client_chat_completion_stream,
     groq_client_chat_completion_request,
+    groq_client_tool_completion_stream,
     groq_chat_completion_request,
 )
 from .openai_api import (
     openai_chat_completion_request,
     openai_client_chat_completion_request,
     openai_client_tool_completion_request,
+    openai_client_chat_completion_stream,
+    openai_client_tool_completion_stream,
     openai_client_embedding_request,
+    openai_client_embeddings_request,
 )
 from .claude_api import (
     claude_chat_completion_request,
@@ -15,4 +19,28 @@ from .claude_api import (
 )
 from .jina_api import (
     rerank_documents,
-)
\ No newline at end of file
+)
+from .tokens import (
+    count_tokens,
+)
+from .scheduler import (
+    scheduler,
+    work_context,
+)
+from .telemetry import (
+    telemetry,
+    llm_stage,
+    MODEL_PRICES,
+)
+from .health import (
+    health,
+)
+from .router import (
+    router,
+    tool_completion_attempt,
+    tool_completion_stream_attempt,
+    ArgumentsHandler,
+)
+from .partial_json import (
+    PartialJSONField,
+)
@@ -3,6 +3,10 @@ import httpx
 from groq import AsyncGroq
 from typing import List, Dict, AsyncGenerator
 import os
+import time
+from llm.health import health
+from llm.scheduler import scheduler
+from llm.telemetry import telemetry
 client = AsyncGroq()
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
 
@@ -11,16 +15,18 @@ async def groq_client_chat_completion_stream(
     model: str = "llama3-70b-8192"
 ) -> AsyncGenerator[str, None]:
     try:
-        stream = await client.chat.completions.create(
-            model=model,
-            messages=messages,
-            max_tokens=600,
-            stream=True
-        )
+        # holds its slot until the stream is done
+        async with scheduler.slot():
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=600,
+                stream=True
+            )
 
-        async for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                yield chunk.choices[0].delta.content
+            async for chunk in stream:
+                if chunk.choices[0].delta.content is not None:
+                    yield chunk.choices[0].delta.content
 
     except Exception as e:
         print(f"Groq Streaming Request failed with exception: {e}")
@@ -28,18 +34,50 @@ async def groq_client_chat_completion_stream(
 
 async def groq_client_chat_completion_request(messages, tools, MODEL="llama3-groq-70b-8192-tool-use-preview", tool_choice="auto"):
     try:
-        response = await client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            tools=tools,
-            tool_choice=tool_choice,
-            max_tokens=4096
-    )
+        async with scheduler.slot():
+            start = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    max_tokens=4096
+                )
+            except Exception as e:
+                health.record("groq", MODEL, time.perf_counter() - start, e)
+                raise
+        health.record("groq", MODEL, time.perf_counter() - start)
+        telemetry.record(MODEL, time.perf_counter() - start, response.usage)
         return response
     except Exception as e:
         print(f"Groq Request failed with exception: {e}")
         raise
 
+async def groq_client_tool_completion_stream(messages, tools, tool_choice="auto", model="llama-3.1-8b-instant"):
+    # the raw chunks of a streamed tool call, one attempt. groq puts the usage on the last
+    # chunk's x_groq rather than the chunk itself
+    async with scheduler.slot():
+        start = time.perf_counter()
+        usage = None
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=tools,
+                tool_choice=tool_choice,
+                max_tokens=4096,
+                stream=True,
+            )
+            async for chunk in stream:
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                yield chunk
+        except Exception as e:
+            health.record("groq", model, time.perf_counter() - start, e)
+            raise
+    health.record("groq", model, time.perf_counter() - start)
+    telemetry.record(model, time.perf_counter() - start, usage)
+
 @retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(3))
 async def groq_chat_completion_request(messages, tools=None, tool_choice=None, json_mode=False, model="mixtral-8x7b-32768"):
     """llama3-8b-8192, llama3-70b-8192, mixtral-8x7b-32768"""
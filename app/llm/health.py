@@ -0,0 +1,93 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from core.config import settings
+
+def is_throttle(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class ModelHealth:
+    def __init__(self, window_seconds: float, error_threshold: int, error_cooldown: float, throttle_cooldown: float):
+        """
+        Rolling latency, error and throttle counts per (provider, model) over the last
+        `window_seconds`, fed by the llm clients on every attempt. A throttled model is out for
+        its Retry-After (or `throttle_cooldown`), one that fails `error_threshold` times in a row
+        for `error_cooldown`, after which the next call tries it again.
+        """
+        self.window_seconds = window_seconds
+        self.error_threshold = error_threshold
+        self.error_cooldown = error_cooldown
+        self.throttle_cooldown = throttle_cooldown
+        # (provider, model) -> recent (at, latency, outcome) with outcome "ok", "error" or "throttle"
+        self.calls: Dict[Tuple[str, str], Deque[Tuple[float, float, str]]] = {}
+        self.consecutive_errors: Dict[Tuple[str, str], int] = {}
+        self.cooldown_until: Dict[Tuple[str, str], float] = {}
+
+    def expire(self, key: Tuple[str, str], now: float) -> Deque[Tuple[float, float, str]]:
+        calls = self.calls.setdefault(key, deque())
+        while calls and now - calls[0][0] > self.window_seconds:
+            calls.popleft()
+        return calls
+
+    def record(self, provider: str, model: str, latency: float, error: Optional[Exception] = None) -> None:
+        key = (provider, model)
+        now = time.monotonic()
+        calls = self.expire(key, now)
+        if error is None:
+            calls.append((now, latency, "ok"))
+            self.consecutive_errors[key] = 0
+        elif is_throttle(error):
+            calls.append((now, latency, "throttle"))
+            self.cooldown_until[key] = now + (retry_after(error) or self.throttle_cooldown)
+        else:
+            calls.append((now, latency, "error"))
+            self.consecutive_errors[key] = self.consecutive_errors.get(key, 0) + 1
+            if self.consecutive_errors[key] >= self.error_threshold:
+                self.cooldown_until[key] = now + self.error_cooldown
+
+    def available(self, provider: str, model: str) -> bool:
+        return self.cooldown_until.get((provider, model), 0.0) <= time.monotonic()
+
+    def cooldown(self, provider: str, model: str) -> float:
+        return max(self.cooldown_until.get((provider, model), 0.0) - time.monotonic(), 0.0)
+
+    def error_rate(self, provider: str, model: str) -> Optional[float]:
+        calls = self.expire((provider, model), time.monotonic())
+        if not calls:
+            return None
+        return sum(1 for _, _, outcome in calls if outcome != "ok") / len(calls)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {}
+        now = time.monotonic()
+        for key in list(self.calls):
+            calls = self.expire(key, now)
+            latencies = sorted(latency for _, latency, outcome in calls if outcome == "ok")
+            provider, model = key
+            snapshot[f"{provider}:{model}"] = {
+                "calls": len(calls),
+                "errors": sum(1 for _, _, outcome in calls if outcome == "error"),
+                "throttles": sum(1 for _, _, outcome in calls if outcome == "throttle"),
+                "error_rate": self.error_rate(provider, model),
+                "avg_latency": sum(latencies) / len(latencies) if latencies else None,
+                "p95_latency": latencies[int(len(latencies) * 0.95)] if latencies else None,
+                "available": self.available(provider, model),
+                "cooldown": self.cooldown(provider, model),
+            }
+        return snapshot
+
+health = ModelHealth(
+    settings.ROUTER_WINDOW_SECONDS,
+    settings.ROUTER_ERROR_THRESHOLD,
+    settings.ROUTER_ERROR_COOLDOWN_SECONDS,
+    settings.ROUTER_THROTTLE_COOLDOWN_SECONDS,
+)
@@ -1,9 +1,13 @@
 from tenacity import retry, wait_random_exponential, stop_after_attempt, retry_if_exception_type
 import httpx
 import os
+import time
 import ssl
 import openai
 from openai import AsyncOpenAI
+from llm.health import health
+from llm.scheduler import scheduler
+from llm.telemetry import telemetry
 client = AsyncOpenAI()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
@@ -15,12 +19,21 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 async def openai_client_chat_completion_request(messages, model="gpt-4o", temperature=0.4, response_format="json_object"):
     # if i don't use this i get Exception: [SSL: SSLV3_ALERT_BAD_RECORD_MAC] sslv3 alert bad record mac (_ssl.c:2580) randomly
     try:
-        response = await client.chat.completions.create(
-            model=model,
-            messages=messages,
-            response_format={ "type": response_format },
-            temperature=temperature
-        )
+        # a slot per attempt, retry backoff doesn't hold one
+        async with scheduler.slot():
+            start = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    response_format={ "type": response_format },
+                    temperature=temperature
+                )
+            except Exception as e:
+                health.record("openai", model, time.perf_counter() - start, e)
+                raise
+        health.record("openai", model, time.perf_counter() - start)
+        telemetry.record(model, time.perf_counter() - start, response.usage)
         return response
     except openai.APIError as e:
         print(f"OpenAI API Error: {e}")
@@ -34,17 +47,61 @@ async def openai_client_chat_completion_request(messages, model="gpt-4o", temper
 )
 async def openai_client_tool_completion_request(messages, tools, tool_choice="auto", model="gpt-4o"):
     try:
-        response = await client.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=tools,
-            tool_choice=tool_choice,
-        )
+        async with scheduler.slot():
+            start = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                )
+            except Exception as e:
+                health.record("openai", model, time.perf_counter() - start, e)
+                raise
+        health.record("openai", model, time.perf_counter() - start)
+        telemetry.record(model, time.perf_counter() - start, response.usage)
         return response
     except openai.APIError as e:
         print(f"OpenAI API Error: {e}")
         raise
 
+async def openai_client_tool_completion_stream(messages, tools, tool_choice="auto", model="gpt-4o"):
+    # the raw chunks of a streamed tool call, one attempt, the last chunk carries the usage
+    async with scheduler.slot():
+        start = time.perf_counter()
+        usage = None
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=tools,
+                tool_choice=tool_choice,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                usage = chunk.usage or usage
+                yield chunk
+        except Exception as e:
+            health.record("openai", model, time.perf_counter() - start, e)
+            raise
+    health.record("openai", model, time.perf_counter() - start)
+    telemetry.record(model, time.perf_counter() - start, usage)
+
+async def openai_client_chat_completion_stream(messages, model="gpt-4o-mini", temperature=0.4):
+    # holds its slot until the stream is done
+    async with scheduler.slot():
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                yield chunk.choices[0].delta.content
+
 @retry(
     wait=wait_random_exponential(multiplier=1, min=4, max=60),
     retry=retry_if_exception_type((Exception)),
@@ -59,6 +116,23 @@ async def openai_client_embedding_request(text, model="text-embedding-3-small"):
         print(f"OpenAI Embedding API Error: {e}")
         raise
 
+@retry(
+    wait=wait_random_exponential(multiplier=1, min=4, max=60),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception_type((Exception)),
+    before_sleep=lambda retry_state: print(f"Retrying attempt {retry_state.attempt_number} for batch embedding request...")
+)
+async def openai_client_embeddings_request(texts, model="text-embedding-3-small", dimensions=None):
+    # one request for many inputs, embeddings come back in input order
+    texts = [text.replace("\n", " ") or " " for text in texts]
+    kwargs = {"dimensions": dimensions} if dimensions else {}
+    try:
+        response = await client.embeddings.create(input=texts, model=model, **kwargs)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    except openai.APIError as e:
+        print(f"OpenAI Embedding API Error: {e}")
+        raise
+
 
 @retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(3),
     retry=retry_if_exception_type(ssl.SSLError))
@@ -0,0 +1,92 @@
+from typing import List, Optional
+
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class PartialJSONField:
+    def __init__(self, field: str):
+        """
+        Decodes one top level string field of a JSON object that arrives in pieces (streamed tool
+        call arguments) as it comes in. feed() takes the next piece and returns whatever new text
+        of the field it completed, escapes split across pieces are held until they're whole.
+        """
+        self.field = field
+        self.value = ""
+        self.done = False
+        self.depth = 0
+        self.expect_key = False
+        self.in_string = False
+        # None outside an escape, "" just after a backslash, "u" + hex digits inside \uXXXX
+        self.escape: Optional[str] = None
+        self.high_surrogate: Optional[int] = None
+        self.reading_key = False
+        self.target = False
+        self.key_chars: List[str] = []
+        self.key: Optional[str] = None
+
+    def feed(self, chunk: str) -> str:
+        decoded = []
+        for char in chunk:
+            if self.in_string:
+                text = self.string_char(char)
+                if text is None:
+                    continue
+                if self.target:
+                    decoded.append(text)
+                elif self.reading_key:
+                    self.key_chars.append(text)
+            elif char == '"':
+                self.in_string = True
+                self.reading_key = self.depth == 1 and self.expect_key
+                self.target = self.depth == 1 and not self.expect_key and self.key == self.field and not self.done
+                self.key_chars = []
+            elif char in "{[":
+                self.depth += 1
+                if self.depth == 1:
+                    self.expect_key = char == "{"
+            elif char in "}]":
+                self.depth -= 1
+            elif char == ":" and self.depth == 1:
+                self.expect_key = False
+            elif char == "," and self.depth == 1:
+                self.expect_key = True
+        text = "".join(decoded)
+        self.value += text
+        return text
+
+    def string_char(self, char: str) -> Optional[str]:
+        # the decoded text of one character inside a string, None if it completes nothing yet
+        if self.escape is None:
+            if char == "\\":
+                self.escape = ""
+                return None
+            if char == '"':
+                self.in_string = False
+                if self.reading_key:
+                    self.key = "".join(self.key_chars)
+                if self.target:
+                    self.done = True
+                self.reading_key = self.target = False
+                return None
+            return char
+        if self.escape == "":
+            if char == "u":
+                self.escape = "u"
+                return None
+            self.escape = None
+            return ESCAPES.get(char, char)
+        self.escape += char
+        if len(self.escape) < 5:
+            return None
+        try:
+            code = int(self.escape[1:], 16)
+        except ValueError:
+            code = 0xFFFD
+        self.escape = None
+        if 0xD800 <= code < 0xDC00:
+            # first half of a surrogate pair, the second is the next escape
+            self.high_surrogate = code
+            return None
+        if 0xDC00 <= code < 0xE000 and self.high_surrogate is not None:
+            code = 0x10000 + ((self.high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self.high_surrogate = None
+        return chr(code)
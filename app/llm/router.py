@@ -0,0 +1,243 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from tenacity import stop_after_attempt
+
+from core.config import settings
+from llm.groq_api import (
+    groq_client_chat_completion_request,
+    groq_client_chat_completion_stream,
+    groq_client_tool_completion_stream,
+)
+from llm.health import health
+from llm.openai_api import (
+    openai_client_tool_completion_request,
+    openai_client_tool_completion_stream,
+    openai_client_chat_completion_stream,
+)
+from llm.telemetry import telemetry
+
+T = TypeVar("T")
+# (provider, model)
+Route = Tuple[str, str]
+# handed each piece of a streamed tool call's arguments, a new one is asked for per attempt
+ArgumentsHandler = Callable[[str], Awaitable[None]]
+
+# a routed call fails over to the next model rather than retrying the same one
+openai_client_tool_completion_attempt = openai_client_tool_completion_request.retry_with(stop=stop_after_attempt(1), reraise=True)
+# fewer calls than this in the health window don't count as a failing model
+MIN_ERROR_SAMPLES = 5
+
+def parse_route(route: str) -> Route:
+    provider, _, model = route.partition(":")
+    return (provider, model) if model else ("openai", provider)
+
+async def tool_completion_attempt(provider: str, model: str, messages: List[Dict[str, str]], tools: List[Dict[str, Any]], tool_choice: Any) -> Any:
+    if provider == "groq":
+        return await groq_client_chat_completion_request(messages, tools, MODEL=model, tool_choice=tool_choice)
+    return await openai_client_tool_completion_attempt(messages, tools, tool_choice=tool_choice, model=model)
+
+def streamed_completion(tool_calls: Dict[int, Dict[str, str]], usage: Any) -> Any:
+    # a streamed tool call put back together, only the parts of a ChatCompletion the agents read
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[
+            SimpleNamespace(id=call["id"], type="function", function=SimpleNamespace(name=call["name"], arguments=call["arguments"]))
+            for _, call in sorted(tool_calls.items())
+        ] or None))],
+        usage=usage,
+    )
+
+async def tool_completion_stream_attempt(
+    provider: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    tools: List[Dict[str, Any]],
+    tool_choice: Any,
+    on_arguments: ArgumentsHandler
+) -> Any:
+    # streams the first tool call's arguments to `on_arguments` as they arrive and returns the
+    # whole completion. groq may send a tool call's arguments in one piece, which is still one
+    # partial ahead of the whole response
+    if provider == "groq":
+        stream = groq_client_tool_completion_stream(messages, tools, tool_choice=tool_choice, model=model)
+    else:
+        stream = openai_client_tool_completion_stream(messages, tools, tool_choice=tool_choice, model=model)
+    tool_calls: Dict[int, Dict[str, str]] = {}
+    usage = None
+    async for chunk in stream:
+        usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+        for delta in (chunk.choices[0].delta.tool_calls or []) if chunk.choices else []:
+            call = tool_calls.setdefault(delta.index, {"id": None, "name": "", "arguments": ""})
+            call["id"] = delta.id or call["id"]
+            if delta.function:
+                call["name"] += delta.function.name or ""
+                call["arguments"] += delta.function.arguments or ""
+                if delta.index == min(tool_calls) and delta.function.arguments:
+                    await on_arguments(delta.function.arguments)
+    return streamed_completion(tool_calls, usage)
+
+def chat_stream_attempt(provider: str, model: str, messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
+    if provider == "groq":
+        return groq_client_chat_completion_stream(messages, model=model)
+    return openai_client_chat_completion_stream(messages, model=model)
+
+class ModelRouter:
+    def __init__(self, routes: Dict[str, List[str]], latency_tolerance: float, max_error_rate: float, max_rounds: int):
+        """
+        Picks the model for each llm call from its stage's acceptable models (`routes`, most
+        preferred first) using the live health (llm.health) and per stage latency (llm.telemetry)
+        of each: models cooling down are skipped, ones failing more than `max_error_rate` or
+        `latency_tolerance` times slower than the fastest healthy one only get calls once the
+        rest have failed. Every decision is counted for the router metrics.
+        """
+        self.routes = {stage: [parse_route(route) for route in stage_routes] for stage, stage_routes in routes.items()}
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+        self.max_rounds = max_rounds
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def candidates(self, stage: str, preferred: Optional[Route] = None) -> List[Route]:
+        candidates = ([preferred] if preferred else []) + self.routes.get(stage, [])
+        return list(dict.fromkeys(candidates)) or [("openai", "gpt-4o")]
+
+    def degraded(self, route: Route) -> bool:
+        error_rate = health.error_rate(*route)
+        calls = len(health.calls.get(route, ()))
+        return error_rate is not None and calls >= MIN_ERROR_SAMPLES and error_rate > self.max_error_rate
+
+    def rank(self, stage: str, candidates: List[Route]) -> List[Route]:
+        # available models: healthy and fast enough in preference order, then the slow ones, then
+        # the degraded ones. models cooling down are left out
+        available = [route for route in candidates if health.available(*route)]
+        healthy = [route for route in available if not self.degraded(route)]
+        latencies = {route: telemetry.latency(route[1], stage) for route in healthy}
+        known = [latency for latency in latencies.values() if latency is not None]
+        fastest = min(known) if known else None
+        fast = [
+            route for route in healthy
+            if fastest is None or latencies[route] is None or latencies[route] <= fastest * self.latency_tolerance
+        ]
+        return fast + [route for route in healthy if route not in fast] + [route for route in available if route not in healthy]
+
+    def choose(self, stage: str, preferred: Optional[Route] = None) -> Route:
+        # where a call for the stage would go right now
+        candidates = self.candidates(stage, preferred)
+        ranked = self.rank(stage, candidates)
+        return ranked[0] if ranked else min(candidates, key=lambda route: health.cooldown(*route))
+
+    def stage_stats(self, stage: str) -> Dict[str, Any]:
+        return self.stats.setdefault(stage, {"requests": 0, "failovers": 0, "failed": 0, "routed": {}, "reasons": {}})
+
+    def decide(self, stage: str, route: Route, candidates: List[Route], failover: bool) -> None:
+        stats = self.stage_stats(stage)
+        if failover:
+            reason = "failover"
+            stats["failovers"] += 1
+        elif route == candidates[0]:
+            reason = "preferred"
+        elif not health.available(*candidates[0]):
+            reason = "unavailable"
+        elif self.degraded(candidates[0]):
+            reason = "degraded"
+        else:
+            reason = "slow"
+        name = f"{route[0]}:{route[1]}"
+        stats["routed"][name] = stats["routed"].get(name, 0) + 1
+        stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+
+    async def request(self, stage: str, call: Callable[[str, str], Awaitable[T]], preferred: Optional[Route] = None) -> T:
+        # `call(provider, model)` on the best model, then down the ranking on errors. a round where
+        # every model failed (or all are cooling down) waits before the next
+        candidates = self.candidates(stage, preferred)
+        self.stage_stats(stage)["requests"] += 1
+        error: Optional[Exception] = None
+        attempts = 0
+        for rounds in range(self.max_rounds):
+            for route in self.rank(stage, candidates):
+                self.decide(stage, route, candidates, failover=attempts > 0)
+                attempts += 1
+                try:
+                    with telemetry.stage(stage):
+                        return await call(*route)
+                except Exception as e:
+                    print(f"{stage} on {route[0]}:{route[1]} failed: {e}")
+                    error = e
+            if rounds + 1 < self.max_rounds:
+                cooldown = min(health.cooldown(*route) for route in candidates)
+                await asyncio.sleep(min(max(cooldown, 2 ** (rounds + 2)), 60))
+        self.stage_stats(stage)["failed"] += 1
+        raise error or RuntimeError(f"No model available for {stage}")
+
+    async def tool_completion(
+        self,
+        stage: str,
+        messages: List[Dict[str, str]],
+        tools: List[Dict[str, Any]],
+        tool_choice: Any = "auto",
+        preferred: Optional[Route] = None,
+        stream_arguments: Optional[Callable[[], ArgumentsHandler]] = None
+    ) -> Any:
+        # with stream_arguments the tool call is streamed, each attempt to the handler it returns
+        async def call(provider: str, model: str) -> Any:
+            if stream_arguments:
+                return await tool_completion_stream_attempt(provider, model, messages, tools, tool_choice, stream_arguments())
+            return await tool_completion_attempt(provider, model, messages, tools, tool_choice)
+        return await self.request(stage, call, preferred)
+
+    async def chat_stream(self, stage: str, messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
+        # fails over only until the first token, a stream's health is its time to first token.
+        # models cooling down are tried last rather than not at all, a chat has nothing to wait for
+        candidates = self.candidates(stage)
+        ranked = self.rank(stage, candidates)
+        ranked += sorted((route for route in candidates if route not in ranked), key=lambda route: health.cooldown(*route))
+        self.stage_stats(stage)["requests"] += 1
+        error: Optional[Exception] = None
+        for i, route in enumerate(ranked):
+            self.decide(stage, route, candidates, failover=i > 0)
+            start = time.perf_counter()
+            stream = chat_stream_attempt(*route, messages)
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                health.record(*route, time.perf_counter() - start)
+                return
+            except Exception as e:
+                health.record(*route, time.perf_counter() - start, e)
+                await stream.aclose()
+                print(f"{stage} stream on {route[0]}:{route[1]} failed: {e}")
+                error = e
+                continue
+            health.record(*route, time.perf_counter() - start)
+            # chat latency is time to first token, what the ranking should compare
+            telemetry.record(route[1], time.perf_counter() - start, None, stage)
+            try:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+            return
+        self.stage_stats(stage)["failed"] += 1
+        raise error or RuntimeError(f"No model available for {stage}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "stages": {
+                stage: {
+                    **self.stage_stats(stage),
+                    "candidates": [f"{provider}:{model}" for provider, model in self.candidates(stage)],
+                    "current": ":".join(self.choose(stage)),
+                }
+                for stage in dict.fromkeys([*self.routes, *self.stats])
+            },
+            "models": health.snapshot(),
+        }
+
+router = ModelRouter(
+    settings.MODEL_ROUTES,
+    settings.ROUTER_LATENCY_TOLERANCE,
+    settings.ROUTER_MAX_ERROR_RATE,
+    settings.ROUTER_MAX_ROUNDS,
+)
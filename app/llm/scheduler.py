@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+
+from core.config import settings
+
+# priority class -> share of the slots it gets while others are waiting too
+PRIORITY_WEIGHTS = {
+    "interactive": 8,  # single row adds, chat
+    "column": 2,  # column add/edit, citation recompute, failed cell retry
+    "bulk": 1,  # row imports
+}
+
+# (priority class, user) the current task's llm calls are scheduled as, inherited by tasks it creates.
+# anything that doesn't set it (chat, scripts) counts as interactive
+work_context: ContextVar[Tuple[str, Optional[str]]] = ContextVar("work_context", default=("interactive", None))
+
+class WorkScheduler:
+    def __init__(self, slots: int, interactive_reserved: int, recent_waits: int = 1000):
+        """
+        Process wide limit on concurrent llm calls. A freed slot goes to the priority class with
+        the lowest pass (stride scheduling, a class advances 1/weight per slot it takes) and
+        within a class round robin across users, so one user's backfill can't starve another's.
+        `interactive_reserved` slots are only ever given to interactive work.
+        """
+        self.slots = slots
+        self.interactive_reserved = min(interactive_reserved, slots - 1)
+        self.running = {priority: 0 for priority in PRIORITY_WEIGHTS}
+        self.passes = {priority: 0.0 for priority in PRIORITY_WEIGHTS}
+        # priority -> user -> (waiter, queued at), users rotate to the back once served
+        self.queues: Dict[str, OrderedDict[Optional[str], Deque[Tuple[asyncio.Future, float]]]] = {
+            priority: OrderedDict() for priority in PRIORITY_WEIGHTS
+        }
+        self.stats = {
+            priority: {"granted": 0, "wait_total": 0.0, "wait_max": 0.0, "waits": deque(maxlen=recent_waits)}
+            for priority in PRIORITY_WEIGHTS
+        }
+
+    @contextmanager
+    def context(self, priority: str, user: Optional[Any] = None) -> Iterator[None]:
+        token = work_context.set((priority if priority in PRIORITY_WEIGHTS else "interactive", str(user) if user else None))
+        try:
+            yield
+        finally:
+            work_context.reset(token)
+
+    def in_use(self) -> int:
+        return sum(self.running.values())
+
+    def can_run(self, priority: str) -> bool:
+        if self.in_use() >= self.slots:
+            return False
+        if priority == "interactive":
+            return True
+        return self.in_use() - self.running["interactive"] < self.slots - self.interactive_reserved
+
+    def queued(self, priority: str) -> int:
+        return sum(len(waiters) for waiters in self.queues[priority].values())
+
+    def grant(self, priority: str, waited: float) -> None:
+        self.running[priority] += 1
+        # a class that was idle doesn't get to bank credit, it rejoins at the current minimum
+        active = [self.passes[p] for p in PRIORITY_WEIGHTS if p != priority and (self.running[p] or self.queued(p))]
+        if active:
+            self.passes[priority] = max(self.passes[priority], min(active))
+        self.passes[priority] += 1 / PRIORITY_WEIGHTS[priority]
+        stats = self.stats[priority]
+        stats["granted"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+        stats["waits"].append(waited)
+
+    def dispatch(self) -> None:
+        while True:
+            eligible = [p for p in PRIORITY_WEIGHTS if self.queued(p) and self.can_run(p)]
+            if not eligible:
+                return
+            priority = min(eligible, key=lambda p: self.passes[p])
+            users = self.queues[priority]
+            user, waiters = next(iter(users.items()))
+            future, queued_at = waiters.popleft()
+            if waiters:
+                users.move_to_end(user)
+            else:
+                del users[user]
+            if future.cancelled():
+                continue
+            self.grant(priority, time.perf_counter() - queued_at)
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        priority, user = work_context.get()
+        if self.can_run(priority) and not self.queued(priority):
+            self.grant(priority, 0.0)
+        else:
+            # dispatch() grants the slot (and does the accounting) before waking us
+            future = asyncio.get_running_loop().create_future()
+            self.queues[priority].setdefault(user, deque()).append((future, time.perf_counter()))
+            # clears waiters cancelled while queued, which could otherwise hold up a free slot
+            self.dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # granted just as we were cancelled, hand it on
+                    self.running[priority] -= 1
+                    self.dispatch()
+                raise
+        try:
+            yield
+        finally:
+            self.running[priority] -= 1
+            self.dispatch()
+
+    def snapshot(self) -> Dict[str, Any]:
+        classes = {}
+        for priority, stats in self.stats.items():
+            waits = sorted(stats["waits"])
+            classes[priority] = {
+                "running": self.running[priority],
+                "queued": self.queued(priority),
+                "users_queued": len(self.queues[priority]),
+                "granted": stats["granted"],
+                "avg_wait": stats["wait_total"] / stats["granted"] if stats["granted"] else None,
+                "p95_wait": waits[int(len(waits) * 0.95)] if waits else None,
+                "max_wait": stats["wait_max"],
+            }
+        return {
+            "slots": self.slots,
+            "interactive_reserved": self.interactive_reserved,
+            "in_use": self.in_use(),
+            "classes": classes,
+        }
+
+scheduler = WorkScheduler(settings.SCHEDULER_SLOTS, settings.SCHEDULER_INTERACTIVE_RESERVED)
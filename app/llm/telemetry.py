@@ -0,0 +1,83 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+# $ per 1M (prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama3-groq-70b-8192-tool-use-preview": (0.89, 0.89),
+    "llama3-groq-8b-8192-tool-use-preview": (0.19, 0.19),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+
+# what the current llm call is for (classify, sections, provisions...), set by the agents
+llm_stage: ContextVar[str] = ContextVar("llm_stage", default="other")
+
+class LLMTelemetry:
+    def __init__(self, window: int = 500):
+        """
+        Observed latency and token usage per (model, stage) over the last `window` calls, for
+        estimates (agents.estimator) and the llm metrics endpoint.
+        """
+        self.window = window
+        # (model, stage) -> recent (latency, prompt tokens, completion tokens)
+        self.calls: Dict[Tuple[str, str], Deque[Tuple[float, int, int]]] = {}
+        self.totals: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        token = llm_stage.set(name)
+        try:
+            yield
+        finally:
+            llm_stage.reset(token)
+
+    def record(self, model: str, latency: float, usage: Any, stage: Optional[str] = None) -> None:
+        key = (model, stage or llm_stage.get())
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) if usage else 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) if usage else 0
+        self.calls.setdefault(key, deque(maxlen=self.window)).append((latency, prompt_tokens, completion_tokens))
+        totals = self.totals.setdefault(key, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "dollars": 0.0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        totals["dollars"] += self.cost(model, prompt_tokens, completion_tokens)
+
+    def mean(self, model: str, stage: str, field: int) -> Optional[float]:
+        calls = self.calls.get((model, stage))
+        if not calls:
+            return None
+        return sum(call[field] for call in calls) / len(calls)
+
+    def latency(self, model: str, stage: str) -> Optional[float]:
+        return self.mean(model, stage, 0)
+
+    def prompt_tokens(self, model: str, stage: str) -> Optional[float]:
+        return self.mean(model, stage, 1)
+
+    def completion_tokens(self, model: str, stage: str) -> Optional[float]:
+        return self.mean(model, stage, 2)
+
+    @staticmethod
+    def cost(model: str, prompt_tokens: float, completion_tokens: float) -> float:
+        prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {}
+        for (model, stage), calls in self.calls.items():
+            latencies = sorted(call[0] for call in calls)
+            snapshot.setdefault(model, {})[stage] = {
+                **self.totals[(model, stage)],
+                "avg_latency": sum(latencies) / len(latencies),
+                "p95_latency": latencies[int(len(latencies) * 0.95)],
+                "avg_prompt_tokens": self.prompt_tokens(model, stage),
+                "avg_completion_tokens": self.completion_tokens(model, stage),
+            }
+        return snapshot
+
+telemetry = LLMTelemetry()
@@ -0,0 +1,13 @@
+from functools import lru_cache
+import tiktoken
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # groq/llama models aren't known to tiktoken, close enough for budgeting
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    return len(get_encoding(model).encode(text, disallowed_special=()))
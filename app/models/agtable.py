@@ -1,7 +1,7 @@
 from typing import Optional
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import DateTime, ForeignKey, String, Integer
+from sqlalchemy import DateTime, ForeignKey, String, Integer, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from uuid import uuid4
@@ -71,6 +71,33 @@ class AGTableCell(Base):
     row_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("agtablerow.id"))
     column_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("agtablecolumn.id"))
     value: Mapped[dict] = mapped_column(JSONB)
+    # hash of the inputs the value was generated from, see agents.column_input_fingerprint
+    input_fingerprint: Mapped[Optional[str]] = mapped_column(String(length=64), nullable=True)
 
     row: Mapped["AGTableRow"] = relationship(back_populates="cells")
-    column: Mapped["AGTableColumn"] = relationship(back_populates="cells")
\ No newline at end of file
+    column: Mapped["AGTableColumn"] = relationship(back_populates="cells")
+    citations: Mapped[list["AGCellCitation"]] = relationship(back_populates="cell", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # award id / classification level are the top level keys of their cells -> `value ? key`
+        Index("ix_agtablecell_value_gin", "value", postgresql_using="gin"),
+        # answer substring search (ILIKE), needs the pg_trgm extension (see init_db)
+        # the expression must match crud.crud_agtable.answer_text exactly to be used
+        Index("ix_agtablecell_answer_trgm", text("(value -> 'Completed' ->> 'answer') gin_trgm_ops"), postgresql_using="gin"),
+        {'extend_existing': True},
+    )
+
+class AGCellCitation(Base):
+    # reverse index (award id, clause key) -> cell, rebuilt whenever a cell is written
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid4)
+    # cells are bulk deleted with rows/columns so rely on the db to cascade
+    cell_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("agtablecell.id", ondelete="CASCADE"), index=True)
+    award_id: Mapped[str] = mapped_column(String(length=20))
+    clause_key: Mapped[str] = mapped_column(String(length=50))
+
+    cell: Mapped["AGTableCell"] = relationship(back_populates="citations")
+
+    __table_args__ = (
+        Index("ix_agcellcitation_award_clause", "award_id", "clause_key"),
+        {'extend_existing': True},
+    )
\ No newline at end of file
@@ -0,0 +1,48 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import DateTime, ForeignKey, String, Integer, UniqueConstraint
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from uuid import uuid4
+
+from db.base_class import Base
+
+class GenerationJob(Base):
+    # a row/column generation run, its lines are recorded as they complete so a stream can
+    # reattach (replay + follow) and a restarted worker resumes instead of starting over
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid4)
+    created: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    modified: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), 
+        server_default=func.now(), 
+        onupdate=func.now(), 
+        nullable=False,
+    )
+    table_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("agtable.id", ondelete="CASCADE"), index=True)
+    user_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("user.id"))
+    kind: Mapped[str] = mapped_column(String(length=20))  # 'rows' or 'columns'
+    status: Mapped[str] = mapped_column(String(length=20), index=True, default="pending")  # pending, running, completed, failed, cancelled
+    # everything the job needs to (re)run, see jobs.generation
+    params: Mapped[dict] = mapped_column(JSONB)
+    error: Mapped[Optional[str]] = mapped_column(String(length=500), nullable=True)
+    # the worker running it and when it last said so, a stale heartbeat means it can be taken over
+    worker_id: Mapped[Optional[str]] = mapped_column(String(length=100), nullable=True)
+    heartbeat: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    results: Mapped[list["GenerationJobResult"]] = relationship(back_populates="job", cascade="all, delete-orphan", passive_deletes=True)
+
+class GenerationJobResult(Base):
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid4)
+    created: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    job_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("generationjob.id", ondelete="CASCADE"))
+    seq: Mapped[int] = mapped_column(Integer)
+    # the ndjson line as streamed to the client
+    line: Mapped[dict] = mapped_column(JSONB)
+
+    job: Mapped["GenerationJob"] = relationship(back_populates="results")
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "seq", name="uq_generationjobresult_job_seq"),
+        {'extend_existing': True},
+    )
@@ -1,7 +1,13 @@
 from .modernawards import (
     classify_sys_message, 
     classify_user_message, 
+    classify_batch_user_message,
     section_choice_user_message,
+    SECTION_CHOICE_PROMPT_VERSION,
     ma_sys_col_message,
-    ma_sys_user_message
+    ma_sys_user_message,
+    ma_multi_col_user_message,
+    qa_chat_sys_message,
+    qa_chat_user_message,
+    qa_chat_ungrounded_user_message,
 )
\ No newline at end of file
@@ -20,6 +20,28 @@ You must ALWAYS speak as if the information provided is from your knowledge and
 
 ONLY pick one MA to classify the employee under, if none from the Coverage Information are applicable you can try_again to see more MA's.
 """
+classify_batch_user_message = """# EMPLOYEES
+
+{employees_info}
+
+# COVERAGE INFORMATION
+
+{coverage_info}
+
+## RULES
+- **You must classify EVERY employee above under the correct Modern Award (MA) based on the information provided, each employee is classified independently**
+- **Return exactly one classification per employee, using the employee's id exactly as given**
+- **You must be definitive in your decision**
+- **You must provide detailed reasoning for your decision by citing the individual clauses from the document(s)**
+- **Pay close attention to Qualifications of the employee, as some MA's have specific requirements**
+- **Do NOT repeat the employee information in your response**
+- **You must NEVER mention the information provided, you must speak as if you know the information yourself**
+- **ONLY speak about the chosen MA and the classification level of the employee under the chosen MA**
+
+You must ALWAYS speak as if the information provided is from your knowledge and NEVER output statements such as 'based on the information provided' as this will upset the FWC and they will lose faith in you.
+"""
+# bump when section_choice_user_message changes, cached section choices are keyed on it
+SECTION_CHOICE_PROMPT_VERSION = "1"
 section_choice_user_message = """From document sections below, choose the section(s) that are most relevant in determining the {field} of an employee who has been classified under the Modern Award: 
 
 {award}
@@ -52,4 +74,47 @@ Based on the information provided, determine the correct provisions and informat
 - **Use the tool provided to set the correct provisions and information about the employee**
 - **You must be definitive in your decision**
 - **You must provide detailed reasoning for your decision by citing the individual clauses from the document(s)**
-"""
\ No newline at end of file
+"""
+ma_multi_col_user_message = """The employee has been classified under the following Modern Award:
+
+{award}
+
+{classification}
+
+Based on the information provided, determine the correct provisions and information about each of the following fields for the employee under the Modern Award:
+
+{fields}
+
+## MODERN AWARD CLAUSES
+
+{clauses}
+
+## RULES
+- **Use the tool provided to set the correct provisions and information about the employee, with one entry per field**
+- **Answer each field independently, only using the clauses relevant to that field**
+- **You must be definitive in your decision**
+- **You must provide detailed reasoning for your decision by citing the individual clauses from the document(s)**
+"""
+qa_chat_sys_message = "You are an AI assistant designed by qxd that answers questions about {corpus} in Australian employment and tax law. Answer in markdown. Be accurate and concise, and say so when you are not sure rather than guessing."
+qa_chat_user_message = """# QUESTION
+
+{question}
+
+# SOURCES
+
+{sources}
+
+## RULES
+- **Answer the question using the sources, they are verbatim clauses of {awards}**
+- **Cite every clause you rely on inline, immediately after the statement it supports, as ([<ref>](ref:<number>)), e.g. ([25.5](ref:3)) for source [3] whose ref is 25.5**
+- **Only cite the numbered sources above, never invent a clause number**
+- **If the sources don't answer the question, say so briefly and don't cite anything**
+"""
+qa_chat_ungrounded_user_message = """# QUESTION
+
+{question}
+
+## RULES
+- **No source documents are available for this question, answer from general knowledge of {corpus}**
+- **Don't cite section or clause numbers you can't be sure of, and suggest checking the legislation for anything that matters**
+"""
@@ -0,0 +1,21 @@
+from .lexical import (
+    BM25Index,
+    AwardLexicalIndex,
+    SectionRanking,
+    column_query,
+    lexical_retriever,
+)
+from .embedders import (
+    Embedder,
+    HashingEmbedder,
+    OpenAIEmbedder,
+    get_embedder,
+)
+from .vector import (
+    VectorIndex,
+    clause_store,
+)
+from .award_prefilter import (
+    AwardPrefilter,
+    get_award_prefilter,
+)
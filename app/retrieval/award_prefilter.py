@@ -0,0 +1,151 @@
+import math
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from db import ma_db
+from retrieval.lexical import TOKEN_RE
+
+# how much each part of the employee counts towards an award's score
+TITLE_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.3
+QUALIFICATION_WEIGHT = 0.5
+
+def char_ngrams(text: str, n: int = 3) -> Counter:
+    # per word with boundary markers, so word order and small typos don't matter much
+    grams = Counter()
+    for token in TOKEN_RE.findall(text.lower()):
+        padded = f"#{token}#"
+        if len(padded) <= n:
+            grams[padded] += 1
+            continue
+        for i in range(len(padded) - n + 1):
+            grams[padded[i:i + n]] += 1
+    return grams
+
+def entry_text(entry: Any) -> str:
+    if isinstance(entry, dict):
+        return " ".join(str(value) for value in entry.values() if isinstance(value, str))
+    return str(entry)
+
+class NGramIndex:
+    def __init__(self, texts: List[str]):
+        """
+        TF-IDF over character trigrams, rows L2 normalised, stored as CSR postings per trigram
+        so a query's cosine similarity against every entry is a few scatter adds.
+        """
+        self.n_entries = len(texts)
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for entry_id, text in enumerate(texts):
+            for gram, tf in char_ngrams(text).items():
+                postings.setdefault(gram, []).append((entry_id, 1 + math.log(tf)))
+
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(len(postings), dtype=np.float32)
+        gram_ptr = [0]
+        entry_ids: List[int] = []
+        weights: List[float] = []
+        for gram_id, (gram, gram_postings) in enumerate(postings.items()):
+            self.vocabulary[gram] = gram_id
+            self.idf[gram_id] = self.gram_idf(len(gram_postings))
+            entry_ids.extend(entry_id for entry_id, _ in gram_postings)
+            weights.extend(weight * float(self.idf[gram_id]) for _, weight in gram_postings)
+            gram_ptr.append(len(entry_ids))
+
+        self.gram_ptr = np.array(gram_ptr, dtype=np.int64)
+        self.entry_ids = np.array(entry_ids, dtype=np.int32)
+        self.weights = np.array(weights, dtype=np.float32)
+        norms = np.zeros(self.n_entries, dtype=np.float32)
+        np.add.at(norms, self.entry_ids, self.weights ** 2)
+        norms = np.sqrt(norms)
+        norms[norms == 0] = 1.0
+        self.weights /= norms[self.entry_ids]
+
+    def gram_idf(self, doc_freq: int) -> float:
+        return math.log((1 + self.n_entries) / (1 + doc_freq)) + 1
+
+    def similarities(self, text: str) -> np.ndarray:
+        scores = np.zeros(self.n_entries, dtype=np.float32)
+        query = []
+        for gram, tf in char_ngrams(text).items():
+            gram_id = self.vocabulary.get(gram)
+            idf = self.gram_idf(0) if gram_id is None else float(self.idf[gram_id])
+            query.append((gram_id, (1 + math.log(tf)) * idf))
+        norm = math.sqrt(sum(weight ** 2 for _, weight in query)) or 1.0
+        for gram_id, weight in query:
+            if gram_id is None:
+                continue
+            start, end = self.gram_ptr[gram_id], self.gram_ptr[gram_id + 1]
+            scores[self.entry_ids[start:end]] += self.weights[start:end] * (weight / norm)
+        return scores
+
+class AwardPrefilter:
+    def __init__(self, awards: Dict[str, Dict[str, List[Any]]]):
+        """
+        Ranks awards for an employee by how close their job title/description and qualifications
+        are to the award's listed jobs and qualifications (award id -> {"jobs", "qualifications"}).
+        An award scores its best matching entry per employee field.
+        """
+        self.positions = {award_id: position for position, award_id in enumerate(awards)}
+        job_texts, job_awards, qualification_texts, qualification_awards = [], [], [], []
+        for award_id, entries in awards.items():
+            for job in entries["jobs"]:
+                job_texts.append(entry_text(job))
+                job_awards.append(self.positions[award_id])
+            for qualification in entries["qualifications"]:
+                qualification_texts.append(entry_text(qualification))
+                qualification_awards.append(self.positions[award_id])
+        self.jobs = NGramIndex(job_texts)
+        self.job_awards = np.array(job_awards, dtype=np.int32)
+        self.qualifications = NGramIndex(qualification_texts)
+        self.qualification_awards = np.array(qualification_awards, dtype=np.int32)
+
+    @classmethod
+    def from_ma_db(cls, database) -> "AwardPrefilter":
+        awards: Dict[str, Dict[str, List[Any]]] = {}
+        for _, _, award_id, award_data in database.iter_awards():
+            entries = awards.setdefault(award_id, {"jobs": [], "qualifications": []})
+            entries["jobs"].extend(award_data.get("Jobs", []))
+            entries["qualifications"].extend(award_data.get("Qualifications", []))
+        # the same award is listed under many subindustries
+        for entries in awards.values():
+            entries["jobs"] = list({entry_text(job): job for job in entries["jobs"]}.values())
+            entries["qualifications"] = list({entry_text(q): q for q in entries["qualifications"]}.values())
+        return cls(awards)
+
+    def award_similarity(self, index: NGramIndex, entry_awards: np.ndarray, texts: List[str]) -> np.ndarray:
+        # best entry per award for each text, averaged over the texts
+        scores = np.zeros(len(self.positions), dtype=np.float32)
+        texts = [text for text in texts if text and text.strip()]
+        if not texts or not index.n_entries:
+            return scores
+        for text in texts:
+            best = np.zeros(len(self.positions), dtype=np.float32)
+            np.maximum.at(best, entry_awards, index.similarities(text))
+            scores += best
+        return scores / len(texts)
+
+    def score(self, employee_data: Dict[str, Any]) -> np.ndarray:
+        qualifications = employee_data.get("qualifications") or []
+        if isinstance(qualifications, str):
+            qualifications = [qualifications]
+        return (
+            TITLE_WEIGHT * self.award_similarity(self.jobs, self.job_awards, [employee_data.get("jobTitle", "")])
+            + DESCRIPTION_WEIGHT * self.award_similarity(self.jobs, self.job_awards, [employee_data.get("jobDescription", "")])
+            + QUALIFICATION_WEIGHT * self.award_similarity(self.qualifications, self.qualification_awards, qualifications)
+        )
+
+    def rank(self, employee_data: Dict[str, Any], award_data: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], float]]:
+        # candidates best first, ties keep ma_db's order
+        scores = self.score(employee_data)
+        scored = [
+            (award, float(scores[self.positions[award["award_id"]]]) if award["award_id"] in self.positions else 0.0)
+            for award in award_data
+        ]
+        return sorted(scored, key=lambda item: -item[1])
+
+@lru_cache(maxsize=1)
+def get_award_prefilter() -> AwardPrefilter:
+    return AwardPrefilter.from_ma_db(ma_db)
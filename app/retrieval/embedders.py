@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+from typing import List, Tuple
+
+import numpy as np
+
+from core.config import settings
+import llm
+from retrieval.lexical import tokenize
+
+def normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+class Embedder:
+    """
+    Turns texts into unit length float32 rows. `name` goes into persisted indexes so a query is
+    never scored against vectors from a different model.
+    """
+    name: str
+    dimensions: int
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        return (await self.embed([text]))[0]
+
+class HashingEmbedder(Embedder):
+    def __init__(self, dimensions: int = 256):
+        """
+        Signed feature hashing of unigrams and bigrams. Deterministic across processes (blake2b,
+        not hash()), no network, a stand-in for the OpenAI embedder in tests and offline runs.
+        """
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def bucket(self, feature: str) -> Tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+        return digest % self.dimensions, 1.0 if digest >> 63 else -1.0
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                column, sign = self.bucket(feature)
+                matrix[row, column] += sign
+        return normalise(matrix)
+
+class OpenAIEmbedder(Embedder):
+    def __init__(self, model: str, dimensions: int, batch_size: int, batch_wait_ms: int):
+        """
+        OpenAI embeddings. `embed` sends big lists in batch_size chunks, `embed_query` calls made
+        within batch_wait_ms of each other (every row of a column fill asks at once) share a request.
+        """
+        self.model = model
+        self.dimensions = dimensions
+        self.name = f"openai-{model}-{dimensions}"
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.flush_task: asyncio.Task = None
+
+    async def request(self, texts: List[str]) -> np.ndarray:
+        embeddings = await llm.openai_client_embeddings_request(texts, model=self.model, dimensions=self.dimensions)
+        return normalise(np.array(embeddings, dtype=np.float32))
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        chunks = await asyncio.gather(*[
+            self.request(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)
+        ])
+        return np.concatenate(chunks)
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((text, future))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_later())
+        return await future
+
+    async def flush_later(self) -> None:
+        await asyncio.sleep(self.batch_wait)
+        self.flush_task = None
+        self.flush()
+
+    def flush(self) -> None:
+        batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+        if self.pending and self.flush_task is None:
+            self.flush_task = asyncio.create_task(self.flush_later())
+        if batch:
+            asyncio.create_task(self.resolve(batch))
+
+    async def resolve(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            matrix = await self.request([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for row, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(matrix[row])
+
+def get_embedder() -> Embedder:
+    if settings.EMBEDDER == "hashing":
+        return HashingEmbedder(settings.EMBEDDING_DIMENSIONS)
+    return OpenAIEmbedder(
+        settings.EMBEDDING_MODEL,
+        settings.EMBEDDING_DIMENSIONS,
+        settings.EMBEDDING_BATCH_SIZE,
+        settings.EMBEDDING_BATCH_WAIT_MS,
+    )
@@ -0,0 +1,184 @@
+import asyncio
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from neo4j import AsyncSession
+
+from core.config import settings
+from crud.crud_gdb import ma_gdb
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and any are as at be by for from has have in is it its of on or that the their this to under
+what which who will with employee employees employer award
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        # crude plural folding so "allowances" matches "allowance"
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+class BM25Index:
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Okapi BM25 over `documents`, stored as a CSR style inverted index: the postings of term t are
+        doc_ids[term_ptr[t]:term_ptr[t + 1]] with their precomputed BM25 weights, so a query is a
+        handful of vectorised scatter adds into a score array.
+        """
+        tokenized = [tokenize(document) for document in documents]
+        self.n_docs = len(documents)
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.n_docs and lengths.sum() else 1.0
+        norms = k1 * (1 - b + b * lengths / avg_length)
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, tokens in enumerate(tokenized):
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(len(postings), dtype=np.float32)
+        term_ptr = [0]
+        doc_ids: List[int] = []
+        term_freqs: List[int] = []
+        for term_id, (term, term_postings) in enumerate(postings.items()):
+            self.vocabulary[term] = term_id
+            self.idf[term_id] = self.term_idf(len(term_postings))
+            doc_ids.extend(doc_id for doc_id, _ in term_postings)
+            term_freqs.extend(tf for _, tf in term_postings)
+            term_ptr.append(len(doc_ids))
+
+        self.term_ptr = np.array(term_ptr, dtype=np.int64)
+        self.doc_ids = np.array(doc_ids, dtype=np.int32)
+        tf = np.array(term_freqs, dtype=np.float32)
+        idf = np.repeat(self.idf, np.diff(self.term_ptr))
+        self.weights = idf * tf * (k1 + 1) / (tf + norms[self.doc_ids])
+
+    def term_idf(self, doc_freq: int) -> float:
+        return math.log(1 + (self.n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def score(self, query: str) -> Tuple[np.ndarray, float, List[int]]:
+        """
+        BM25 score of every document, the summed idf of the query terms (unknown terms count
+        as maximally rare) and the term ids of the known query terms.
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        query_idf = 0.0
+        term_ids = []
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                query_idf += self.term_idf(0)
+                continue
+            query_idf += float(self.idf[term_id])
+            term_ids.append(term_id)
+            start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            # a term has at most one posting per document, so fancy index add is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores, query_idf, term_ids
+
+    def matched_idf(self, doc_id: int, term_ids: List[int]) -> float:
+        matched = 0.0
+        for term_id in term_ids:
+            start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            if doc_id in self.doc_ids[start:end]:
+                matched += float(self.idf[term_id])
+        return matched
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        scores, _, _ = self.score(query)
+        return top_k(scores, k)
+
+def top_k(scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(int(i), float(scores[i])) for i in ranked if scores[i] > 0]
+
+@dataclass
+class SectionRanking:
+    sections: List[Tuple[str, float]]
+    clauses: List[Tuple[str, float]]
+    # share of the query's idf mass found in the top section, 0 when nothing matched
+    confidence: float
+
+    def selected(self, relative_threshold: float, max_sections: int) -> List[str]:
+        if not self.sections:
+            return []
+        best = self.sections[0][1]
+        return [name for name, score in self.sections[:max_sections] if score >= best * relative_threshold]
+
+class AwardLexicalIndex:
+    def __init__(self, award_id: str, rows: List[Dict[str, Any]]):
+        """
+        Section and clause indexes for one award. A section's document is its name (repeated, names
+        are what choose_sections matches on), its parent's name for subsections, and the names and
+        text of the clauses directly under it, section names are the same strings fetch_clauses takes.
+        """
+        self.award_id = award_id
+        section_text: Dict[str, List[str]] = {}
+        clause_text: Dict[str, str] = {}
+        for row in rows:
+            name = row["subsection_name"] or row["section_name"]
+            if name not in section_text:
+                section_text[name] = [name, name]
+                if row["subsection_name"]:
+                    section_text[name].append(row["section_name"])
+            if row["clause_key"]:
+                section_text[name].append(f"{row['clause_name'] or ''} {row['clause_content'] or ''}")
+                clause_text.setdefault(row["clause_key"], f"{row['clause_name'] or ''} {row['clause_content'] or ''}")
+
+        self.section_names = list(section_text)
+        self.sections = BM25Index([" ".join(parts) for parts in section_text.values()])
+        self.clause_keys = list(clause_text)
+        self.clauses = BM25Index(list(clause_text.values()))
+
+    def rank(self, query: str, k: int = 10) -> SectionRanking:
+        scores, query_idf, term_ids = self.sections.score(query)
+        ranked = top_k(scores, k)
+        sections = [(self.section_names[i], score) for i, score in ranked]
+        confidence = 0.0
+        if ranked and query_idf:
+            confidence = self.sections.matched_idf(ranked[0][0], term_ids) / query_idf
+        clauses = [(self.clause_keys[i], score) for i, score in self.clauses.search(query, k)]
+        return SectionRanking(sections=sections, clauses=clauses, confidence=confidence)
+
+def column_query(column_name: str, additional_info: str = None) -> str:
+    return f"{column_name} {additional_info or ''}".strip()
+
+class LexicalRetriever:
+    def __init__(self):
+        """
+        Per award lexical indexes, built from the graph on first use and kept for the life of the
+        process (one award is a few hundred sections/clauses).
+        """
+        self.indexes: Dict[Tuple[str, str], AwardLexicalIndex] = {}
+        self.locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    async def get_index(self, gdb: AsyncSession, award_id: str) -> AwardLexicalIndex:
+        key = (award_id, settings.MA_DATA_VERSION)
+        if key in self.indexes:
+            return self.indexes[key]
+        async with self.locks.setdefault(key, asyncio.Lock()):
+            if key not in self.indexes:
+                rows = await ma_gdb.fetch_award_section_clauses(gdb, award_id)
+                self.indexes[key] = AwardLexicalIndex(award_id, rows)
+        return self.indexes[key]
+
+    async def rank(self, gdb: AsyncSession, award_id: str, column_name: str, additional_info: str = None, k: int = 10) -> SectionRanking:
+        index = await self.get_index(gdb, award_id)
+        return index.rank(column_query(column_name, additional_info), k)
+
+lexical_retriever = LexicalRetriever()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from retrieval.embedders import Embedder, get_embedder
+from retrieval.lexical import column_query, top_k
+
+class VectorIndex:
+    def __init__(
+        self,
+        keys: List[str],
+        vectors: np.ndarray,
+        embedder_name: str,
+        scales: Optional[np.ndarray] = None,
+        data_version: str = None
+    ):
+        """
+        Brute force inner product index over unit length rows (cosine similarity), top-k by
+        argpartition. Rows are clause ids grouped by award (`award:key`), so restricting a search
+        to one award is a slice. With `scales` the rows are int8 with a per row scale.
+        """
+        self.keys = keys
+        self.vectors = vectors
+        self.scales = scales
+        self.embedder_name = embedder_name
+        self.data_version = data_version or settings.MA_DATA_VERSION
+        self.award_slices: Dict[str, Tuple[int, int]] = {}
+        for row, key in enumerate(keys):
+            award_id = key.split(":", 1)[0]
+            start, _ = self.award_slices.get(award_id, (row, row))
+            self.award_slices[award_id] = (start, row + 1)
+
+    @classmethod
+    def build(cls, keys: List[str], vectors: np.ndarray, embedder_name: str, quantize: bool = False) -> "VectorIndex":
+        order = sorted(range(len(keys)), key=lambda row: keys[row])
+        keys = [keys[row] for row in order]
+        vectors = np.ascontiguousarray(vectors[order], dtype=np.float32)
+        if not quantize:
+            return cls(keys, vectors, embedder_name)
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        return cls(keys, quantized, embedder_name, scales.astype(np.float32))
+
+    def search(self, query: np.ndarray, k: int = 10, award_id: str = None) -> List[Tuple[str, float]]:
+        start, end = 0, len(self.keys)
+        if award_id is not None:
+            if award_id not in self.award_slices:
+                return []
+            start, end = self.award_slices[award_id]
+        scores = self.vectors[start:end] @ query.astype(np.float32)
+        if self.scales is not None:
+            scores *= self.scales[start:end]
+        # top_k drops non positive scores, shift so anything similar enough can come back
+        return [(self.keys[start + row], score - 1) for row, score in top_k(scores + 1, k)]
+
+    def save(self, path: str) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(f"{path}.vectors.npy", self.vectors)
+        if self.scales is not None:
+            np.save(f"{path}.scales.npy", self.scales)
+        with open(f"{path}.meta.json", "w") as file:
+            json.dump({
+                "keys": self.keys,
+                "embedder": self.embedder_name,
+                "quantized": self.scales is not None,
+                "data_version": self.data_version,
+            }, file)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["VectorIndex"]:
+        # vectors are memory mapped, pages are read in as awards get searched
+        if not Path(f"{path}.meta.json").exists():
+            return None
+        with open(f"{path}.meta.json") as file:
+            meta = json.load(file)
+        vectors = np.load(f"{path}.vectors.npy", mmap_mode="r")
+        scales = np.load(f"{path}.scales.npy") if meta["quantized"] else None
+        return cls(meta["keys"], vectors, meta["embedder"], scales, meta["data_version"])
+
+class ClauseVectorStore:
+    def __init__(self, path: str):
+        """
+        The clause embedding index for column clause retrieval, loaded from `path` on first use.
+        An index built with another embedder or for other award data is ignored.
+        """
+        self.path = path
+        self.embedder: Embedder = None
+        self.index: Optional[VectorIndex] = None
+        self.loaded = False
+        self.lock = asyncio.Lock()
+
+    async def get(self) -> Tuple[Optional[VectorIndex], Embedder]:
+        if not self.loaded:
+            async with self.lock:
+                if not self.loaded:
+                    self.embedder = get_embedder()
+                    index = await asyncio.to_thread(VectorIndex.load, self.path)
+                    if index and (index.embedder_name != self.embedder.name or index.data_version != settings.MA_DATA_VERSION):
+                        print(f"Clause index at {self.path} is for {index.embedder_name}/{index.data_version}, ignoring it")
+                        index = None
+                    self.index = index
+                    self.loaded = True
+        return self.index, self.embedder
+
+    async def search(self, award_id: str, column_name: str, additional_info: str = None, k: int = None) -> Optional[List[Tuple[str, float]]]:
+        # None when there's no usable index, callers fall back to section based retrieval
+        index, embedder = await self.get()
+        if index is None:
+            return None
+        query = await embedder.embed_query(column_query(column_name, additional_info))
+        return index.search(query, k or settings.CLAUSE_VECTOR_TOP_K, award_id)
+
+clause_store = ClauseVectorStore(settings.CLAUSE_INDEX_PATH)
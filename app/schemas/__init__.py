@@ -18,6 +18,11 @@ from .agtable import (
     AGTableCellCreate,
     AGTableCellUpdate,
     AGTableCellInDB,
+    EmployeeData,
+    AGCellCitationQuery,
+    AGCellCitationAffected,
+    AGTableCellFailedQuery,
+    AGTableCellFailed,
     AGTableColumnWithCells,
     AGTableRowWithCells,
     AGTableWithColumnsAndRows,
@@ -36,4 +41,6 @@ from .token import (
     MagicTokenPayload,
     WebToken,
 )
-from .totp import NewTOTP, EnableTOTP
\ No newline at end of file
+from .totp import NewTOTP, EnableTOTP
+from .section import SectionPinBase, SectionPinCreate, SectionPin
+from .generation_job import GenerationJobCreate, GenerationJobUpdate, GenerationJobStatus
\ No newline at end of file
@@ -1,6 +1,6 @@
 from typing import Optional, List, Dict, Any
 from uuid import UUID
-from pydantic import Field
+from pydantic import Field, ConfigDict
 from schemas.base_schema import BaseSchema, UUIDSchema
 
 class AGTableBase(BaseSchema):
@@ -48,6 +48,7 @@ class AGTableCellBase(BaseSchema):
 class AGTableCellCreate(AGTableCellBase):
     row_id: UUID
     column_id: UUID
+    input_fingerprint: Optional[str] = None
 
 class AGTableCellUpdate(AGTableCellBase):
     pass
@@ -55,6 +56,44 @@ class AGTableCellUpdate(AGTableCellBase):
 class AGTableCellInDB(AGTableCellBase, UUIDSchema):
     row_id: UUID
     column_id: UUID
+    input_fingerprint: Optional[str] = None
+
+class EmployeeData(BaseSchema):
+    id: Optional[str] = None
+    fullName: str
+    industry: str
+    subIndustry: str = ""
+    jobTitle: str = ""
+    jobDescription: str = ""
+    qualifications: List[str] = []
+    yearsExperience: int = 0
+    age: Optional[int] = None
+    addedBy: Optional[str] = None
+    status: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True, extra="allow")
+
+class AGCellCitationQuery(BaseSchema):
+    award_id: str
+    clause_keys: List[str]
+
+class AGCellCitationAffected(BaseSchema):
+    cell_id: UUID
+    row_id: UUID
+    column_id: UUID
+    column_name: str
+    clause_key: str
+
+class AGTableCellFailedQuery(BaseSchema):
+    # either narrows the failed cells to those columns/rows
+    column_ids: Optional[List[UUID]] = None
+    row_ids: Optional[List[UUID]] = None
+
+class AGTableCellFailed(BaseSchema):
+    cell_id: UUID
+    row_id: UUID
+    column_id: UUID
+    column_name: str
 
 # Additional schemas for nested representations
 
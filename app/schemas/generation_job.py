@@ -0,0 +1,23 @@
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from schemas.base_schema import BaseSchema, UUIDSchema
+
+class GenerationJobCreate(BaseSchema):
+    # set when the id was needed before the job existed (admission)
+    id: Optional[UUID] = None
+    table_id: UUID
+    user_id: UUID
+    kind: str
+    params: Dict[str, Any]
+
+class GenerationJobUpdate(BaseSchema):
+    status: Optional[str] = None
+    error: Optional[str] = None
+
+class GenerationJobStatus(UUIDSchema):
+    kind: str
+    status: str
+    error: Optional[str] = None
+    # lines recorded so far
+    line_count: int = 0
@@ -0,0 +1,12 @@
+from typing import List
+from schemas.base_schema import BaseSchema
+
+class SectionPinBase(BaseSchema):
+    award_id: str
+    column_name: str
+
+class SectionPinCreate(SectionPinBase):
+    sections: List[str]
+
+class SectionPin(SectionPinCreate):
+    data_version: str